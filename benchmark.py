@@ -0,0 +1,280 @@
+"""
+Бенчмарк алгоритмов раскроя: число полотен, заполнение, время и пиковая память
+для каждого движка на синтетических и исторических наборах от 10 до 100 000 деталей.
+
+Наборы:
+  orders-N – детали из распределения размеров order_composition (дамп БД, --dump);
+  bwK-N – классы I–VI Berkey–Wang (классические наборы 2-D bin packing).
+
+Запуск:
+  python benchmark.py                    – сравнить с базой, код возврата 1 при регрессии,
+                                           2 – если базы нет;
+  python benchmark.py --save-baseline    – записать текущие результаты как базу;
+  python benchmark.py --max-pieces 100000 --engines maxrects strip
+База (benchmark_baseline.json) зависит от машины: её записывают до изменения и сравнивают после.
+Движки nfp, raster и annealing медленные и прогоняются только на наборах
+до SLOW_ENGINE_MAX_PIECES деталей; raster требует NumPy. nfp считается с пустым кэшем NFP
+во временном каталоге, без постоянного кэша в домашнем каталоге.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from cutting_engine.binpacking import count_sheets, pack_bins
+from cutting_engine.cutting_stock import solve_cutting_stock
+from cutting_engine.metaheuristic import AnytimeNester
+from cutting_engine.pattern_cache import PatternCache
+from cutting_engine.planning import CUTTING_STOCK_MAX_SIZES, CUTTING_STOCK_TIME_LIMIT
+from cutting_engine.polygons import nest_sheets
+from cutting_engine.strip_packing import pack_strip
+from cutting_engine.units import to_mm
+
+SCALES = [10, 100, 1000, 10000, 100000]
+DEFAULT_MAX_PIECES = 1000
+DEFAULT_DUMP = 'textile04.sql'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+# Полотно и рулон для наборов из заказов, мм
+ORDER_SHEET = (1500, 3000)
+ORDER_ROLL_WIDTH = 1500
+
+# Классы Berkey–Wang: сторона квадратного полотна и диапазон сторон деталей
+BERKEY_WANG = {
+    1: (10, 1, 10),
+    2: (30, 1, 10),
+    3: (40, 1, 35),
+    4: (100, 1, 35),
+    5: (100, 1, 100),
+    6: (300, 1, 100)
+}
+DEFAULT_CLASSES = [1, 3, 5]
+
+# Медленные движки: наибольшее число деталей набора для них
+SLOW_ENGINE_MAX_PIECES = {'annealing': 1000, 'nfp': 100, 'raster': 1000}
+# Бюджет фоновой оптимизации (имитации отжига) на набор, с
+ANNEALING_TIME_BUDGET = 1.0
+
+# Регрессия: лишние полотна сверх доли базы и замедление сверх доли базы (но не меньше MIN_SLOWDOWN секунд)
+QUALITY_TOLERANCE = 0.0
+SPEED_TOLERANCE = 0.5
+MIN_SLOWDOWN = 0.05
+
+ORDER_ROW = re.compile(r"^\((\d+), (?:\d+|NULL), (?:\d+|NULL), (\d+|NULL), '([\d.]+)', '([\d.]+)'")
+
+
+def load_order_sizes(path):
+    """
+    Распределение размеров изделий из INSERT INTO `order_composition` дампа БД:
+    Counter {(ширина, длина) в мм: суммарное количество}.
+    """
+    sizes = Counter()
+    inside = False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('INSERT INTO `order_composition`'):
+                inside = True
+                continue
+            if not inside:
+                continue
+            match = ORDER_ROW.match(line)
+            if match is None:
+                inside = False
+                continue
+            _, quantity, width, length = match.groups()
+            if quantity != 'NULL':
+                sizes[(to_mm(width), to_mm(length))] += int(quantity)
+    return sizes
+
+
+def _items(sizes):
+    return [{'name': f"{w}x{h}", 'width': w, 'height': h, 'quantity': quantity}
+            for (w, h), quantity in sorted(sizes.items())]
+
+
+def order_instance(distribution, pieces, seed):
+    """
+    pieces деталей, выбранных из распределения заказов (только влезающие в полотно).
+    """
+    sheet_width, sheet_height = ORDER_SHEET
+    fitting = [(size, weight) for size, weight in distribution.items()
+               if min(size) <= min(ORDER_SHEET) and max(size) <= max(ORDER_SHEET) and size[0] <= ORDER_ROLL_WIDTH]
+    rng = random.Random(seed)
+    sizes = Counter(rng.choices([size for size, _ in fitting], weights=[weight for _, weight in fitting], k=pieces))
+    return {'name': f"orders-{pieces}", 'width': sheet_width, 'height': sheet_height,
+            'roll_width': ORDER_ROLL_WIDTH, 'items': _items(sizes)}
+
+
+def berkey_wang_instance(klass, pieces, seed):
+    side, low, high = BERKEY_WANG[klass]
+    rng = random.Random(seed * 10 + klass)
+    sizes = Counter((rng.randint(low, high), rng.randint(low, high)) for _ in range(pieces))
+    # Стороны – малые целые, поэтому растр с шагом 1 точен
+    return {'name': f"bw{klass}-{pieces}", 'width': side, 'height': side, 'roll_width': side,
+            'raster_resolution': 1, 'items': _items(sizes)}
+
+
+def _sheets_result(result):
+    return {'sheets': count_sheets(result['sheets']), 'unplaced': len(result['unplaced']),
+            'area': sum(sheet['area'] * sheet.get('repeat', 1) for sheet in result['sheets'])}
+
+
+def _strip_result(result):
+    return {'sheets': result['length'], 'unplaced': len(result['unplaced']), 'area': result['area']}
+
+
+def _raster(instance):
+    # NumPy нужен только этому движку
+    from cutting_engine.raster import RASTER_RESOLUTION, pack_raster
+    return _sheets_result(pack_raster(instance['width'], instance['height'], instance['items'],
+                                      resolution=instance.get('raster_resolution', RASTER_RESOLUTION)))
+
+
+def _nfp(instance):
+    # Каждый прогон – с пустым кэшем NFP во временном каталоге: общий кэш в домашнем
+    # каталоге с прошлых запусков делал бы время случайным
+    with tempfile.TemporaryDirectory() as directory:
+        return _sheets_result(nest_sheets(instance['width'], instance['height'], instance['items'],
+                                          cache=PatternCache(directory)))
+
+
+def _annealing(instance):
+    nester = AnytimeNester(instance['width'], instance['height'], instance['items'],
+                           time_budget=ANNEALING_TIME_BUDGET)
+    return _sheets_result(nester.run())
+
+
+ENGINES = {
+    'maxrects': lambda instance: _sheets_result(pack_bins(
+        instance['width'], instance['height'], instance['items'], engine='maxrects')),
+    'guillotine': lambda instance: _sheets_result(pack_bins(
+        instance['width'], instance['height'], instance['items'], engine='guillotine')),
+    'cutting_stock': lambda instance: _sheets_result(solve_cutting_stock(
+        instance['width'], instance['height'], instance['items'], time_limit=CUTTING_STOCK_TIME_LIMIT)),
+    'strip': lambda instance: _strip_result(pack_strip(instance['roll_width'], instance['items'])),
+    'nfp': _nfp,
+    'raster': _raster,
+    'annealing': _annealing
+}
+
+
+def applicable(engine, instance):
+    if engine == 'cutting_stock':
+        return len(instance['items']) <= CUTTING_STOCK_MAX_SIZES
+    if engine in SLOW_ENGINE_MAX_PIECES:
+        return sum(item['quantity'] for item in instance['items']) <= SLOW_ENGINE_MAX_PIECES[engine]
+    return True
+
+
+def run_engine(engine, instance, measure_memory=True):
+    """
+    Прогоняет движок на наборе. Время меряется отдельным прогоном без tracemalloc,
+    чтобы учёт памяти его не искажал. Для 'strip' sheets – длина рулона в мм.
+    """
+    started = time.perf_counter()
+    result = ENGINES[engine](instance)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        ENGINES[engine](instance)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    items_area = sum(item['width'] * item['height'] * item['quantity'] for item in instance['items'])
+    if engine == 'strip':
+        stock_area = instance['roll_width'] * result['sheets']
+        lower_bound = -(-items_area // instance['roll_width'])
+    else:
+        stock_area = result['sheets'] * instance['width'] * instance['height']
+        lower_bound = -(-items_area // (instance['width'] * instance['height']))
+    return {
+        'sheets': result['sheets'],
+        'lower_bound': lower_bound,
+        'unplaced': result['unplaced'],
+        'utilisation': round(100 * result['area'] / stock_area, 2) if stock_area else 0.0,
+        'time': round(elapsed, 4),
+        'peak_memory': peak
+    }
+
+
+def build_instances(max_pieces, dump, classes, seed):
+    instances = []
+    distribution = load_order_sizes(dump) if dump and os.path.exists(dump) else Counter()
+    for pieces in SCALES:
+        if pieces > max_pieces:
+            break
+        if distribution:
+            instances.append(order_instance(distribution, pieces, seed))
+        for klass in classes:
+            instances.append(berkey_wang_instance(klass, pieces, seed))
+    return instances
+
+
+def find_regressions(results, baseline, quality_tolerance, speed_tolerance):
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current['sheets'] > base['sheets'] * (1 + quality_tolerance) or current['unplaced'] > base['unplaced']:
+            regressions.append(f"{key}: sheets {base['sheets']} -> {current['sheets']}, "
+                               f"unplaced {base['unplaced']} -> {current['unplaced']}")
+        slowdown = current['time'] - base['time']
+        if slowdown > MIN_SLOWDOWN and current['time'] > base['time'] * (1 + speed_tolerance):
+            regressions.append(f"{key}: time {base['time']}s -> {current['time']}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк алгоритмов раскроя")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--max-pieces', type=int, default=DEFAULT_MAX_PIECES)
+    parser.add_argument('--classes', nargs='+', type=int, choices=sorted(BERKEY_WANG), default=DEFAULT_CLASSES)
+    parser.add_argument('--dump', default=DEFAULT_DUMP, help="дамп БД с order_composition")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help="записать результаты в JSON")
+    parser.add_argument('--no-memory', action='store_true', help="не измерять пиковую память")
+    parser.add_argument('--quality-tolerance', type=float, default=QUALITY_TOLERANCE)
+    parser.add_argument('--speed-tolerance', type=float, default=SPEED_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'instance':<16}{'engine':<15}{'sheets':>10}{'bound':>10}{'util %':>9}{'time s':>10}{'peak KiB':>10}")
+    for instance in build_instances(args.max_pieces, args.dump, args.classes, args.seed):
+        for engine in args.engines:
+            if not applicable(engine, instance):
+                continue
+            row = run_engine(engine, instance, not args.no_memory)
+            results[f"{instance['name']}/{engine}"] = row
+            peak = '-' if row['peak_memory'] is None else row['peak_memory'] // 1024
+            print(f"{instance['name']:<16}{engine:<15}{row['sheets']:>10}{row['lower_bound']:>10}"
+                  f"{row['utilisation']:>9}{row['time']:>10}{peak:>10}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline {args.baseline}, run with --save-baseline")
+        return 2
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.quality_tolerance, args.speed_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
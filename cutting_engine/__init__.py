@@ -0,0 +1,24 @@
+"""
+Движок раскроя без зависимостей от Qt и matplotlib: упаковка деталей – прямоугольников
+и контуров – на полотна и рулоны, планирование по материалам, обрезки и нехватка материалов.
+Входы и выходы – обычные словари и списки, размеры – целые мм (см. units).
+Растровая раскладка использует NumPy и отсюда не импортируется: cutting_engine.raster.pack_raster.
+"""
+from .binpacking import count_sheets, pack_bins, pack_offcuts, repack_changed
+from .cut_order import plan_cut_order
+from .cutting_stock import solve_cutting_stock
+from .export import export_plan, write_path
+from .guillotine import add_cuts, cut_sequence, cut_tree
+from .metaheuristic import AnytimeNester
+from .nesting import leftover_pieces, pack_sheet
+from .offcut_index import OffcutIndex, OffcutTree
+from .pattern_cache import PatternCache
+from .planning import make_report, plan_material, plan_materials, replan_material
+from .polygons import nest_sheets, nest_strip, nfp_cache
+from .scraps import plan_scraps
+from .shortage import shortage
+from .spatial import UniformGrid
+from .stock import select_roll, select_sheets
+from .strip_packing import pack_strip
+from .toolpath import cut_segments, tool_path
+from .units import ceil_mm, format_area, format_length, from_mm, length_unit, to_mm
@@ -0,0 +1,280 @@
+import logging
+
+from .nesting import PACKERS, expand_items, pack_sheet, sheet_result
+
+
+def _piece_of(placement):
+    """
+    Восстанавливает исходную деталь (без поворота) по её размещению.
+    """
+    width, height = placement['width'], placement['height']
+    if placement.get('rotated'):
+        width, height = height, width
+    return {
+        'item_index': placement.get('item_index'),
+        'name': placement['name'],
+        'width': width,
+        'height': height
+    }
+
+
+def _insert(packer, piece):
+    return packer.insert(piece['name'], piece['width'], piece['height'], item_index=piece['item_index'])
+
+
+def _by_area(pieces):
+    return sorted(pieces, key=lambda p: (-p['width'] * p['height'], -max(p['width'], p['height'])))
+
+
+class MultiSheetPacker:
+    """
+    Раскладка всего спроса по одному материалу сразу на нужное число листов.
+    Построение — first-fit-decreasing: детали по убыванию площади пробуются
+    на открытых листах по порядку, новый лист открывается, только если деталь
+    никуда не встала. Для каждого листа запоминаем размеры, которые на него уже
+    не встали, а лист, в котором не осталось места даже под самую мелкую деталь,
+    закрываем, — поэтому стоимость почти линейна по числу деталей. Затем улучшение:
+    самый пустой лист пытаемся расформировать по остальным или слить со вторым по пустоте.
+    """
+
+    def __init__(self, width, height, allow_rotation=True, engine='maxrects'):
+        self.width = width
+        self.height = height
+        self.allow_rotation = allow_rotation
+        self.packer_class = PACKERS[engine]
+        self.sheets = []
+        self.unplaced = []
+
+    def _new_sheet(self):
+        return self.packer_class(self.width, self.height, self.allow_rotation)
+
+    def build(self, pieces):
+        if not pieces:
+            return
+        min_area = min(p['width'] * p['height'] for p in pieces)
+        open_sheets = []
+        for piece in pieces:
+            size = (piece['width'], piece['height'])
+            placed = False
+            exhausted = []
+            for packer in open_sheets:
+                if size in packer.failed_sizes:
+                    continue
+                if _insert(packer, piece) is not None:
+                    placed = True
+                    break
+                packer.failed_sizes.add(size)
+                if not any(w * h >= min_area for _, _, w, h in packer.free_space):
+                    exhausted.append(packer)
+            if exhausted:
+                open_sheets = [s for s in open_sheets if s not in exhausted]
+            if placed:
+                continue
+            packer = self._new_sheet()
+            if _insert(packer, piece) is None:
+                self.unplaced.append(piece)
+                continue
+            self.sheets.append(packer)
+            open_sheets.append(packer)
+
+    def _dissolve(self, weakest):
+        """
+        Переносит все детали листа weakest на остальные листы. При неудаче откатывает вставки.
+        """
+        others = [s for s in self.sheets if s is not weakest]
+        states = [(packer, packer.snapshot()) for packer in others]
+        for piece in _by_area(_piece_of(p) for p in weakest.placements):
+            if not any(_insert(packer, piece) is not None for packer in others):
+                for packer, state in states:
+                    packer.restore(state)
+                return False
+        self.sheets.remove(weakest)
+        return True
+
+    def _merge_pair(self, first, second):
+        """
+        Пробует уложить детали двух листов на один, перебирая несколько порядков деталей.
+        """
+        pieces = [_piece_of(p) for p in first.placements + second.placements]
+        orderings = (
+            _by_area(pieces),
+            sorted(pieces, key=lambda p: -max(p['width'], p['height'])),
+            sorted(pieces, key=lambda p: (-p['height'], -p['width'])),
+            sorted(pieces, key=lambda p: (-p['width'], -p['height']))
+        )
+        for ordering in orderings:
+            packer = self._new_sheet()
+            if all(_insert(packer, piece) is not None for piece in ordering):
+                index = self.sheets.index(first)
+                self.sheets[index] = packer
+                self.sheets.remove(second)
+                return True
+        return False
+
+    def improve(self, max_rounds=20):
+        for _ in range(max_rounds):
+            if len(self.sheets) < 2:
+                return
+            ranked = sorted(self.sheets, key=lambda s: s.used_area())
+            if self._dissolve(ranked[0]):
+                continue
+            if not self._merge_pair(ranked[0], ranked[1]):
+                return
+
+
+def count_sheets(sheets):
+    """
+    Число физических листов в плане с учётом повторов раскладки ('repeat').
+    """
+    return sum(sheet.get('repeat', 1) for sheet in sheets)
+
+
+def merge_repeats(sheets):
+    """
+    Сводит листы с одинаковой раскладкой (те же детали на тех же местах) в один лист
+    с числом повторов 'repeat'. Порядок листов – по первому появлению раскладки.
+    """
+    merged = {}
+    for sheet in sheets:
+        layout = tuple(sorted((p['x'], p['y'], p['width'], p['height'], p.get('item_index'))
+                              for p in sheet['placements']))
+        if layout in merged:
+            merged[layout]['repeat'] = merged[layout].get('repeat', 1) + sheet.get('repeat', 1)
+        else:
+            merged[layout] = dict(sheet)
+    return list(merged.values())
+
+
+def repeat_patterns(width, height, items, allow_rotation=True, engine='maxrects'):
+    """
+    Быстрый путь для больших количеств: раскладывает один лист из текущего спроса
+    и сразу арифметически считает, сколько раз такую раскладку можно повторить.
+    Позиции, которые не дают повторить раскладку хотя бы дважды, откладываются
+    в остаток, и лист раскладывается заново из остальных.
+    Возвращает (листы с полем 'repeat', оставшиеся количества по позициям).
+    """
+    remaining = [int(item['quantity']) for item in items]
+    sheet_area = width * height
+    # Позиции без площади (нулевой размер из БД) сюда не идут: их оставляет в остатке pack_bins
+    excluded = {index for index, item in enumerate(items) if item['width'] <= 0 or item['height'] <= 0}
+    sheets = []
+    while True:
+        # На один лист больше, чем влезает по площади, не поставить — не раздуваем список деталей
+        current = [dict(item, quantity=0 if index in excluded else
+                        min(remaining[index], int(sheet_area // (item['width'] * item['height']))))
+                   for index, item in enumerate(items)]
+        sheet = pack_sheet(width, height, current, allow_rotation, engine)
+        if not sheet['used']:
+            break
+        repeat = min(remaining[u['item_index']] // u['count'] for u in sheet['used'])
+        if repeat < 2:
+            excluded.update(u['item_index'] for u in sheet['used'] if remaining[u['item_index']] < 2 * u['count'])
+            continue
+        sheet['repeat'] = repeat
+        sheets.append(sheet)
+        for u in sheet['used']:
+            remaining[u['item_index']] -= u['count'] * repeat
+    return sheets, remaining
+
+
+def pack_bins(width, height, items, allow_rotation=True, engine='maxrects', improve_rounds=20, repeat=True):
+    """
+    Раскладывает весь спрос по материалу на листы width x height за один вызов.
+    При repeat=True одинаковые листы не строятся по одному: раскладка считается
+    один раз и хранится с числом повторов, остаток раскладывается отдельно.
+    Возвращает словарь:
+      sheets – список листов в формате nesting.pack_sheet; у повторяющихся листов
+        есть поле 'repeat' (см. count_sheets);
+      unplaced – детали, которые не помещаются даже на пустой лист, и детали
+        нулевого размера.
+    """
+    repeated = []
+    if repeat:
+        repeated, remaining = repeat_patterns(width, height, items, allow_rotation, engine)
+        items = [dict(item, quantity=quantity) for item, quantity in zip(items, remaining)]
+    multi = MultiSheetPacker(width, height, allow_rotation, engine)
+    pieces = expand_items(items)
+    degenerate = [p for p in pieces if p['width'] <= 0 or p['height'] <= 0]
+    multi.build([p for p in pieces if p['width'] > 0 and p['height'] > 0])
+    built = len(multi.sheets)
+    multi.improve(improve_rounds)
+    logging.debug(f"pack_bins ({engine}): {count_sheets(repeated)} sheets in {len(repeated)} repeated patterns, "
+                  f"{built} sheets after FFD, {len(multi.sheets)} after local search, "
+                  f"{len(degenerate) + len(multi.unplaced)} unplaced")
+    return {
+        'sheets': repeated + [sheet_result(packer) for packer in multi.sheets],
+        'unplaced': degenerate + multi.unplaced
+    }
+
+
+def repack_changed(width, height, sheets, old_items, new_items, allow_rotation=True, engine='maxrects'):
+    """
+    Пересчитывает план после изменения количеств позиций, не трогая остальные листы.
+    Перекладываются только листы с изменившимися позициями и последний (хвостовой) лист;
+    листы с 'locked' (уже раскроенные) остаются как есть, даже если в них есть изменённая позиция.
+    old_items и new_items – одни и те же позиции в том же порядке до и после изменения.
+    Возвращает словарь как у pack_bins и дополнительно:
+      repacked – сколько листов переложено;
+      surplus – {индекс позиции: лишние детали} на закреплённых листах при уменьшении количества.
+    """
+    changed = {i for i, (old, new) in enumerate(zip(old_items, new_items)) if old['quantity'] != new['quantity']}
+    if not changed:
+        return {'sheets': sheets, 'unplaced': [], 'repacked': 0, 'surplus': {}}
+    tail = max((n for n, sheet in enumerate(sheets) if not sheet.get('locked')), default=None)
+    kept = []
+    placed = [0] * len(new_items)
+    repacked = 0
+    for n, sheet in enumerate(sheets):
+        touched = n == tail or any(used['item_index'] in changed for used in sheet['used'])
+        if touched and not sheet.get('locked'):
+            repacked += sheet.get('repeat', 1)
+            continue
+        kept.append(sheet)
+        for used in sheet['used']:
+            placed[used['item_index']] += used['count'] * sheet.get('repeat', 1)
+    demand = [dict(item, quantity=max(item['quantity'] - count, 0)) for item, count in zip(new_items, placed)]
+    surplus = {i: count - item['quantity'] for i, (item, count) in enumerate(zip(new_items, placed))
+               if count > item['quantity']}
+    result = pack_bins(width, height, demand, allow_rotation, engine)
+    logging.debug(f"repack_changed: {len(changed)} changed items, {repacked} sheets repacked into "
+                  f"{count_sheets(result['sheets'])}, {count_sheets(kept)} kept")
+    return {
+        'sheets': kept + result['sheets'],
+        'unplaced': result['unplaced'],
+        'repacked': repacked,
+        'surplus': surplus
+    }
+
+
+def pack_offcuts(offcuts, items, allow_rotation=True, engine='maxrects'):
+    """
+    Раскладывает детали на обрезки до того, как открывать новые листы.
+    offcuts – обрезки одного материала (offcut_index.OffcutTree). Для самой крупной
+    оставшейся детали берётся самый подходящий обрезок, на него раскладывается всё,
+    что войдёт, и обрезок убирается из индекса.
+    Возвращает (листы-обрезки, остаток): у каждого листа есть 'offcut_id', 'width'
+    и 'height'; остаток – items с уменьшенными количествами.
+    """
+    remaining = [item['quantity'] for item in items]
+    sheets = []
+    skipped = []
+    # Позиции по убыванию площади; позиция, для которой нет обрезка, дальше не проверяется
+    for index in sorted(range(len(items)), key=lambda i: -items[i]['width'] * items[i]['height']):
+        while remaining[index] > 0:
+            offcut = offcuts.best_fit(items[index]['width'], items[index]['height'])
+            if offcut is None:
+                break
+            offcuts.remove(offcut['id'])
+            demand = [dict(item, quantity=count) for item, count in zip(items, remaining)]
+            sheet = pack_sheet(offcut['width'], offcut['height'], demand, allow_rotation, engine)
+            if not sheet['placements']:
+                # Без поворота деталь может не войти в обрезок, подобранный с поворотом
+                skipped.append(offcut)
+                continue
+            for used in sheet['used']:
+                remaining[used['item_index']] -= used['count']
+            sheets.append(dict(sheet, offcut_id=offcut['id'], width=offcut['width'], height=offcut['height']))
+    for offcut in skipped:
+        offcuts.insert(offcut['id'], offcut['width'], offcut['height'])
+    logging.debug(f"pack_offcuts: {len(sheets)} offcuts used, {len(offcuts)} left")
+    return sheets, [dict(item, quantity=count) for item, count in zip(items, remaining)]
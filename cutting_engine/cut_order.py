@@ -0,0 +1,102 @@
+import logging
+
+from .nesting import expand_items
+from .strip_packing import pack_strip
+
+# Сколько вариантов числа слоёв пробуется для каждой позиции: остаток, его половина, треть
+PLY_SPLITS = 3
+
+
+def _fits(item, roll_width, max_length, allow_rotation):
+    orientations = [(item['width'], item['height'])]
+    if allow_rotation:
+        orientations.append((item['height'], item['width']))
+    return any(w <= roll_width and (max_length is None or h <= max_length) for w, h in orientations)
+
+
+def _fit_marker(roll_width, items, ratio, max_length, allow_rotation, pack):
+    """
+    Раскладка (маркер) на одном слое с ratio деталями каждой позиции. Если маркер длиннее
+    max_length, состав пропорционально уменьшается, пока раскладка не уложится.
+    Возвращает (итоговый состав, результат pack).
+    """
+    while True:
+        marker = pack(roll_width, [dict(item, quantity=count) for item, count in zip(items, ratio)], allow_rotation)
+        if max_length is None or marker['length'] <= max_length:
+            return ratio, marker
+        scale = max_length / marker['length']
+        smaller = [int(count * scale) for count in ratio]
+        if smaller == ratio:
+            largest = max(range(len(ratio)), key=lambda i: ratio[i])
+            smaller[largest] -= 1
+        if not any(smaller):
+            # Одна деталь в длину маркера укладывается всегда (см. _fits)
+            smaller = [0] * len(ratio)
+            smaller[next(i for i, count in enumerate(ratio) if count)] = 1
+        ratio = smaller
+
+
+def plan_cut_order(roll_width, items, allow_rotation=True, max_plies=1, max_length=None, pack=pack_strip):
+    """
+    Планирование настилов (cut order planning): спрос items покрывается маркерами –
+    раскладками одного слоя длиной не больше max_length, – каждый из которых
+    настилается в plies слоёв (не больше max_plies) и режется сразу на всю высоту настила.
+    Жадно, пока спрос не покрыт: для нескольких вариантов числа слоёв (остатки позиций,
+    их половины и трети, но не больше max_plies) состав маркера – остаток // слоёв,
+    без перепроизводства; маркер раскладывается один раз (pack: strip_packing.pack_strip
+    или polygons.nest_strip для деталей с контурами) и берётся вариант с наибольшей площадью деталей за настил с поправкой на заполнение
+    маркера. Так число настилов и расход ткани получаются малыми.
+    Возвращает словарь в формате pack_strip:
+      markers – маркеры в формате листов: placements, used (детали одного слоя), area,
+        width, height – длина маркера, repeat – число слоёв;
+      unplaced – детали шире рулона или длиннее max_length и детали, которые pack
+        не смог уложить в маркер;
+      length – расход рулона (сумма длин маркеров на число слоёв); area – площадь деталей.
+    """
+    remaining = [int(item['quantity']) if _fits(item, roll_width, max_length, allow_rotation) else 0
+                 for item in items]
+    unplaced = expand_items([dict(item, quantity=0 if count else item['quantity'])
+                             for item, count in zip(items, remaining)])
+    markers = []
+    while any(remaining):
+        candidates = {min(max_plies, -(-count // split))
+                      for count in remaining if count for split in range(1, PLY_SPLITS + 1)}
+        best = None
+        for plies in sorted(candidates, reverse=True):
+            ratio = [count // plies for count in remaining]
+            if not any(ratio):
+                continue
+            ratio, marker = _fit_marker(roll_width, items, ratio, max_length, allow_rotation, pack)
+            fill = marker['area'] / (roll_width * marker['length'])
+            score = plies * marker['area'] * fill
+            if best is None or score > best[0]:
+                best = (score, plies, ratio, marker)
+        _, plies, ratio, marker = best
+        for used in marker['used']:
+            remaining[used['item_index']] -= plies * used['count']
+        # Детали, которые маркер не уложил (nest_strip не нашёл места по контуру), уходят
+        # в неразмещённые на все слои настила
+        for piece in marker['unplaced']:
+            remaining[piece['item_index']] -= plies
+            unplaced.extend(dict(piece) for _ in range(plies))
+        if not marker['placements']:
+            continue
+        sheet = {
+            'placements': marker['placements'],
+            'used': marker['used'],
+            'area': marker['area'],
+            'width': roll_width,
+            'height': marker['length']
+        }
+        if plies > 1:
+            sheet['repeat'] = plies
+        markers.append(sheet)
+    length = sum(marker['height'] * marker.get('repeat', 1) for marker in markers)
+    logging.debug(f"plan_cut_order: {len(markers)} spreads on roll {roll_width}, length {length}, "
+                  f"{len(unplaced)} unplaced")
+    return {
+        'markers': markers,
+        'unplaced': unplaced,
+        'length': length,
+        'area': sum(marker['area'] * marker.get('repeat', 1) for marker in markers)
+    }
@@ -0,0 +1,305 @@
+import logging
+import math
+import time
+
+from .binpacking import count_sheets, pack_bins
+from .nesting import expand_items, summarize_used
+
+# Допуск для вещественной арифметики симплекс-метода и двойственных цен
+EPS = 1e-9
+
+
+def _grid_step(values):
+    """
+    Шаг целой сетки для рюкзаков: НОД всех размеров в миллиметрах.
+    """
+    step = 0
+    for value in values:
+        step = math.gcd(step, value)
+    return step or 1
+
+
+def _unbounded_knapsack(capacity, options):
+    """
+    Неограниченный рюкзак: options – список (вес, ценность, объект).
+    Возвращает (лучшая ценность, список выбранных объектов).
+    """
+    best = [0.0] * (capacity + 1)
+    choice = [None] * (capacity + 1)
+    for c in range(1, capacity + 1):
+        best[c] = best[c - 1]
+        choice[c] = None
+        for index, (weight, value, _) in enumerate(options):
+            if weight <= c and best[c - weight] + value > best[c] + EPS:
+                best[c] = best[c - weight] + value
+                choice[c] = index
+    chosen = []
+    c = capacity
+    while c > 0:
+        if choice[c] is None:
+            c -= 1
+            continue
+        weight, _, obj = options[choice[c]]
+        chosen.append(obj)
+        c -= weight
+    return best[capacity], chosen
+
+
+class CuttingStockSolver:
+    """
+    Раскрой листов по Гилмору–Гомори для заказов с небольшим числом разных размеров.
+    Раскладка листа (паттерн) — двухстадийная гильотинная: лист режется на полосы
+    поперёк, полосы — на детали. Мастер-задача: минимум листов при покрытии спроса,
+    решается как ЛП через двойственную задачу симплекс-методом; новые паттерны
+    находятся двумя вложенными рюкзаками по двойственным ценам. Целочисленное решение —
+    округление вниз плюс эвристическая раскладка остатка (binpacking.pack_bins упаковщиком engine).
+    """
+
+    def __init__(self, width, height, items, allow_rotation=True, time_limit=2.0, engine='maxrects'):
+        self.width = width
+        self.height = height
+        self.allow_rotation = allow_rotation
+        # В мастер-задачу идут только детали, которые помещаются на лист: строка детали
+        # без паттернов делает ЛП неограниченной. item_index – их номера в items
+        self.item_index = [i for i, item in enumerate(items) if item['quantity'] > 0 and self._fits(item)]
+        self.items = [items[i] for i in self.item_index]
+        self.engine = engine
+        self.deadline = time.monotonic() + time_limit
+        self.step = _grid_step([width, height] + [v for item in self.items for v in (item['width'], item['height'])])
+        self.grid_width = width // self.step
+        self.grid_height = height // self.step
+        self.orientations = []
+        for index, item in enumerate(self.items):
+            sizes = [(False, item['width'], item['height'])]
+            if allow_rotation and item['width'] != item['height']:
+                sizes.append((True, item['height'], item['width']))
+            for rotated, w, h in sizes:
+                gw, gh = w // self.step, h // self.step
+                if gw <= self.grid_width and gh <= self.grid_height:
+                    self.orientations.append((index, rotated, w, h, gw, gh))
+        self.fitting = sorted({o[0] for o in self.orientations})
+        self.patterns = []
+
+    def _fits(self, item):
+        if item['width'] <= 0 or item['height'] <= 0:
+            return False
+        if item['width'] <= self.width and item['height'] <= self.height:
+            return True
+        return self.allow_rotation and item['height'] <= self.width and item['width'] <= self.height
+
+    def timed_out(self):
+        return time.monotonic() > self.deadline
+
+    def price(self, duals):
+        """
+        Паттерн с максимальной суммой двойственных цен деталей.
+        Возвращает (ценность, паттерн) или (0, None).
+        """
+        strips = []
+        for strip_height in sorted({o[5] for o in self.orientations}):
+            options = [(o[4], duals[o[0]], o) for o in self.orientations
+                       if o[5] <= strip_height and duals[o[0]] > EPS]
+            if not options:
+                continue
+            value, chosen = _unbounded_knapsack(self.grid_width, options)
+            if value > EPS:
+                strips.append((strip_height, value, chosen))
+        if not strips:
+            return 0, None
+        value, chosen = _unbounded_knapsack(self.grid_height, strips)
+        return value, self._make_pattern(chosen)
+
+    def _make_pattern(self, strips):
+        counts = [0] * len(self.items)
+        placements = []
+        y = 0
+        for pieces in strips:
+            x = 0
+            strip_height = 0
+            for index, rotated, w, h, _, _ in pieces:
+                counts[index] += 1
+                placements.append({
+                    'x': x,
+                    'y': y,
+                    'width': w,
+                    'height': h,
+                    'rotated': rotated,
+                    'name': self.items[index]['name'],
+                    'item_index': index
+                })
+                x += w
+                strip_height = max(strip_height, h)
+            y += strip_height
+        return {'counts': counts, 'placements': placements}
+
+    def solve_lp(self):
+        """
+        Решает двойственную ЛП: max d·y при a_p·y <= 1 для каждого паттерна p, y >= 0.
+        Возвращает (значение ЛП, двойственные цены y, число листов x по паттернам).
+        """
+        rows = len(self.patterns)
+        cols = len(self.items)
+        width = cols + rows
+        tableau = []
+        for p, pattern in enumerate(self.patterns):
+            row = [float(a) for a in pattern['counts']] + [0.0] * rows + [1.0]
+            row[cols + p] = 1.0
+            tableau.append(row)
+        objective = [-float(item['quantity']) for item in self.items] + [0.0] * (rows + 1)
+        basis = [cols + p for p in range(rows)]
+        while True:
+            # Правило Бленда: первый столбец с отрицательной оценкой — без зацикливания
+            entering = next((j for j in range(width) if objective[j] < -EPS), None)
+            if entering is None:
+                break
+            leaving = None
+            best_ratio = None
+            for r in range(rows):
+                coef = tableau[r][entering]
+                if coef > EPS:
+                    ratio = tableau[r][-1] / coef
+                    if best_ratio is None or ratio < best_ratio - EPS or (abs(ratio - best_ratio) <= EPS and basis[r] < basis[leaving]):
+                        best_ratio = ratio
+                        leaving = r
+            if leaving is None:
+                raise ValueError("Cutting stock LP is unbounded")
+            pivot_row = tableau[leaving]
+            pivot = pivot_row[entering]
+            for j in range(width + 1):
+                pivot_row[j] /= pivot
+            for r in range(rows):
+                if r != leaving and abs(tableau[r][entering]) > EPS:
+                    factor = tableau[r][entering]
+                    row = tableau[r]
+                    for j in range(width + 1):
+                        row[j] -= factor * pivot_row[j]
+            factor = objective[entering]
+            for j in range(width + 1):
+                objective[j] -= factor * pivot_row[j]
+            basis[leaving] = entering
+        duals = [0.0] * cols
+        for r, var in enumerate(basis):
+            if var < cols:
+                duals[var] = tableau[r][-1]
+        usage = [objective[cols + p] for p in range(rows)]
+        return objective[-1], duals, usage
+
+    def solve(self):
+        """
+        Генерация столбцов до оптимальности ЛП или до исчерпания бюджета времени.
+        Возвращает словарь: status ('optimal' | 'timeout'), lp_bound, usage.
+        """
+        for index in self.fitting:
+            duals = [0.0] * len(self.items)
+            duals[index] = 1.0
+            self.patterns.append(self.price(duals)[1])
+        while True:
+            lp_value, duals, usage = self.solve_lp()
+            if self.timed_out():
+                return {'status': 'timeout', 'lp_bound': None, 'usage': usage}
+            value, pattern = self.price(duals)
+            if pattern is None or value <= 1 + 1e-7:
+                return {'status': 'optimal', 'lp_bound': lp_value, 'usage': usage}
+            self.patterns.append(pattern)
+
+    def round_solution(self, usage):
+        """
+        Округляет ЛП-решение вниз, лишние детали паттернов отбрасывает,
+        недостающие раскладывает эвристикой. Паттерн, который целиком нужен n раз,
+        возвращается одним листом с 'repeat': n. Возвращает (листы, неразмещённые детали).
+        """
+        remaining = [item['quantity'] for item in self.items]
+        sheets = []
+        for pattern, amount in zip(self.patterns, usage):
+            copies = int(math.floor(amount + 1e-9))
+            full = min([copies] + [remaining[i] // count for i, count in enumerate(pattern['counts']) if count > 0])
+            if full > 0:
+                placements = [dict(p) for p in pattern['placements']]
+                sheets.append({
+                    'placements': placements,
+                    'used': summarize_used(placements),
+                    'free_space': [],
+                    'area': sum(p['width'] * p['height'] for p in placements),
+                    'repeat': full
+                })
+                for i, count in enumerate(pattern['counts']):
+                    remaining[i] -= count * full
+            for _ in range(copies - full):
+                placements = []
+                for p in pattern['placements']:
+                    if remaining[p['item_index']] > 0:
+                        remaining[p['item_index']] -= 1
+                        placements.append(dict(p))
+                if not placements:
+                    break
+                sheets.append({
+                    'placements': placements,
+                    'used': summarize_used(placements),
+                    'free_space': [],
+                    'area': sum(p['width'] * p['height'] for p in placements)
+                })
+        residual = [dict(item, quantity=count) for item, count in zip(self.items, remaining) if count > 0]
+        tail = pack_bins(self.width, self.height, residual, self.allow_rotation, self.engine)
+        # Индексы позиций в хвосте относятся к residual — возвращаем их к self.items
+        residual_index = [i for i, count in enumerate(remaining) if count > 0]
+        for sheet in tail['sheets']:
+            for p in sheet['placements']:
+                p['item_index'] = residual_index[p['item_index']]
+            sheet['used'] = summarize_used(sheet['placements'])
+        for piece in tail['unplaced']:
+            piece['item_index'] = residual_index[piece['item_index']]
+        return sheets + tail['sheets'], tail['unplaced']
+
+
+def solve_cutting_stock(width, height, items, allow_rotation=True, time_limit=2.0, engine='maxrects'):
+    """
+    Точный (по ЛП-оценке) раскрой листов width x height для позиций items.
+    Всегда считает и эвристический план pack_bins (упаковщик engine) и возвращает лучший из двух.
+    Паттерны генерации столбцов – полосы, то есть двухстадийные гильотинные раскладки.
+    Возвращает словарь:
+      sheets, unplaced – как у binpacking.pack_bins (item_index относится к items;
+        детали крупнее листа и нулевого размера всегда попадают в unplaced);
+      lp_bound – значение ЛП-релаксации (None, если бюджет времени исчерпан). Это нижняя
+        граница для двухстадийных гильотинных планов; свободная раскладка pack_bins
+        может оказаться и лучше неё;
+      lower_bound – площадная нижняя граница числа листов, верная для любого плана;
+      status – 'optimal' (ЛП решена), 'timeout' (бюджет исчерпан, взят эвристический план),
+        'heuristic' (ни одна деталь не помещается на лист, ЛП не решалась);
+      method – 'column_generation' или 'heuristic'.
+    """
+    heuristic = pack_bins(width, height, items, allow_rotation, engine)
+    solver = CuttingStockSolver(width, height, items, allow_rotation, time_limit, engine)
+    area_bound = -(-sum(item['width'] * item['height'] * item['quantity'] for item in solver.items) // (width * height))
+    result = {
+        'sheets': heuristic['sheets'],
+        'unplaced': heuristic['unplaced'],
+        'lp_bound': None,
+        'lower_bound': area_bound,
+        'status': 'heuristic',
+        'method': 'heuristic'
+    }
+    if not solver.fitting:
+        return result
+    solved = solver.solve()
+    result['status'] = solved['status']
+    if solved['status'] != 'optimal':
+        logging.debug(f"solve_cutting_stock: time budget {time_limit}s exceeded, using heuristic plan")
+        return result
+    result['lp_bound'] = solved['lp_bound']
+    sheets, unplaced = solver.round_solution(solved['usage'])
+    for sheet in sheets:
+        for p in sheet['placements']:
+            p['item_index'] = solver.item_index[p['item_index']]
+        sheet['used'] = summarize_used(sheet['placements'])
+    for piece in unplaced:
+        piece['item_index'] = solver.item_index[piece['item_index']]
+    placed = set(solver.item_index)
+    unplaced += expand_items([item if index not in placed else dict(item, quantity=0)
+                              for index, item in enumerate(items)])
+    if count_sheets(sheets) < count_sheets(heuristic['sheets']):
+        result['sheets'] = sheets
+        result['unplaced'] = unplaced
+        result['method'] = 'column_generation'
+    logging.debug(f"solve_cutting_stock: LP bound {solved['lp_bound']:.3f}, column generation {count_sheets(sheets)} sheets, "
+                  f"heuristic {count_sheets(heuristic['sheets'])} sheets, {len(solver.patterns)} patterns")
+    return result
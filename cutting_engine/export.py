@@ -0,0 +1,95 @@
+import logging
+import os
+import re
+
+from .toolpath import tool_path
+
+
+def _dxf_lines(width, height, path):
+    """
+    DXF R12 построчно: контур листа в слое SHEET, резы по порядку в слое CUT. Единицы – мм.
+    """
+    yield from ('0', 'SECTION', '2', 'HEADER', '9', '$INSUNITS', '70', '4', '0', 'ENDSEC')
+    yield from ('0', 'SECTION', '2', 'ENTITIES')
+    corners = [(0, 0), (width, 0), (width, height), (0, height)]
+    lines = [('SHEET', corners[i], corners[(i + 1) % 4]) for i in range(4)]
+    for layer, start, end in lines + [('CUT', start, end) for start, end in path['cuts']]:
+        yield from ('0', 'LINE', '8', layer,
+                    '10', f"{start[0]:g}", '20', f"{start[1]:g}", '30', '0',
+                    '11', f"{end[0]:g}", '21', f"{end[1]:g}", '31', '0')
+    yield from ('0', 'ENDSEC', '0', 'EOF')
+
+
+def _svg_lines(width, height, path):
+    """
+    SVG построчно: лист, резы одним контуром в порядке резки и холостые переходы пунктиром.
+    Ось y направлена вверх, как на карте раскроя.
+    """
+    yield '<?xml version="1.0" encoding="UTF-8"?>'
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}mm" height="{height}mm" '
+           f'viewBox="0 0 {width} {height}">')
+    yield f'<g transform="matrix(1 0 0 -1 0 {height})" fill="none">'
+    yield f'<rect x="0" y="0" width="{width}" height="{height}" stroke="black"/>'
+    position = (0, 0)
+    for start, end in path['cuts']:
+        if start != position:
+            yield (f'<line x1="{position[0]:g}" y1="{position[1]:g}" x2="{start[0]:g}" y2="{start[1]:g}" '
+                   f'stroke="grey" stroke-dasharray="4 4"/>')
+        yield (f'<line x1="{start[0]:g}" y1="{start[1]:g}" x2="{end[0]:g}" y2="{end[1]:g}" '
+               f'stroke="red"/>')
+        position = end
+    yield '</g>'
+    yield '</svg>'
+
+
+WRITERS = {
+    'dxf': _dxf_lines,
+    'svg': _svg_lines
+}
+
+
+def write_path(filename, width, height, path, fmt):
+    """
+    Записывает маршрут листа в файл формата fmt ('dxf' или 'svg') построчно,
+    не собирая файл в памяти.
+    """
+    with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+        for line in WRITERS[fmt](width, height, path):
+            f.write(line)
+            f.write('\n')
+
+
+def _file_stem(text):
+    return re.sub(r'[^\w.-]+', '_', str(text)).strip('_') or 'sheet'
+
+
+def export_plan(plan, directory, prefix, formats=('dxf', 'svg')):
+    """
+    Экспорт плана материала (planning.plan_material['plan'] с 'offcut_sheets') для станка:
+    на каждое полотно и обрезок – по файлу каждого формата из formats в directory,
+    имя – prefix, номер полотна и число повторов раскладки.
+    Маршрут строится и пишется по одному полотну, поэтому большие планы не держатся
+    в памяти целиком. Размеры в файлах – мм.
+    Возвращает [(имя файла, длина резов, холостой ход)]; длина и ход – на все повторы
+    раскладки ('repeat'). У маркеров (план с 'spreads') repeat – слои одного настила,
+    которые режутся за один проход, поэтому их длина не умножается.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stem = _file_stem(prefix)
+    sheets = [(f"offcut{sheet['offcut_id']}", sheet) for sheet in plan.get('offcut_sheets', [])]
+    sheets += [(f"sheet{number}", sheet) for number, sheet in enumerate(plan['sheets'], 1)]
+    written = []
+    for name, sheet in sheets:
+        width = sheet.get('width', plan['width'])
+        height = sheet.get('height', plan['height'])
+        path = tool_path(width, height, sheet['placements'], sheet.get('cuts'))
+        repeat = sheet.get('repeat', 1)
+        base = f"{stem}_{name}" + (f"_x{repeat}" if repeat > 1 else "")
+        passes = 1 if 'spreads' in plan else repeat
+        for fmt in formats:
+            filename = os.path.join(directory, f"{base}.{fmt}")
+            write_path(filename, width, height, path, fmt)
+            written.append((filename, path['cut_length'] * passes, path['travel'] * passes))
+        logging.debug(f"Exported {base}: {len(path['cuts'])} cuts, length {path['cut_length']}, "
+                      f"travel {path['travel']}")
+    return written
@@ -0,0 +1,181 @@
+from .nesting import summarize_used
+
+
+def _cut_positions(start, end, spans):
+    """
+    Координаты сквозных резов внутри (start, end), не пересекающих ни одного отрезка spans:
+    границы объединения отрезков деталей вдоль оси.
+    """
+    merged = []
+    for low, high in sorted(spans):
+        if merged and low < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    positions = {bound for span in merged for bound in span if start < bound < end}
+    return sorted(positions)
+
+
+def _split(x, y, width, height, placements, direction):
+    """
+    Делит область всеми резами направления direction сразу: 'x' – резы вдоль оси y
+    на координатах x, 'y' – вдоль оси x на координатах y.
+    Возвращает (резы, области [(x, y, w, h, размещения)]) или None, если резов нет.
+    """
+    if direction == 'x':
+        positions = _cut_positions(x, x + width, [(p['x'], p['x'] + p['width']) for p in placements])
+    else:
+        positions = _cut_positions(y, y + height, [(p['y'], p['y'] + p['height']) for p in placements])
+    if not positions:
+        return None
+    bounds = [x if direction == 'x' else y] + positions + [x + width if direction == 'x' else y + height]
+    regions = []
+    for low, high in zip(bounds, bounds[1:]):
+        if direction == 'x':
+            inside = [p for p in placements if low <= p['x'] < high]
+            regions.append((low, y, high - low, height, inside))
+        else:
+            inside = [p for p in placements if low <= p['y'] < high]
+            regions.append((x, low, width, high - low, inside))
+    return positions, regions
+
+
+def cut_tree(width, height, placements, first='y'):
+    """
+    Дерево гильотинных (сквозных, от края до края) резов листа width x height с размещениями placements.
+    Узел – область {'x', 'y', 'width', 'height', 'stage'}: лист делится всеми резами одного
+    направления сразу (стадия 1), каждая полоса – резами другого направления (стадия 2) и т. д.
+    У внутреннего узла есть 'direction' ('x' – резы поперёк оси x, 'y' – поперёк оси y),
+    'cuts' – координаты резов и 'children' – получившиеся области; у листа дерева –
+    'placement' (индекс детали в placements или None для отхода). first – направление резов первой стадии.
+    Возвращает None, если раскладку нельзя раскроить гильотинными резами.
+    """
+    def build(x, y, w, h, inside, stage, direction):
+        node = {'x': x, 'y': y, 'width': w, 'height': h, 'stage': stage}
+        if not inside:
+            node['placement'] = None
+            return node
+        if len(inside) == 1 and (inside[0]['width'], inside[0]['height']) == (w, h):
+            node['placement'] = inside[0]['index']
+            return node
+        other = 'y' if direction == 'x' else 'x'
+        for candidate in (direction, other):
+            split = _split(x, y, w, h, inside, candidate)
+            if split is None:
+                continue
+            positions, regions = split
+            children = []
+            for region in regions:
+                child = build(*region, stage + 1, 'y' if candidate == 'x' else 'x')
+                if child is None:
+                    return None
+                children.append(child)
+            node.update(direction=candidate, cuts=positions, children=children)
+            return node
+        return None
+
+    pieces = [{'x': p['x'], 'y': p['y'], 'width': p['width'], 'height': p['height'], 'index': index}
+              for index, p in enumerate(placements)]
+    return build(0, 0, width, height, pieces, 1, first)
+
+
+def _segments(node):
+    """
+    Резы узла отрезками ((x1, y1), (x2, y2)) в порядке координат.
+    """
+    if node['direction'] == 'x':
+        return [((c, node['y']), (c, node['y'] + node['height'])) for c in node['cuts']]
+    return [((node['x'], c), (node['x'] + node['width'], c)) for c in node['cuts']]
+
+
+def _distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def _rect_distance(point, node):
+    dx = max(node['x'] - point[0], 0, point[0] - node['x'] - node['width'])
+    dy = max(node['y'] - point[1], 0, point[1] - node['y'] - node['height'])
+    return dx + dy
+
+
+def cut_sequence(tree):
+    """
+    Порядок резов по дереву cut_tree. Резы узла выполняются раньше резов его областей.
+    Чтобы сократить холостой ход ножа, параллельные резы узла идут змейкой, начиная
+    с ближнего к ножу конца, а области обходятся жадно – следующей берётся ближайшая.
+    Расстояния – манхэттенские (нож двигается по двум осям стола).
+    Возвращает словарь:
+      cuts – [{'stage', 'x1', 'y1', 'x2', 'y2'}] в порядке выполнения;
+      cut_length – суммарная длина резов, travel – холостой ход ножа, stages – число стадий.
+    """
+    cuts = []
+    state = {'position': (0, 0), 'travel': 0, 'stages': 0}
+
+    def visit(node):
+        if 'cuts' not in node:
+            return
+        position = state['position']
+        segments = _segments(node)
+        if _distance(position, segments[-1][0]) < _distance(position, segments[0][0]):
+            segments.reverse()
+        for start, end in segments:
+            if _distance(position, end) < _distance(position, start):
+                start, end = end, start
+            state['travel'] += _distance(position, start)
+            cuts.append({'stage': node['stage'], 'x1': start[0], 'y1': start[1], 'x2': end[0], 'y2': end[1]})
+            position = end
+        state['position'] = position
+        state['stages'] = max(state['stages'], node['stage'])
+        pending = [child for child in node['children'] if 'cuts' in child]
+        while pending:
+            child = min(pending, key=lambda child: _rect_distance(state['position'], child))
+            pending.remove(child)
+            visit(child)
+
+    visit(tree)
+    return {
+        'cuts': cuts,
+        'cut_length': sum(_distance((c['x1'], c['y1']), (c['x2'], c['y2'])) for c in cuts),
+        'travel': state['travel'],
+        'stages': state['stages']
+    }
+
+
+def shelf_sheets(sheet, width, height):
+    """
+    Перекладывает детали листа sheet полками – заведомо гильотинная раскладка:
+    полосы поперёк листа высотой по самой высокой детали, в полосе детали слева направо.
+    Детали сохраняют ориентацию, поэтому каждая помещается на лист width x height.
+    Если полками всё не помещается, заводятся следующие листы с теми же полями листа
+    (партия, повтор и т. п.). Возвращает список листов в формате nesting.pack_sheet.
+    """
+    placements = sorted(sheet['placements'], key=lambda p: (-p['height'], -p['width']))
+    pages = [[]]
+    x = y = shelf = 0
+    for p in placements:
+        if x + p['width'] > width:
+            x, y, shelf = 0, y + shelf, 0
+        if y + p['height'] > height:
+            pages.append([])
+            x = y = shelf = 0
+        pages[-1].append(dict(p, x=x, y=y))
+        x += p['width']
+        shelf = max(shelf, p['height'])
+    base = {key: value for key, value in sheet.items()
+            if key not in ('cut_tree', 'cuts', 'cut_length', 'travel', 'stages')}
+    return [dict(base, placements=page, used=summarize_used(page), free_space=[],
+                 area=sum(p.get('area', p['width'] * p['height']) for p in page))
+            for page in pages]
+
+
+def add_cuts(sheet, width, height):
+    """
+    Дополняет лист (формат nesting.pack_sheet) деревом резов 'cut_tree' и полями cut_sequence.
+    Возвращает False, если раскладка не гильотинная (лист не меняется).
+    """
+    tree = cut_tree(width, height, sheet['placements'])
+    if tree is None:
+        return False
+    sheet['cut_tree'] = tree
+    sheet.update(cut_sequence(tree))
+    return True
@@ -0,0 +1,148 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import as_completed
+
+from .binpacking import MultiSheetPacker, count_sheets, merge_repeats, pack_bins
+from .nesting import expand_items, sheet_result
+from .workers import process_pool
+
+
+def _build(width, height, pieces, order, allow_rotation, engine):
+    multi = MultiSheetPacker(width, height, allow_rotation, engine)
+    multi.build([pieces[i] for i in order])
+    return multi
+
+
+def _score(multi, width, height):
+    """
+    Оценка плана (меньше — лучше): число листов минус средний квадрат заполнения.
+    Второе слагаемое меньше единицы и поощряет планы, где последний лист почти пуст, —
+    из них поиск быстрее находит план на лист меньше.
+    """
+    if not multi.sheets:
+        return 0.0
+    sheet_area = width * height
+    fill = sum((packer.used_area() / sheet_area) ** 2 for packer in multi.sheets) / len(multi.sheets)
+    return len(multi.sheets) + len(multi.unplaced) - fill
+
+
+def _anneal(width, height, pieces, allow_rotation, engine, start_order, duration, seed):
+    """
+    Имитация отжига по порядку подачи деталей в упаковщик. Выполняется в процессе пула.
+    Возвращает (лучшая оценка, лучший порядок).
+    """
+    rng = random.Random(seed)
+    order = list(start_order)
+    current = _score(_build(width, height, pieces, order, allow_rotation, engine), width, height)
+    best_score, best_order = current, list(order)
+    n = len(order)
+    if n < 2:
+        return best_score, best_order
+    started = time.monotonic()
+    initial_temperature, final_temperature = 0.05, 0.001
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= duration:
+            break
+        temperature = initial_temperature + (final_temperature - initial_temperature) * elapsed / duration
+        candidate = list(order)
+        i, j = rng.randrange(n), rng.randrange(n)
+        if rng.random() < 0.5:
+            candidate[i], candidate[j] = candidate[j], candidate[i]
+        else:
+            # Переносим деталь на новое место в последовательности
+            candidate.insert(j, candidate.pop(i))
+        score = _score(_build(width, height, pieces, candidate, allow_rotation, engine), width, height)
+        if score <= current or rng.random() < math.exp((current - score) / temperature):
+            order, current = candidate, score
+            if score < best_score:
+                best_score, best_order = score, list(candidate)
+    return best_score, best_order
+
+
+class AnytimeNester:
+    """
+    Фоновая оптимизация раскроя материала: имитация отжига по порядку деталей
+    в пуле процессов на все ядра. Работает раундами по round_time секунд; после
+    каждого раунда лучший найденный план публикуется через on_improvement, а все
+    процессы следующего раунда стартуют с него. stop() прерывает поиск после
+    текущего раунда; лучший план при этом не теряется. Поиск не начинается или
+    заканчивается, как только число листов дошло до нижней границы: площадной
+    или lower_bound (например, округлённой границы ЛП точного раскроя).
+    """
+
+    def __init__(self, width, height, items, time_budget=20.0, workers=None,
+                 round_time=1.0, allow_rotation=True, engine='maxrects', lower_bound=0):
+        self.width = width
+        self.height = height
+        self.items = items
+        self.time_budget = time_budget
+        self.workers = workers or os.cpu_count() or 1
+        self.round_time = round_time
+        self.allow_rotation = allow_rotation
+        self.engine = engine
+        self.pieces = expand_items(items)
+        area_bound = -(-sum(p['width'] * p['height'] for p in self.pieces) // (width * height))
+        self.lower_bound = max(area_bound, lower_bound)
+        self.best = None
+        self.best_score = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _publish(self, score, plan, on_improvement):
+        self.best_score = score
+        self.best = plan
+        logging.debug(f"AnytimeNester: best plan {count_sheets(plan['sheets'])} sheets, score {score:.4f}")
+        if on_improvement is not None:
+            on_improvement(plan)
+
+    def run(self, on_improvement=None):
+        """
+        Ищет план до исчерпания бюджета или до stop(). Возвращает лучший план
+        в формате binpacking.pack_bins.
+        """
+        deadline = time.monotonic() + self.time_budget
+        baseline = pack_bins(self.width, self.height, self.items, self.allow_rotation, self.engine)
+        sheet_area = self.width * self.height
+        sheets_count = count_sheets(baseline['sheets'])
+        fill = sum(sheet.get('repeat', 1) * (sheet['area'] / sheet_area) ** 2
+                   for sheet in baseline['sheets']) / max(sheets_count, 1)
+        self._publish(sheets_count + len(baseline['unplaced']) - fill, baseline, on_improvement)
+        if sheets_count <= self.lower_bound:
+            logging.debug(f"AnytimeNester: plan already at lower bound {self.lower_bound}")
+            return self.best
+
+        best_order = list(range(len(self.pieces)))
+        round_number = 0
+        with process_pool(self.workers) as pool:
+            while not self.stopped() and count_sheets(self.best['sheets']) > self.lower_bound:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                duration = min(self.round_time, remaining)
+                futures = [
+                    pool.submit(_anneal, self.width, self.height, self.pieces, self.allow_rotation, self.engine,
+                                best_order, duration, round_number * self.workers + worker)
+                    for worker in range(self.workers)
+                ]
+                for future in as_completed(futures):
+                    score, order = future.result()
+                    if score < self.best_score - 1e-9:
+                        best_order = order
+                        multi = _build(self.width, self.height, self.pieces, order, self.allow_rotation, self.engine)
+                        plan = {
+                            'sheets': merge_repeats([sheet_result(packer) for packer in multi.sheets]),
+                            'unplaced': multi.unplaced
+                        }
+                        self._publish(score, plan, on_improvement)
+                round_number += 1
+        return self.best
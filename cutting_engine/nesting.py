@@ -0,0 +1,338 @@
+import logging
+
+from .spatial import UniformGrid
+
+# Все размеры в упаковщиках — целые миллиметры (см. units.py), поэтому
+# проверки «влезает / касается» точные и обходятся без допусков.
+
+# Шаг сетки индекса свободных прямоугольников MaxRects: столько ячеек по длинной стороне листа.
+# Максимальные свободные прямоугольники длинные, поэтому сетка крупнее деталей.
+# Пока свободных прямоугольников не больше FREE_INDEX_MIN, их быстрее перебрать подряд
+FREE_INDEX_CELLS = 8
+FREE_INDEX_MIN = 128
+
+
+def expand_items(items):
+    """
+    Разворачивает список позиций ({'name', 'width', 'height', 'quantity'})
+    в список отдельных деталей, отсортированный по убыванию площади.
+    Порядок важен: крупные детали выгоднее ставить первыми.
+    """
+    pieces = []
+    for index, item in enumerate(items):
+        for _ in range(int(item['quantity'])):
+            pieces.append({
+                'item_index': index,
+                'name': item['name'],
+                'width': item['width'],
+                'height': item['height']
+            })
+    pieces.sort(key=lambda p: (-p['width'] * p['height'], -max(p['width'], p['height'])))
+    return pieces
+
+
+def summarize_used(placements):
+    """
+    Сводит размещения в список {'name', 'count', 'item_index'} в порядке первого появления.
+    """
+    used = {}
+    for p in placements:
+        key = p.get('item_index', p['name'])
+        if key not in used:
+            used[key] = {'name': p['name'], 'count': 0, 'item_index': p.get('item_index')}
+        used[key]['count'] += 1
+    return list(used.values())
+
+
+class SheetPacker:
+    """
+    Общая часть упаковщиков одного листа: размеры, список размещений, ориентации детали.
+    """
+
+    def __init__(self, width, height, allow_rotation=True):
+        self.width = width
+        self.height = height
+        self.allow_rotation = allow_rotation
+        self.free_space = [(0, 0, width, height)]
+        self.placements = []
+        # Размеры деталей, которые на этот лист уже не встали
+        self.failed_sizes = set()
+
+    def _orientations(self, width, height):
+        yield False, width, height
+        if self.allow_rotation and width != height:
+            yield True, height, width
+
+    def _make_placement(self, x, y, width, height, rotated, name, extra):
+        placement = {
+            'x': x,
+            'y': y,
+            'width': width,
+            'height': height,
+            'rotated': rotated,
+            'name': name
+        }
+        placement.update(extra)
+        self.placements.append(placement)
+        return placement
+
+    def used_area(self):
+        return sum(p['width'] * p['height'] for p in self.placements)
+
+    def snapshot(self):
+        """
+        Запоминает состояние листа, чтобы откатить пробные вставки через restore().
+        """
+        return list(self.free_space), len(self.placements)
+
+    def restore(self, state):
+        free_space, placed_count = state
+        self.free_space = list(free_space)
+        del self.placements[placed_count:]
+
+
+class GuillotinePacker(SheetPacker):
+    """
+    Гильотинная укладка прямоугольных деталей на один лист.
+    Свободное место хранится списком непересекающихся прямоугольников (x, y, w, h);
+    каждая поставленная деталь делит выбранный прямоугольник сквозным резом на две части.
+    Выбор места — best-area-fit, направление реза — по короткому остатку.
+    """
+
+    def _find_position(self, width, height):
+        best = None
+        for index, (fx, fy, fw, fh) in enumerate(self.free_space):
+            for rotated, pw, ph in self._orientations(width, height):
+                if pw <= fw and ph <= fh:
+                    score = (fw * fh - pw * ph, min(fw - pw, fh - ph))
+                    if best is None or score < best[0]:
+                        best = (score, index, pw, ph, rotated)
+        return best
+
+    def insert(self, name, width, height, **extra):
+        """
+        Ставит деталь на лист. Возвращает словарь размещения или None, если места нет.
+        """
+        best = self._find_position(width, height)
+        if best is None:
+            return None
+        _, index, pw, ph, rotated = best
+        fx, fy, fw, fh = self.free_space[index]
+        # Удаление без сдвига списка: на место выбранного ставим последний элемент
+        self.free_space[index] = self.free_space[-1]
+        self.free_space.pop()
+        self._split(fx, fy, fw, fh, pw, ph)
+        return self._make_placement(fx, fy, pw, ph, rotated, name, extra)
+
+    def _split(self, fx, fy, fw, fh, pw, ph):
+        leftover_w = fw - pw
+        leftover_h = fh - ph
+        if leftover_w < leftover_h:
+            # Горизонтальный рез: справа узкая полоса высотой детали, сверху — на всю ширину
+            right = (fx + pw, fy, leftover_w, ph)
+            top = (fx, fy + ph, fw, leftover_h)
+        else:
+            # Вертикальный рез: справа — на всю высоту, сверху — шириной детали
+            right = (fx + pw, fy, leftover_w, fh)
+            top = (fx, fy + ph, pw, leftover_h)
+        # Соседние свободные прямоугольники не сливаются: они лежат в разных ветвях дерева
+        # резов, и деталь поперёк их общей стороны разрезал бы более ранний сквозной рез.
+        # Две части одного разреза общей стороны целиком не имеют – между ними деталь
+        for rect in (right, top):
+            if rect[2] > 0 and rect[3] > 0:
+                self.free_space.append(rect)
+
+
+class MaxRectsPacker(SheetPacker):
+    """
+    Укладка MaxRects: свободное место — список максимальных (возможно пересекающихся)
+    свободных прямоугольников. Ориентация выбирается для каждой детали отдельно.
+    Эвристики выбора места: 'bssf' (best short side fit) и 'baf' (best area fit).
+    Когда свободных прямоугольников становится много (плотные листы с тысячами мелких
+    деталей), они раскладываются в равномерную сетку (spatial.UniformGrid): поставленная
+    деталь и проверка вложенности затрагивают только соседние прямоугольники, а не все.
+    """
+
+    def __init__(self, width, height, allow_rotation=True, heuristic='bssf'):
+        super().__init__(width, height, allow_rotation)
+        if heuristic not in ('bssf', 'baf'):
+            raise ValueError(f"Unknown MaxRects heuristic: {heuristic}")
+        self.heuristic = heuristic
+
+    @property
+    def free_space(self):
+        return list(self._free)
+
+    @free_space.setter
+    def free_space(self, rects):
+        # Прямоугольник -> порядковый номер: порядок списка свободных мест сохраняется
+        self._free = {rect: serial for serial, rect in enumerate(rects)}
+        self._serial = len(self._free)
+        self.free_index = None
+        self._build_index()
+
+    def _build_index(self):
+        if self.free_index is not None or len(self._free) <= FREE_INDEX_MIN:
+            return
+        self.free_index = UniformGrid(-(-max(self.width, self.height) // FREE_INDEX_CELLS))
+        for rect in self._free:
+            self.free_index.insert(rect, *rect)
+
+    def _score(self, fw, fh, pw, ph):
+        leftover_w = fw - pw
+        leftover_h = fh - ph
+        short_side = min(leftover_w, leftover_h)
+        if self.heuristic == 'baf':
+            return fw * fh - pw * ph, short_side
+        return short_side, max(leftover_w, leftover_h)
+
+    def _find_position(self, width, height):
+        best = None
+        orientations = list(self._orientations(width, height))
+        for fx, fy, fw, fh in self._free:
+            for rotated, pw, ph in orientations:
+                if pw <= fw and ph <= fh:
+                    # При равной оценке предпочитаем место ниже и левее
+                    score = (self._score(fw, fh, pw, ph), fy, fx)
+                    if best is None or score < best[0]:
+                        best = (score, fx, fy, pw, ph, rotated)
+        return best
+
+    def insert(self, name, width, height, **extra):
+        """
+        Ставит деталь на лист. Возвращает словарь размещения или None, если места нет.
+        """
+        best = self._find_position(width, height)
+        if best is None:
+            return None
+        _, x, y, pw, ph, rotated = best
+        self._place_rect(x, y, pw, ph)
+        return self._make_placement(x, y, pw, ph, rotated, name, extra)
+
+    def _place_rect(self, x, y, w, h):
+        """
+        Вычитает поставленную деталь из свободных прямоугольников и отбрасывает вложенные.
+        Старые прямоугольники, не задетые деталью, максимальны и друг в друга не вложены,
+        поэтому новые части сравниваются только с ними и между собой — без полного O(n²) прохода.
+        Задетые и содержащие новую часть прямоугольники берутся из индекса free_index.
+        """
+        new_rects = []
+        right = x + w
+        top = y + h
+        index = self.free_index
+        if index is not None:
+            hit = sorted(index.query(x, y, w, h), key=self._free.get)
+        else:
+            hit = [rect for rect in self._free
+                   if rect[0] < right and x < rect[0] + rect[2] and rect[1] < top and y < rect[1] + rect[3]]
+        for rect in hit:
+            if index is not None:
+                index.remove(rect)
+            del self._free[rect]
+        for rect in hit:
+            fx, fy, fw, fh = rect
+            if x > fx:
+                new_rects.append((fx, fy, x - fx, fh))
+            if right < fx + fw:
+                new_rects.append((right, fy, fx + fw - right, fh))
+            if y > fy:
+                new_rects.append((fx, fy, fw, y - fy))
+            if top < fy + fh:
+                new_rects.append((fx, top, fw, fy + fh - top))
+
+        maximal = []
+        for i, rect in enumerate(new_rects):
+            contained = False
+            for j, other in enumerate(new_rects):
+                # Из одинаковых прямоугольников оставляем первый
+                if i != j and _contains(other, rect) and (j < i or not _contains(rect, other)):
+                    contained = True
+                    break
+            if contained:
+                continue
+            if index is not None:
+                contained = bool(index.containing(*rect))
+            else:
+                contained = any(_contains(other, rect) for other in self._free)
+            if not contained:
+                maximal.append(rect)
+        for rect in maximal:
+            self._free[rect] = self._serial
+            self._serial += 1
+            if index is not None:
+                index.insert(rect, *rect)
+        self._build_index()
+
+
+def _contains(outer, inner):
+    return (inner[0] >= outer[0] and inner[1] >= outer[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+PACKERS = {
+    'guillotine': GuillotinePacker,
+    'maxrects': MaxRectsPacker
+}
+
+
+def pack_sheet(width, height, items, allow_rotation=True, engine='maxrects'):
+    """
+    Раскладывает позиции заказа на один лист width x height с реальными координатами.
+    engine – 'maxrects' (по умолчанию) или 'guillotine', см. PACKERS.
+    Возвращает словарь:
+      placements – список размещений {'x', 'y', 'width', 'height', 'rotated', 'name', 'item_index'};
+      used – сколько деталей каждой позиции поставлено;
+      free_space – оставшиеся свободные прямоугольники (у MaxRects они могут пересекаться);
+      area – занятая площадь.
+    """
+    packer = PACKERS[engine](width, height, allow_rotation)
+    for piece in expand_items(items):
+        size = (piece['width'], piece['height'])
+        # Свободное место только уменьшается: если деталь не встала, такие же тоже не встанут
+        if size in packer.failed_sizes:
+            continue
+        placed = packer.insert(piece['name'], piece['width'], piece['height'], item_index=piece['item_index'])
+        if placed is None:
+            packer.failed_sizes.add(size)
+    logging.debug(f"pack_sheet ({engine}): {len(packer.placements)} pieces placed on {width}x{height}")
+    return sheet_result(packer)
+
+
+def leftover_pieces(width, height, placements, min_width, min_height, blocked=()):
+    """
+    Делит свободное место листа с размещениями placements на непересекающиеся обрезки.
+    Раз за разом берётся самый большой максимальный свободный прямоугольник — соседние
+    свободные участки в нём уже объединены — и вычитается из свободного места.
+    blocked – [(x, y, w, h)], участки, которые обрезками не считаются (зоны брака).
+    Куски меньше min_width x min_height (с учётом поворота) отбрасываются.
+    Возвращает список (x, y, w, h).
+    """
+    packer = MaxRectsPacker(width, height)
+    for p in placements:
+        packer._place_rect(p['x'], p['y'], p['width'], p['height'])
+    for x, y, w, h in blocked:
+        packer._place_rect(x, y, w, h)
+    short, long = min(min_width, min_height), max(min_width, min_height)
+    pieces = []
+    while True:
+        usable = [rect for rect in packer.free_space
+                  if min(rect[2], rect[3]) >= short and max(rect[2], rect[3]) >= long]
+        if not usable:
+            break
+        rect = max(usable, key=lambda r: (r[2] * r[3], -r[1], -r[0]))
+        packer._place_rect(*rect)
+        pieces.append(rect)
+    return pieces
+
+
+def sheet_result(packer):
+    """
+    Результат раскладки одного листа в формате pack_sheet.
+    """
+    return {
+        'placements': packer.placements,
+        'used': summarize_used(packer.placements),
+        'free_space': list(packer.free_space),
+        'area': packer.used_area()
+    }
@@ -0,0 +1,127 @@
+import bisect
+
+
+class OffcutTree:
+    """
+    Неиспользованные обрезки одного материала с поиском «самый подходящий обрезок под W x H».
+    Обрезок хранится как (короткая, длинная сторона), поэтому поворот детали учитывается сам:
+    деталь входит, если её короткая сторона не больше короткой стороны обрезка, а длинная —
+    не больше длинной. Дерево отрезков над короткой стороной в миллиметрах хранит максимум
+    длинных сторон в поддереве, в листе — отсортированный список длинных сторон.
+    Поиск, вставка и удаление – O(log S), где S – наибольшая короткая сторона.
+    """
+
+    def __init__(self):
+        self.size = 1
+        self.best = [0, 0]
+        self.leaves = {}
+        self.offcuts = {}
+
+    def __len__(self):
+        return len(self.offcuts)
+
+    def __contains__(self, offcut_id):
+        return offcut_id in self.offcuts
+
+    def _grow(self, short):
+        if short < self.size:
+            return
+        while short >= self.size:
+            self.size *= 2
+        self.best = [0] * (2 * self.size)
+        for side, longs in self.leaves.items():
+            self.best[self.size + side] = longs[-1][0]
+        for node in range(self.size - 1, 0, -1):
+            self.best[node] = max(self.best[2 * node], self.best[2 * node + 1])
+
+    def _update(self, short):
+        longs = self.leaves.get(short)
+        node = self.size + short
+        self.best[node] = longs[-1][0] if longs else 0
+        node //= 2
+        while node:
+            self.best[node] = max(self.best[2 * node], self.best[2 * node + 1])
+            node //= 2
+
+    def insert(self, offcut_id, width, height):
+        """
+        Добавляет обрезок width x height (целые мм). Повторная вставка того же id заменяет его.
+        """
+        if offcut_id in self.offcuts:
+            self.remove(offcut_id)
+        short, long = min(width, height), max(width, height)
+        self._grow(short)
+        bisect.insort(self.leaves.setdefault(short, []), (long, offcut_id))
+        self.offcuts[offcut_id] = (width, height)
+        self._update(short)
+
+    def remove(self, offcut_id):
+        """
+        Убирает обрезок (использован). Возвращает его словарь или None, если его нет.
+        """
+        if offcut_id not in self.offcuts:
+            return None
+        width, height = self.offcuts.pop(offcut_id)
+        short, long = min(width, height), max(width, height)
+        longs = self.leaves[short]
+        del longs[bisect.bisect_left(longs, (long, offcut_id))]
+        if not longs:
+            del self.leaves[short]
+        self._update(short)
+        return {'id': offcut_id, 'width': width, 'height': height}
+
+    def _find(self, node, lo, hi, short, long):
+        # Самый левый лист в [short, ∞) с длинной стороной не меньше long
+        if hi < short or self.best[node] < long:
+            return None
+        if lo == hi:
+            return lo
+        mid = (lo + hi) // 2
+        found = self._find(2 * node, lo, mid, short, long)
+        if found is None:
+            found = self._find(2 * node + 1, mid + 1, hi, short, long)
+        return found
+
+    def best_fit(self, width, height):
+        """
+        Обрезок, в который входит деталь width x height (с поворотом): с наименьшей
+        подходящей короткой стороной, среди них – с наименьшей подходящей длинной.
+        Возвращает {'id', 'width', 'height'} или None. Обрезок из индекса не убирается.
+        """
+        short, long = min(width, height), max(width, height)
+        if short >= self.size:
+            return None
+        side = self._find(1, 0, self.size - 1, short, long)
+        if side is None:
+            return None
+        longs = self.leaves[side]
+        _, offcut_id = longs[bisect.bisect_left(longs, (long,))]
+        offcut_width, offcut_height = self.offcuts[offcut_id]
+        return {'id': offcut_id, 'width': offcut_width, 'height': offcut_height}
+
+
+class OffcutIndex:
+    """
+    Индекс неиспользованных обрезков по материалам (material_id -> OffcutTree).
+    Заполняется один раз за сессию из obrezki WHERE is_used = 0, дальше
+    поддерживается вставками новых обрезков и удалением использованных.
+    """
+
+    def __init__(self):
+        self.materials = {}
+
+    def tree(self, material_id):
+        if material_id not in self.materials:
+            self.materials[material_id] = OffcutTree()
+        return self.materials[material_id]
+
+    def insert(self, material_id, offcut_id, width, height):
+        self.tree(material_id).insert(offcut_id, width, height)
+
+    def remove(self, material_id, offcut_id):
+        tree = self.materials.get(material_id)
+        return tree.remove(offcut_id) if tree is not None else None
+
+    def best_fit(self, material_id, width, height):
+        tree = self.materials.get(material_id)
+        return tree.best_fit(width, height) if tree is not None else None
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'textile_cutting')
+# Файл занимает на диске целые блоки: мелкие записи (NFP) считаются по размеру блока
+DISK_BLOCK = 4096
+# Чистка оставляет каталог не больше этой доли лимита, чтобы полный обход каталога был редким
+EVICT_TARGET = 0.8
+
+
+def make_key(*parts):
+    """
+    Канонический ключ кэша: sha256 от JSON-представления частей.
+    Части должны быть уже нормализованы (отсортированы, округлены).
+    """
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _disk_size(size):
+    return -(-size // DISK_BLOCK) * DISK_BLOCK
+
+
+class PatternCache:
+    """
+    Двухуровневый кэш планов раскроя: LRU в памяти и каталог с JSON-файлами на диске.
+    Размер каталога ограничен max_disk_bytes (файлы считаются целыми блоками DISK_BLOCK):
+    при переполнении удаляются файлы, к которым дольше всего не обращались (время
+    доступа — mtime файла), пока каталог не займёт EVICT_TARGET лимита.
+    В памяти хранится тот же JSON, что и на диске: get из любого уровня возвращает
+    одинаковые типы (списки вместо кортежей) и новую копию, которую можно менять.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, memory_size=256, max_disk_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self._disk_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return json.loads(self.memory[key])
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = f.read()
+            value = json.loads(data)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Pattern cache read error: {str(e)}")
+            return None
+        self._remember(key, data)
+        return value
+
+    def put(self, key, value):
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        self._remember(key, data)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            previous = _disk_size(os.path.getsize(path)) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self._disk_bytes is not None:
+                self._disk_bytes += _disk_size(os.path.getsize(path)) - previous
+            self._evict()
+        except OSError as e:
+            logging.error(f"Pattern cache write error: {str(e)}")
+
+    def _evict(self):
+        if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, _disk_size(stat.st_size), name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes * EVICT_TARGET:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+        self._disk_bytes = total
+
+    def clear(self):
+        self.memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
+        self._disk_bytes = 0
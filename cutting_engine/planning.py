@@ -0,0 +1,415 @@
+import logging
+import os
+import time
+from functools import partial
+
+from .binpacking import count_sheets, pack_bins, repack_changed
+from .cut_order import plan_cut_order
+from .cutting_stock import solve_cutting_stock
+from .guillotine import add_cuts, shelf_sheets
+from .pattern_cache import make_key
+from .polygons import item_area, nest_sheets, nest_strip
+from .stock import select_roll, select_sheets
+from .strip_packing import pack_strip
+from .units import ceil_mm, from_mm
+from .workers import process_pool
+
+# Версия алгоритмов планирования: меняется при любом изменении результата, чтобы не брать старые планы из кэша
+ENGINE_VERSION = 10
+
+# Точный раскрой (генерация столбцов) запускается, если разных размеров изделий не больше этого числа
+CUTTING_STOCK_MAX_SIZES = 10
+CUTTING_STOCK_TIME_LIMIT = 2.0  # секунды
+
+# Пул процессов запускается, только если последовательный расчёт по оценке не короче этого:
+# запуск пула (spawn) сам стоит около секунды
+PARALLEL_MIN_TIME = 1.0  # секунды
+# Оценка времени на деталь, с: прямоугольная раскладка и медленные – точный раскрой, контуры, растр
+PIECE_TIME = 0.0001
+PIECE_TIME_SLOW = 0.01
+
+
+def plan_material(task):
+    """
+    Планирует раскрой одного материала. task – словарь:
+      material, fabric_id, width, height, is_roll, unit, items;
+      lots (необязательно) – партии материала на складе, см. stock.select_sheets и stock.select_roll;
+      guillotine (необязательно) – только сквозные резы: листы раскладываются гильотинным
+        упаковщиком, у каждого листа есть дерево и порядок резов (см. guillotine.add_cuts);
+      max_plies, max_marker_length (необязательно) – для рулона: наибольшее число слоёв
+        настила и длина маркера, мм. При max_plies > 1 спрос раскладывается маркерами,
+        настилаемыми в несколько слоёв (см. cut_order.plan_cut_order): plan['sheets'] – маркеры
+        с числом слоёв в 'repeat', plan['spreads'] – число настилов.
+    У изделий может быть 'outline' – контур детали, [[x, y], ...] в мм. Если контур есть
+    хотя бы у одного изделия, детали раскладываются по контурам (polygons.nest_strip и
+    polygons.nest_sheets), у размещений есть 'outline'. Листы тогда берутся размера
+    width x height, без выбора партий и гильотинных резов.
+      raster, defects (необязательно) – для листов: растровая раскладка с шагом сетки raster мм
+        (см. raster.pack_raster) в обход зон брака defects – [(x, y, w, h)] в мм на каждом листе;
+        листы размера width x height, без выбора партий и гильотинных резов; зоны брака
+        сохраняются в plan['defects'] (их не записывают в обрезки, см. scraps.plan_scraps).
+    Размеры полотна и изделий – целые миллиметры, unit – единица длины материала.
+    Если у партий несколько размеров (ширин рулона), полотна выбираются из партий,
+    plan['lots'] – сколько взято из каждой (см. stock). Если листов в партиях не хватает,
+    остаток раскладывается на полотна самого большого размера сверх запаса: они входят
+    в required, их число – plan['stock_shortage'].
+    Возвращает словарь:
+      material; plan – {'fabric_id', 'width', 'height', 'unit', 'sheets'} для карт раскроя;
+      required и unit – сколько полотен ('шт') или длины рулона (в единице материала) нужно;
+      area_bound – площадная нижняя граница (для листов);
+      lower_bound, lp_bound – если отработал точный раскрой;
+      report – отчёт о качестве раскроя (см. make_report).
+    """
+    started = time.perf_counter()
+    material = task['material']
+    items = task['items']
+    width = task['width']
+    height = task['height']
+    sizes = _stock_sizes(task)
+    outlines = any(item.get('outline') for item in items)
+    if task['is_roll']:
+        pack = nest_strip if outlines else pack_strip
+        if task.get('max_plies', 1) > 1:
+            pack = partial(plan_cut_order, max_plies=task['max_plies'], max_length=task.get('max_marker_length'),
+                           pack=pack)
+        if len(sizes) > 1:
+            result = select_roll(task['lots'], items, pack=pack)
+            roll_width = result['width']
+        else:
+            roll_width = max(width, height)
+            result = pack(roll_width, items)
+        if result['unplaced']:
+            logging.debug(f"Pieces not fitting roll {roll_width} for material {material}: {len(result['unplaced'])}")
+        if 'markers' in result:
+            sheets = result['markers']
+        else:
+            sheets = [result] if result['placements'] else []
+        planned = {
+            'material': material,
+            'plan': {
+                'fabric_id': task['fabric_id'],
+                'width': roll_width,
+                'height': result['length'],
+                'unit': task['unit'],
+                'sheets': sheets
+            },
+            # Длина рулона, округлённая вверх до сантиметра
+            'required': from_mm(ceil_mm(result['length'], 10), task['unit']),
+            'unit': task['unit']
+        }
+        if 'lots' in result:
+            planned['plan']['lots'] = result['lots']
+        if 'markers' in result:
+            planned['plan']['spreads'] = len(result['markers'])
+        planned['report'] = make_report(task, planned, time.perf_counter() - started)
+        return planned
+
+    logging.debug(f"Calculating cutting for material {material} with items: {items}")
+    if task.get('raster'):
+        # NumPy нужен только растровой раскладке
+        from .raster import pack_raster
+        task = dict(task, guillotine=False)
+        result = pack_raster(width, height, items, resolution=task['raster'], defects=task.get('defects', ()))
+        planned = _sheet_plan(task, result)
+        planned['plan']['raster'] = task['raster']
+        if task.get('defects'):
+            planned['plan']['defects'] = [list(zone) for zone in task['defects']]
+        planned['report'] = make_report(task, planned, time.perf_counter() - started, 'raster')
+        return planned
+    if outlines:
+        task = dict(task, guillotine=False)
+        planned = _sheet_plan(task, nest_sheets(width, height, items))
+        planned['report'] = make_report(task, planned, time.perf_counter() - started, 'nfp')
+        return planned
+    if len(sizes) > 1:
+        # Отчёт и нижняя граница считаются по самому большому полотну
+        width, height = max(sizes, key=lambda size: size[0] * size[1])
+        task = dict(task, width=width, height=height)
+        result = select_sheets(task['lots'], items, engine=_engine(task))
+        stock_shortage = 0
+        if result['unplaced']:
+            # Партий не хватило: остаток раскладывается на самые большие полотна сверх запаса
+            missing = [0] * len(items)
+            for piece in result['unplaced']:
+                missing[piece['item_index']] += 1
+            extra = pack_bins(width, height, [dict(item, quantity=count) for item, count in zip(items, missing)],
+                              engine=_engine(task))
+            for sheet in extra['sheets']:
+                sheet.update(width=width, height=height)
+            stock_shortage = count_sheets(extra['sheets'])
+            result = dict(result, sheets=result['sheets'] + extra['sheets'], unplaced=extra['unplaced'])
+        planned = _sheet_plan(task, result)
+        planned['plan']['lots'] = result['lots']
+        if stock_shortage:
+            planned['plan']['stock_shortage'] = stock_shortage
+        planned['report'] = make_report(task, planned, time.perf_counter() - started, 'lots')
+        return planned
+    distinct_sizes = {(item['width'], item['height']) for item in items}
+    if len(distinct_sizes) <= CUTTING_STOCK_MAX_SIZES:
+        result = solve_cutting_stock(width, height, items, time_limit=CUTTING_STOCK_TIME_LIMIT, engine=_engine(task))
+    else:
+        result = pack_bins(width, height, items, engine=_engine(task))
+    planned = _sheet_plan(task, result)
+    if result.get('lp_bound') is not None:
+        planned['lower_bound'] = result['lower_bound']
+        planned['lp_bound'] = result['lp_bound']
+    planned['report'] = make_report(task, planned, time.perf_counter() - started, result.get('method', 'heuristic'))
+    return planned
+
+
+def make_report(task, planned, elapsed, method=None):
+    """
+    Отчёт о раскрое материала для интерфейса, консольных утилит и метрик:
+      material; unit – единица required и lower_bound ('шт' или единица длины рулона);
+      required – полотен (длина рулона) в плане;
+      lower_bound – площадная нижняя граница: ceil(площадь изделий / площадь полотна),
+        для рулона – длина при сплошной укладке, округлённая вверх до сантиметра;
+        изделия, которые не помещаются на полотно, в ней не учитываются;
+      utilisation – доля площади полотен под изделиями, %;
+      waste_area – площадь отходов, мм²;
+      time – время расчёта, с; method – алгоритм (для листов);
+      cut_length, travel – длина резов и холостой ход ножа по всем полотнам, мм (гильотинный раскрой);
+      spreads – число настилов (раскрой рулона маркерами);
+      unplaced – сколько деталей не попало ни на одно полотно;
+      surplus – сколько деталей сверх количеств позиций осталось на раскроенных (locked)
+        полотнах после уменьшения количеств (см. replan_material);
+      stock_shortage – сколько полотен в плане сверх запаса партий.
+    """
+    plan = planned['plan']
+    items_area = _fitting_area(task['items'], plan['width'], None if task['is_roll'] else plan['height'])
+    placed_area = sum(sheet['area'] * sheet.get('repeat', 1) for sheet in plan['sheets'])
+    placed = [0] * len(task['items'])
+    for sheet in plan['sheets']:
+        for used in sheet['used']:
+            placed[used['item_index']] += used['count'] * sheet.get('repeat', 1)
+    quantities = [int(item['quantity']) for item in task['items']]
+    if task['is_roll']:
+        stock_area = plan['width'] * plan['height']
+        lower_bound = from_mm(ceil_mm(-(-items_area // plan['width']), 10), plan['unit'])
+    else:
+        stock_area = sum(sheet.get('width', plan['width']) * sheet.get('height', plan['height']) * sheet.get('repeat', 1)
+                         for sheet in plan['sheets'])
+        lower_bound = -(-items_area // (plan['width'] * plan['height']))
+    report = {
+        'material': planned['material'],
+        'unit': planned['unit'],
+        'required': planned['required'],
+        'lower_bound': lower_bound,
+        'utilisation': round(100 * placed_area / stock_area, 2) if stock_area else 0.0,
+        'waste_area': stock_area - placed_area,
+        'unplaced': sum(max(quantity - count, 0) for quantity, count in zip(quantities, placed)),
+        'time': round(elapsed, 3)
+    }
+    if method is not None:
+        report['method'] = method
+    if 'spreads' in plan:
+        report['spreads'] = plan['spreads']
+    if 'stock_shortage' in plan:
+        report['stock_shortage'] = plan['stock_shortage']
+    surplus = sum(max(count - quantity, 0) for quantity, count in zip(quantities, placed))
+    if surplus:
+        report['surplus'] = surplus
+    if plan.get('guillotine'):
+        report['cut_length'] = sum(sheet.get('cut_length', 0) * sheet.get('repeat', 1) for sheet in plan['sheets'])
+        report['travel'] = sum(sheet.get('travel', 0) * sheet.get('repeat', 1) for sheet in plan['sheets'])
+    return report
+
+
+def _engine(task):
+    return 'guillotine' if task.get('guillotine') else 'maxrects'
+
+
+def _fitting_area(items, width, height=None):
+    """
+    Площадь изделий, которые помещаются на полотно width x height хотя бы с поворотом
+    (height=None – рулон шириной width). Остальные изделия в план не попадают,
+    и в нижние границы их площадь не входит.
+    """
+    total = 0
+    for item in items:
+        short, long = sorted((item['width'], item['height']))
+        if height is None:
+            fits = short <= width
+        else:
+            fits = short <= min(width, height) and long <= max(width, height)
+        if fits:
+            total += item_area(item) * item['quantity']
+    return total
+
+
+def _stock_sizes(task):
+    """
+    Разные размеры партий материала из task['lots'], которые есть на складе:
+    (ширина, длина) листа или ширина рулона.
+    """
+    if task['is_roll']:
+        return {lot['width'] for lot in task.get('lots', ()) if lot['length'] > 0}
+    return {(lot['width'], lot['height']) for lot in task.get('lots', ()) if lot['count'] > 0}
+
+
+def _sheet_plan(task, result):
+    """
+    Результат планирования листового материала в формате plan_material.
+    """
+    width = task['width']
+    height = task['height']
+    if result['unplaced']:
+        logging.debug(f"Cannot place {len(result['unplaced'])} pieces for material {task['material']} on one fabric.")
+    if task.get('guillotine'):
+        sheets = []
+        for sheet in result['sheets']:
+            sheet_width, sheet_height = sheet.get('width', width), sheet.get('height', height)
+            if 'cut_tree' in sheet or add_cuts(sheet, sheet_width, sheet_height):
+                sheets.append(sheet)
+                continue
+            # Раскладка не режется сквозными резами: лист перекладывается полками
+            logging.debug(f"Sheet of material {task['material']} is not guillotine-cuttable, repacking by shelves")
+            for shelf in shelf_sheets(sheet, sheet_width, sheet_height):
+                if not add_cuts(shelf, sheet_width, sheet_height):
+                    raise ValueError(f"Shelf layout of material {task['material']} is not guillotine-cuttable")
+                sheets.append(shelf)
+        result = dict(result, sheets=sheets)
+    planned = {
+        'material': task['material'],
+        'plan': {
+            'fabric_id': task['fabric_id'],
+            'width': width,
+            'height': height,
+            'unit': task['unit'],
+            'sheets': result['sheets']
+        },
+        'required': count_sheets(result['sheets']),
+        'unit': 'шт',
+        'area_bound': -(-_fitting_area(task['items'], width, height) // (width * height))
+    }
+    if task.get('guillotine'):
+        planned['plan']['guillotine'] = True
+    return planned
+
+
+def replan_material(task, sheets, old_items):
+    """
+    Инкрементальный пересчёт материала после изменения количеств позиций:
+    sheets – листы прежнего плана, old_items – позиции, по которым он строился
+    (те же, что task['items'], в том же порядке). Перекладываются только затронутые
+    листы (см. binpacking.repack_changed). Рулон и изменившийся состав позиций,
+    раскрой из партий разного размера, по контурам и растровый считаются заново через plan_material.
+    Результат – как у plan_material, плюс 'repacked' и 'surplus'.
+    """
+    if (task['is_roll'] or len(old_items) != len(task['items']) or len(_stock_sizes(task)) > 1
+            or task.get('raster') or any(item.get('outline') for item in task['items'])):
+        return plan_material(task)
+    started = time.perf_counter()
+    result = repack_changed(task['width'], task['height'], sheets, old_items, task['items'], engine=_engine(task))
+    planned = _sheet_plan(task, result)
+    planned['repacked'] = result['repacked']
+    planned['surplus'] = result['surplus']
+    planned['report'] = make_report(task, planned, time.perf_counter() - started, 'incremental')
+    return planned
+
+
+def _estimated_time(task):
+    """
+    Грубая оценка времени plan_material(task) в секундах по числу деталей и алгоритму.
+    """
+    items = task['items']
+    pieces = sum(int(item['quantity']) for item in items)
+    if task.get('raster') or any(item.get('outline') for item in items):
+        return pieces * PIECE_TIME_SLOW
+    if task['is_roll'] or len(_stock_sizes(task)) > 1:
+        return pieces * PIECE_TIME
+    if len({(item['width'], item['height']) for item in items}) <= CUTTING_STOCK_MAX_SIZES:
+        return min(pieces * PIECE_TIME_SLOW, CUTTING_STOCK_TIME_LIMIT)
+    return pieces * PIECE_TIME
+
+
+def _item_key(item):
+    return item['width'], item['height'], item['quantity'], [list(point) for point in item.get('outline') or ()]
+
+
+def _canonical_task(task):
+    """
+    Приводит задачу к каноническому виду для кэша: позиции сортируются по размерам,
+    количеству и контуру, имена и номера поставок в ключ не входят.
+    Возвращает (ключ, каноническая задача, order), где order[i] – индекс
+    i-й канонической позиции в исходном task['items'].
+    """
+    items = task['items']
+    order = sorted(range(len(items)), key=lambda i: _item_key(items[i]))
+    key = make_key(
+        ENGINE_VERSION,
+        task['is_roll'],
+        task['unit'],
+        task['width'],
+        task['height'],
+        task.get('guillotine', False),
+        task.get('max_plies', 1),
+        task.get('max_marker_length'),
+        task.get('raster'),
+        [list(zone) for zone in task.get('defects', ())],
+        [sorted(lot.items()) for lot in task.get('lots', ())],
+        [_item_key(items[i]) for i in order]
+    )
+    canonical = dict(task, material=None, fabric_id=None,
+                     items=[dict(items[i], name=str(position)) for position, i in enumerate(order)])
+    return key, canonical, order
+
+
+def _restore(planned, task, order):
+    """
+    Переносит план канонической задачи на исходную: индексы и имена позиций, материал, поставка.
+    """
+    items = task['items']
+    restored = dict(planned, material=task['material'])
+    restored['report'] = dict(planned['report'], material=task['material'])
+    restored['plan'] = dict(planned['plan'], fabric_id=task['fabric_id'])
+    sheets = []
+    for sheet in planned['plan']['sheets']:
+        placements = []
+        for p in sheet['placements']:
+            index = order[p['item_index']]
+            placements.append(dict(p, item_index=index, name=items[index]['name']))
+        used = [dict(u, item_index=order[u['item_index']], name=items[order[u['item_index']]]['name'])
+                for u in sheet['used']]
+        sheets.append(dict(sheet, placements=placements, used=used))
+    restored['plan']['sheets'] = sheets
+    return restored
+
+
+def plan_materials(tasks, workers=None, cache=None):
+    """
+    Планирует все материалы заказа: каждый материал независим, поэтому задачи
+    раздаются пулу процессов. Результаты возвращаются в порядке tasks.
+    Один материал, как и небольшой заказ (оценка последовательного расчёта меньше
+    PARALLEL_MIN_TIME), считается в текущем процессе — запуск пула дороже самого расчёта.
+    Если передан cache (pattern_cache.PatternCache), одинаковые задачи берутся из него.
+    """
+    results = [None] * len(tasks)
+    pending = []
+    for position, task in enumerate(tasks):
+        key, canonical, order = _canonical_task(task)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            logging.debug(f"Pattern cache hit for material {task['material']}")
+            results[position] = _restore(cached, task, order)
+            # Время в отчёте – время исходного расчёта
+            results[position]['report']['cached'] = True
+        else:
+            pending.append((position, key, canonical, order))
+
+    canonical_tasks = [canonical for _, _, canonical, _ in pending]
+    workers = min(len(canonical_tasks), workers or os.cpu_count() or 1)
+    if workers < 2 or sum(_estimated_time(task) for task in canonical_tasks) < PARALLEL_MIN_TIME:
+        planned = [plan_material(task) for task in canonical_tasks]
+    else:
+        with process_pool(workers) as pool:
+            futures = [pool.submit(plan_material, task) for task in canonical_tasks]
+            planned = [future.result() for future in futures]
+
+    for (position, key, _, order), result in zip(pending, planned):
+        if cache is not None:
+            cache.put(key, result)
+        results[position] = _restore(result, tasks[position], order)
+    for planned in results:
+        logging.debug(f"Cutting report: {planned['report']}")
+    return results
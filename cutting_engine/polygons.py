@@ -0,0 +1,428 @@
+import heapq
+import logging
+import os
+
+from .nesting import expand_items, summarize_used
+from .pattern_cache import DEFAULT_CACHE_DIR, PatternCache, make_key
+from .spatial import UniformGrid
+
+# Версия геометрии NFP: меняется при изменении алгоритма, чтобы не брать старые NFP из кэша
+NFP_VERSION = 1
+NFP_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'nfp')
+# Повороты деталей, градусы. Допускаются только кратные 90°: координаты остаются целыми мм
+POLYGON_ROTATIONS = (0, 90, 180, 270)
+
+_default_cache = None
+
+
+def nfp_cache():
+    """
+    Общий для процесса постоянный кэш NFP (каталог NFP_CACHE_DIR).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PatternCache(NFP_CACHE_DIR, memory_size=4096)
+    return _default_cache
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _area2(points):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]))
+
+
+def _convex(points):
+    count = len(points)
+    return all(_cross(points[i - 1], points[i], points[(i + 1) % count]) >= 0 for i in range(count))
+
+
+def _in_triangle(point, a, b, c):
+    return _cross(a, b, point) >= 0 and _cross(b, c, point) >= 0 and _cross(c, a, point) >= 0
+
+
+def _triangulate(points):
+    """
+    Триангуляция простого многоугольника (против часовой) отсечением ушей.
+    Возвращает треугольники списками индексов вершин.
+    """
+    indices = list(range(len(points)))
+    triangles = []
+    while len(indices) > 3:
+        for k in range(len(indices)):
+            i, j, m = indices[k - 1], indices[k], indices[(k + 1) % len(indices)]
+            a, b, c = points[i], points[j], points[m]
+            if _cross(a, b, c) <= 0:
+                continue
+            if any(_in_triangle(points[n], a, b, c) for n in indices if n not in (i, j, m)):
+                continue
+            triangles.append([i, j, m])
+            indices.pop(k)
+            break
+        else:
+            # Самопересекающийся контур: остаток оставляем одним куском
+            break
+    triangles.append(indices)
+    return triangles
+
+
+def _join(first, second):
+    """
+    Сливает два куска с общей стороной (в first она идёт i -> j, в second – j -> i).
+    None, если общей стороны нет.
+    """
+    for k in range(len(first)):
+        i, j = first[k], first[(k + 1) % len(first)]
+        for m in range(len(second)):
+            if second[m] == j and second[(m + 1) % len(second)] == i:
+                around_first = first[k + 1:] + first[:k + 1]
+                around_second = second[m + 1:] + second[:m + 1]
+                return around_first + around_second[1:-1]
+    return None
+
+
+def convex_parts(points):
+    """
+    Разбиение многоугольника на выпуклые куски: триангуляция, затем соседние куски
+    сливаются, пока объединение остаётся выпуклым (Hertel–Mehlhorn).
+    """
+    if _convex(points):
+        return [points]
+    parts = _triangulate(points)
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(parts)):
+            for b in range(a + 1, len(parts)):
+                joined = _join(parts[a], parts[b])
+                if joined is not None and _convex([points[i] for i in joined]):
+                    parts[a] = joined
+                    del parts[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [[points[i] for i in part] for part in parts]
+
+
+def _hull(points):
+    """
+    Выпуклая оболочка (против часовой, без точек на сторонах).
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def _strictly_inside(point, hull):
+    count = len(hull)
+    if count < 3:
+        return False
+    return all(_cross(hull[i], hull[(i + 1) % count], point) > 0 for i in range(count))
+
+
+def outline_of(item):
+    """
+    Контур позиции: item['outline'] – точки [x, y] в мм в любом порядке обхода,
+    без outline – прямоугольник width x height. Возвращается против часовой стрелки,
+    без повторяющихся и лежащих на одной прямой вершин.
+    """
+    if not item.get('outline'):
+        width, height = item['width'], item['height']
+        return [(0, 0), (width, 0), (width, height), (0, height)]
+    points = []
+    for x, y in item['outline']:
+        point = (int(x), int(y))
+        if not points or points[-1] != point:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if _area2(points) < 0:
+        points.reverse()
+    count = len(points)
+    return [points[i] for i in range(count) if _cross(points[i - 1], points[i], points[(i + 1) % count]) != 0]
+
+
+def item_area(item):
+    """
+    Площадь одной детали позиции, мм² (по контуру, округлена вверх).
+    """
+    if not item.get('outline'):
+        return item['width'] * item['height']
+    return -(-_area2(outline_of(item)) // 2)
+
+
+def rotate_outline(points, rotation):
+    """
+    Контур, повёрнутый на rotation (кратно 90°) против часовой стрелки и сдвинутый
+    так, что габарит начинается в (0, 0).
+    """
+    for _ in range(rotation // 90 % 4):
+        points = [(-y, x) for x, y in points]
+    min_x = min(x for x, _ in points)
+    min_y = min(y for _, y in points)
+    return [(x - min_x, y - min_y) for x, y in points]
+
+
+def _shape(outline, rotation):
+    """
+    Деталь в повороте rotation для раскладки по NFP.
+    """
+    points = rotate_outline(outline, rotation)
+    return {
+        'points': points,
+        'rotation': rotation,
+        'width': max(x for x, _ in points),
+        'height': max(y for _, y in points),
+        'area2': _area2(points),
+        'parts': convex_parts(points),
+        'key': make_key(points)
+    }
+
+
+class NfpLibrary:
+    """
+    NFP (no-fit polygon) пар деталей: B с опорной точкой p пересекает A, стоящую в t,
+    тогда и только тогда, когда p - t строго внутри NFP(A, B). NFP невыпуклых деталей
+    хранится объединением выпуклых кусков – сумм Минковского A_i ⊕ (−B_j) выпуклых кусков.
+    Куски запоминаются в памяти и в постоянном кэше по ключу пары контуров в их поворотах,
+    поэтому повторяющиеся изделия геометрию заново не считают.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.memory = {}
+        self.computed = 0
+
+    def get(self, a, b):
+        pair = (a['key'], b['key'])
+        parts = self.memory.get(pair)
+        if parts is not None:
+            return parts
+        key = make_key('nfp', NFP_VERSION, a['key'], b['key'])
+        stored = self.cache.get(key) if self.cache is not None else None
+        if stored is not None:
+            parts = [[tuple(point) for point in part] for part in stored]
+        else:
+            parts = [_hull([(pa[0] - pb[0], pa[1] - pb[1]) for pa in part_a for pb in part_b])
+                     for part_a in a['parts'] for part_b in b['parts']]
+            self.computed += 1
+            if self.cache is not None:
+                self.cache.put(key, parts)
+        self.memory[pair] = parts
+        return parts
+
+
+class PolygonContainer:
+    """
+    Один лист (height задан) или рулон (height=None) для раскладки контуров
+    снизу-слева (bottom-left-fill). Кандидаты в опорные точки – вершины NFP уже
+    поставленных деталей и их проекции на края листа; для каждой формы они лежат
+    в куче по (y, x). Поставленные детали только добавляются, поэтому недопустимая
+    точка не станет допустимой: она выбрасывается из кучи навсегда, и каждая точка
+    проверяется в среднем один раз. Для проверки берутся только детали, габарит которых
+    пересекает габарит кандидата (spatial.UniformGrid с шагом cell).
+    """
+
+    def __init__(self, width, height, nfps, cell):
+        self.width = width
+        self.height = height
+        self.nfps = nfps
+        self.placed = []
+        self.index = UniformGrid(cell)
+        self.candidates = {}
+        self.pushed = {}
+        self.length = 0
+
+    def _inside(self, shape, x, y):
+        if x < 0 or y < 0 or x + shape['width'] > self.width:
+            return False
+        return self.height is None or y + shape['height'] <= self.height
+
+    def _push(self, shape, x, y):
+        if (x, y) in self.pushed[shape['key']] or not self._inside(shape, x, y):
+            return
+        self.pushed[shape['key']].add((x, y))
+        heapq.heappush(self.candidates[shape['key']], (y, x))
+
+    def _add_candidates(self, shape, other, ox, oy):
+        for part in self.nfps.get(other, shape):
+            for vx, vy in part:
+                x, y = ox + vx, oy + vy
+                self._push(shape, x, y)
+                self._push(shape, x, 0)
+                self._push(shape, 0, y)
+                self._push(shape, self.width - shape['width'], y)
+
+    def _feasible(self, shape, x, y):
+        for index in self.index.query(x, y, shape['width'], shape['height']):
+            other, ox, oy = self.placed[index]
+            point = (x - ox, y - oy)
+            if any(_strictly_inside(point, part) for part in self.nfps.get(other, shape)):
+                return False
+        return True
+
+    def position(self, shape):
+        """
+        Самая нижняя, затем самая левая допустимая опорная точка формы или None.
+        """
+        key = shape['key']
+        if key not in self.candidates:
+            self.candidates[key] = []
+            self.pushed[key] = set()
+            self._push(shape, 0, 0)
+            for other, ox, oy in self.placed:
+                self._add_candidates(shape, other, ox, oy)
+        heap = self.candidates[key]
+        while heap:
+            y, x = heap[0]
+            if self._feasible(shape, x, y):
+                return x, y
+            heapq.heappop(heap)
+        return None
+
+    def place(self, shape, x, y, active):
+        """
+        Ставит форму в (x, y); active – формы, которые ещё предстоит раскладывать.
+        """
+        index = len(self.placed)
+        self.placed.append((shape, x, y))
+        self.index.insert(index, x, y, shape['width'], shape['height'])
+        self.length = max(self.length, y + shape['height'])
+        for other in active:
+            if other['key'] in self.candidates:
+                self._add_candidates(other, shape, x, y)
+
+
+class PolygonNester:
+    """
+    Раскладка деталей по контурам (items с 'outline', см. outline_of) на листы или рулон.
+    Детали идут по убыванию площади, каждая ставится в самое низкое место
+    (по верхнему краю детали, затем левее) среди всех поворотов rotations.
+    """
+
+    def __init__(self, items, allow_rotation=True, rotations=POLYGON_ROTATIONS, cache=None):
+        self.items = items
+        self.nfps = NfpLibrary(cache)
+        rotations = rotations if allow_rotation else (0,)
+        self.shapes = []
+        for item in items:
+            outline = outline_of(item)
+            self.shapes.append([_shape(outline, rotation) for rotation in rotations])
+        dimensions = [max(s['width'], s['height']) for shapes in self.shapes for s in shapes]
+        self.cell = max(max(dimensions, default=1), 1)
+        self.remaining = [int(item['quantity']) for item in items]
+
+    def _active(self):
+        return [shape for index, shapes in enumerate(self.shapes) if self.remaining[index] > 0 for shape in shapes]
+
+    def _pieces(self):
+        pieces = expand_items(self.items)
+        pieces.sort(key=lambda p: -self.shapes[p['item_index']][0]['area2'])
+        return pieces
+
+    def _try(self, container, piece):
+        best = None
+        for shape in self.shapes[piece['item_index']]:
+            position = container.position(shape)
+            if position is None:
+                continue
+            x, y = position
+            score = (y + shape['height'], x)
+            if best is None or score < best[0]:
+                best = (score, shape, x, y)
+        if best is None:
+            return None
+        _, shape, x, y = best
+        self.remaining[piece['item_index']] -= 1
+        container.place(shape, x, y, self._active())
+        return {
+            'x': x,
+            'y': y,
+            'width': shape['width'],
+            'height': shape['height'],
+            'rotated': shape['rotation'] % 180 == 90,
+            'rotation': shape['rotation'],
+            'outline': [[x + px, y + py] for px, py in shape['points']],
+            'area': -(-shape['area2'] // 2),
+            'name': piece['name'],
+            'item_index': piece['item_index']
+        }
+
+    def nest_strip(self, roll_width):
+        container = PolygonContainer(roll_width, None, self.nfps, self.cell)
+        placements = []
+        unplaced = []
+        for piece in self._pieces():
+            placement = self._try(container, piece)
+            if placement is None:
+                self.remaining[piece['item_index']] -= 1
+                unplaced.append(piece)
+            else:
+                placements.append(placement)
+        logging.debug(f"nest_strip: {len(placements)} pieces on roll {roll_width}, length {container.length}, "
+                      f"{self.nfps.computed} NFPs computed")
+        return {
+            'placements': placements,
+            'used': summarize_used(placements),
+            'unplaced': unplaced,
+            'length': container.length,
+            'area': sum(p['area'] for p in placements)
+        }
+
+    def nest_sheets(self, width, height):
+        containers = []
+        sheets = []
+        unplaced = []
+        for piece in self._pieces():
+            for container, placements in zip(containers, sheets):
+                placement = self._try(container, piece)
+                if placement is not None:
+                    placements.append(placement)
+                    break
+            else:
+                container = PolygonContainer(width, height, self.nfps, self.cell)
+                placement = self._try(container, piece)
+                if placement is None:
+                    self.remaining[piece['item_index']] -= 1
+                    unplaced.append(piece)
+                    continue
+                containers.append(container)
+                sheets.append([placement])
+        logging.debug(f"nest_sheets: {len(sheets)} sheets {width}x{height}, {len(unplaced)} unplaced, "
+                      f"{self.nfps.computed} NFPs computed")
+        return {
+            'sheets': [{'placements': placements, 'used': summarize_used(placements), 'free_space': [],
+                        'area': sum(p['area'] for p in placements)} for placements in sheets],
+            'unplaced': unplaced
+        }
+
+
+def nest_strip(roll_width, items, allow_rotation=True, cache=None):
+    """
+    Раскладка контуров на рулон шириной roll_width в формате strip_packing.pack_strip;
+    у размещений есть 'outline' – контур в координатах рулона и 'rotation' в градусах.
+    cache – постоянный кэш NFP (по умолчанию nfp_cache()).
+    """
+    nester = PolygonNester(items, allow_rotation, cache=cache if cache is not None else nfp_cache())
+    return nester.nest_strip(roll_width)
+
+
+def nest_sheets(width, height, items, allow_rotation=True, cache=None):
+    """
+    Раскладка контуров на листы width x height (first fit) в формате binpacking.pack_bins.
+    """
+    nester = PolygonNester(items, allow_rotation, cache=cache if cache is not None else nfp_cache())
+    return nester.nest_sheets(width, height)
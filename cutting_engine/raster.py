@@ -0,0 +1,243 @@
+import logging
+
+import numpy as np
+
+from .nesting import expand_items, summarize_used
+from .polygons import POLYGON_ROTATIONS, item_area, outline_of, rotate_outline
+
+# Шаг сетки растровой раскладки по умолчанию, мм
+RASTER_RESOLUTION = 5
+# Позиции ищутся полосами по столько строк сетки: свободное место обычно находится в первой
+RASTER_BAND_ROWS = 64
+
+
+def _cell_range(low, high, resolution):
+    """
+    Ячейки [first, end), внутренность которых пересекает интервал (low, high).
+    """
+    return int(low // resolution), -int(-high // resolution)
+
+
+def rasterize(points, resolution):
+    """
+    Маска занятых ячеек контура points (габарит от (0, 0)): ячейка занята, если контур
+    задевает её внутренность. Маска консервативна – детали с непересекающимися масками
+    не пересекаются. Строки маски идут по y, столбцы – по x.
+    """
+    width = max(x for x, _ in points)
+    height = max(y for _, y in points)
+    columns = -(-width // resolution)
+    rows = -(-height // resolution)
+    centre_x, centre_y = np.meshgrid((np.arange(columns) + 0.5) * resolution, (np.arange(rows) + 0.5) * resolution)
+    mask = np.zeros((rows, columns), dtype=bool)
+    edges = list(zip(points, points[1:] + points[:1]))
+    # Ячейки, центр которых внутри контура (правило чёт-нечет)
+    for (x1, y1), (x2, y2) in edges:
+        if y1 != y2:
+            crosses = (y1 > centre_y) != (y2 > centre_y)
+            mask ^= crosses & (centre_x < x1 + (centre_y - y1) * (x2 - x1) / (y2 - y1))
+    # Ячейки, через внутренность которых проходит сторона
+    for start, end in edges:
+        (x1, y1), (x2, y2) = sorted([start, end])
+        first, last = _cell_range(x1, x2, resolution) if x1 != x2 else _cell_range(x1, x1, resolution)
+        for column in range(first, last):
+            if x1 == x2:
+                low, high = sorted((y1, y2))
+            else:
+                a = max(x1, column * resolution)
+                b = min(x2, (column + 1) * resolution)
+                ya = y1 + (a - x1) * (y2 - y1) / (x2 - x1)
+                yb = y1 + (b - x1) * (y2 - y1) / (x2 - x1)
+                low, high = min(ya, yb), max(ya, yb)
+            row_first, row_last = _cell_range(low, high, resolution)
+            mask[row_first:row_last, column] = True
+    return mask
+
+
+def mask_rects(mask):
+    """
+    Разбивает маску на прямоугольники (row, column, rows, columns): отрезки подряд
+    занятых ячеек строки, одинаковые в соседних строках, сливаются. У прямоугольной
+    детали это один прямоугольник, у Г- и Т-образной – два-три.
+    """
+    rects = []
+    open_runs = {}
+    for row in range(mask.shape[0]):
+        line = np.concatenate(([0], mask[row].astype(np.int8), [0]))
+        changes = np.flatnonzero(np.diff(line))
+        runs = {(int(start), int(end - start)) for start, end in zip(changes[::2], changes[1::2])}
+        for run in [run for run in open_runs if run not in runs]:
+            first, count = open_runs.pop(run)
+            rects.append((first, run[0], count, run[1]))
+        for run in runs:
+            if run in open_runs:
+                open_runs[run][1] += 1
+            else:
+                open_runs[run] = [row, 1]
+    rects += [(first, run[0], count, run[1]) for run, (first, count) in open_runs.items()]
+    return sorted(rects)
+
+
+def _shapes(index, item, allow_rotation, resolution):
+    """
+    Варианты детали позиции по поворотам: маска, её прямоугольники, габарит в мм.
+    """
+    shapes = []
+    if item.get('outline'):
+        outline = outline_of(item)
+        for rotation in POLYGON_ROTATIONS if allow_rotation else (0,):
+            points = rotate_outline(outline, rotation)
+            mask = rasterize(points, resolution)
+            shapes.append({
+                'key': (index, rotation),
+                'rotation': rotation,
+                'points': points,
+                'width': max(x for x, _ in points),
+                'height': max(y for _, y in points),
+                'mask': mask,
+                'rects': mask_rects(mask)
+            })
+        return shapes
+    width, height = item['width'], item['height']
+    sizes = [(0, width, height)]
+    if allow_rotation and width != height:
+        sizes.append((90, height, width))
+    for rotation, w, h in sizes:
+        mask = np.ones((-(-h // resolution), -(-w // resolution)), dtype=bool)
+        shapes.append({'key': (index, rotation), 'rotation': rotation, 'points': None, 'width': w, 'height': h,
+                       'mask': mask, 'rects': mask_rects(mask)})
+    return shapes
+
+
+class RasterSheet:
+    """
+    Лист как булева сетка занятости с шагом resolution мм; ячейки, выходящие за край
+    листа, и зоны брака defects ((x, y, w, h), мм) заняты с самого начала.
+    Свободные позиции детали ищутся сразу для всего листа по таблице сумм занятости
+    (summed-area table): для каждого прямоугольника маски сумма окна – четыре обращения
+    к таблице на позицию, векторно для всех позиций. Цена одной детали предсказуема:
+    O(прямоугольников маски x ячеек листа), сколько бы деталей ни стояло.
+    Занятость только растёт, поэтому самая нижняя свободная позиция формы не опускается:
+    поиск идёт с её прошлой строки (start) полосами по RASTER_BAND_ROWS строк, таблица
+    строится только для текущей полосы.
+    """
+
+    def __init__(self, width, height, resolution, defects=()):
+        self.resolution = resolution
+        self.rows = height // resolution
+        self.columns = width // resolution
+        self.occupied = np.zeros((self.rows, self.columns), dtype=bool)
+        for x, y, w, h in defects:
+            first_column, last_column = _cell_range(x, x + w, resolution)
+            first_row, last_row = _cell_range(y, y + h, resolution)
+            self.occupied[max(first_row, 0):max(last_row, 0), max(first_column, 0):max(last_column, 0)] = True
+        # Позиции, которые на этот лист уже не встали: занятость только растёт
+        self.failed = set()
+        self.start = {}
+
+    def position(self, shape):
+        """
+        (row, column) самой нижней, затем самой левой свободной позиции маски или None.
+        """
+        rows, columns = shape['mask'].shape
+        span_columns = self.columns - columns + 1
+        last = self.rows - rows + 1
+        start = self.start.get(shape['key'], 0)
+        while start < last and span_columns > 0:
+            span_rows = min(RASTER_BAND_ROWS, last - start)
+            band = self.occupied[start:start + span_rows + rows - 1]
+            table = np.zeros((band.shape[0] + 1, self.columns + 1), dtype=np.int32)
+            table[1:, 1:] = band.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+            free = np.ones((span_rows, span_columns), dtype=bool)
+            for row, column, height, width in shape['rects']:
+                top = table[row + height:row + height + span_rows]
+                bottom = table[row:row + span_rows]
+                left = slice(column, column + span_columns)
+                right = slice(column + width, column + width + span_columns)
+                free &= (top[:, right] - bottom[:, right] - top[:, left] + bottom[:, left]) == 0
+            first = int(np.argmax(free))
+            if free.flat[first]:
+                row, column = divmod(first, span_columns)
+                self.start[shape['key']] = start + row
+                return start + row, column
+            start += span_rows
+        self.start[shape['key']] = last
+        return None
+
+    def place(self, shape, row, column):
+        rows, columns = shape['mask'].shape
+        self.occupied[row:row + rows, column:column + columns] |= shape['mask']
+
+
+def _place(sheet, shapes, piece, item):
+    best = None
+    for shape in shapes:
+        position = sheet.position(shape)
+        if position is None:
+            continue
+        row, column = position
+        score = (row + shape['mask'].shape[0], column)
+        if best is None or score < best[0]:
+            best = (score, shape, row, column)
+    if best is None:
+        return None
+    _, shape, row, column = best
+    sheet.place(shape, row, column)
+    x, y = column * sheet.resolution, row * sheet.resolution
+    placement = {
+        'x': x,
+        'y': y,
+        'width': shape['width'],
+        'height': shape['height'],
+        'rotated': shape['rotation'] % 180 == 90,
+        'name': piece['name'],
+        'item_index': piece['item_index']
+    }
+    if shape['points'] is not None:
+        placement['rotation'] = shape['rotation']
+        placement['outline'] = [[x + px, y + py] for px, py in shape['points']]
+        placement['area'] = item_area(item)
+    return placement
+
+
+def pack_raster(width, height, items, allow_rotation=True, resolution=RASTER_RESOLUTION, defects=()):
+    """
+    Растровая раскладка на листы width x height (first fit) в формате binpacking.pack_bins:
+    лист – сетка занятости с шагом resolution мм (см. RasterSheet), детали – маски по
+    контуру 'outline' (см. polygons.outline_of) или прямоугольнику; координаты кратны
+    resolution. defects – зоны брака (x, y, w, h) в мм, одинаковые на каждом листе:
+    на них детали не ставятся. Точность ограничена шагом сетки, зато любая форма
+    и любые зоны брака стоят одинаково.
+    """
+    shapes = [_shapes(index, item, allow_rotation, resolution) for index, item in enumerate(items)]
+    sheets = []
+    unplaced = []
+    too_large = set()
+    for piece in expand_items(items):
+        index = piece['item_index']
+        for sheet, placements in sheets:
+            if index in sheet.failed:
+                continue
+            placement = _place(sheet, shapes[index], piece, items[index])
+            if placement is not None:
+                placements.append(placement)
+                break
+            sheet.failed.add(index)
+        else:
+            placement = None
+            if index not in too_large:
+                sheet = RasterSheet(width, height, resolution, defects)
+                placement = _place(sheet, shapes[index], piece, items[index])
+            if placement is None:
+                too_large.add(index)
+                unplaced.append(piece)
+                continue
+            sheets.append((sheet, [placement]))
+    logging.debug(f"pack_raster: {len(sheets)} sheets {width}x{height} at {resolution} mm, "
+                  f"{len(unplaced)} unplaced")
+    return {
+        'sheets': [{'placements': placements, 'used': summarize_used(placements), 'free_space': [],
+                    'area': sum(p.get('area', p['width'] * p['height']) for p in placements)}
+                   for _, placements in sheets],
+        'unplaced': unplaced
+    }
@@ -0,0 +1,40 @@
+from .nesting import leftover_pieces
+from .units import from_mm
+
+
+def plan_scraps(plans, min_width, min_length):
+    """
+    Обрезки рассчитанного раскроя для записи в obrezki.
+    plans – {материал: план planning.plan_material}. Свободное место каждого полотна
+    (и использованного обрезка) делится на непересекающиеся прямоугольники
+    (nesting.leftover_pieces); куски меньше min_width x min_length мм отбрасываются.
+    Полотно, повторённое n раз, даёт n одинаковых наборов обрезков. Полотна с 'locked'
+    уже раскроены и пропускаются. Зоны брака плана ('defects', растровый раскрой) есть
+    на каждом листе плана и в обрезки не входят.
+    Возвращает (обрезки, полотна): обрезки – словари material, fabric_id, length, width, area
+    в единицах материала; полотна – раскроенные полотна, которые после записи нужно пометить 'locked'.
+    """
+    scraps = []
+    cut_sheets = []
+    for material, plan in plans.items():
+        unit = plan['unit']
+        defects = plan.get('defects', ())
+        sheets = [(sheet, ()) for sheet in plan.get('offcut_sheets', [])]
+        sheets += [(sheet, defects) for sheet in plan['sheets']]
+        for sheet, blocked in sheets:
+            if sheet.get('locked'):
+                continue
+            cut_sheets.append(sheet)
+            # У обрезков и листов из партий свой размер
+            width = sheet.get('width', plan['width'])
+            height = sheet.get('height', plan['height'])
+            for _, _, w, h in leftover_pieces(width, height, sheet['placements'], min_width, min_length, blocked):
+                scrap = {
+                    'material': material,
+                    'fabric_id': sheet.get('lot_id', plan['fabric_id']),
+                    'length': from_mm(h, unit),
+                    'width': from_mm(w, unit),
+                    'area': from_mm(w, unit) * from_mm(h, unit)
+                }
+                scraps += [scrap] * sheet.get('repeat', 1)
+    return scraps, cut_sheets
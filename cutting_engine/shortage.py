@@ -0,0 +1,12 @@
+def shortage(required, available):
+    """
+    Нехватка материалов: {материал: required - available} для материалов, которых требуется
+    больше, чем есть. required и available – {материал: количество}; отсутствующего
+    в available материала нет совсем.
+    """
+    result = {}
+    for material, quantity in required.items():
+        missing = quantity - available.get(material, 0)
+        if missing > 0:
+            result[material] = missing
+    return result
@@ -0,0 +1,80 @@
+class UniformGrid:
+    """
+    Пространственный индекс прямоугольников (x, y, w, h) для быстрого отбора кандидатов
+    в проверках пересечения и вложенности (broad phase): плоскость делится на квадратные
+    ячейки cell x cell, объект записывается во все ячейки, которые задевает его габарит.
+    Вставка, удаление и запрос стоят O(задетых ячеек + найденных объектов), поэтому при шаге
+    порядка размера деталей – O(1) в среднем, сколько бы деталей ни было на листе.
+    Ключи объектов – любые хешируемые значения, уникальные в пределах индекса.
+    """
+
+    def __init__(self, cell):
+        self.cell = max(cell, 1)
+        self.cells = {}
+        self.boxes = {}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, key):
+        return key in self.boxes
+
+    def _cells(self, x, y, w, h):
+        cell = self.cell
+        columns = range(int(x // cell), int((x + w) // cell) + 1)
+        return [(gx, gy) for gx in columns for gy in range(int(y // cell), int((y + h) // cell) + 1)]
+
+    def insert(self, key, x, y, w, h):
+        self.boxes[key] = (x, y, w, h)
+        cells = self.cells
+        for cell in self._cells(x, y, w, h):
+            keys = cells.get(cell)
+            if keys is None:
+                cells[cell] = {key}
+            else:
+                keys.add(key)
+
+    def remove(self, key):
+        box = self.boxes.pop(key)
+        cells = self.cells
+        for cell in self._cells(*box):
+            keys = cells[cell]
+            keys.discard(key)
+            if not keys:
+                del cells[cell]
+
+    def candidates(self, x, y, w, h):
+        """
+        Ключи объектов из ячеек, которые задевает область: надмножество пересекающихся.
+        """
+        cells = self.cells
+        found = set()
+        for cell in self._cells(x, y, w, h):
+            keys = cells.get(cell)
+            if keys:
+                found.update(keys)
+        return found
+
+    def query(self, x, y, w, h):
+        """
+        Ключи объектов, которые пересекают область (x, y, w, h) по площади.
+        """
+        right, top = x + w, y + h
+        found = []
+        for key in self.candidates(x, y, w, h):
+            bx, by, bw, bh = self.boxes[key]
+            if bx < right and x < bx + bw and by < top and y < by + bh:
+                found.append(key)
+        return found
+
+    def containing(self, x, y, w, h):
+        """
+        Ключи объектов, целиком содержащих область (x, y, w, h) ненулевой площади.
+        """
+        right, top = x + w, y + h
+        found = []
+        for key in self.candidates(x, y, w, h):
+            bx, by, bw, bh = self.boxes[key]
+            if bx <= x and by <= y and right <= bx + bw and top <= by + bh:
+                found.append(key)
+        return found
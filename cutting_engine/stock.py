@@ -0,0 +1,180 @@
+import logging
+import time
+
+from .nesting import expand_items, pack_sheet
+from .strip_packing import pack_strip
+
+# Поиск по партиям: сколько лучших по заполнению размеров полотна пробуется на каждом шаге
+STOCK_BRANCHING = 3
+STOCK_TIME_LIMIT = 2.0  # секунды
+
+
+def _area(items, counts):
+    return sum(item['width'] * item['height'] * count for item, count in zip(items, counts))
+
+
+def _pattern(width, height, items, remaining, allow_rotation, engine):
+    """
+    Раскладка одного полотна width x height из оставшегося спроса и сколько раз
+    её можно повторить. (None, 0), если на полотно ничего не встаёт.
+    Детали нулевого размера не раскладываются и остаются в спросе (попадут в unplaced).
+    """
+    sheet_area = width * height
+    current = [dict(item, quantity=min(count, sheet_area // (item['width'] * item['height']))
+                    if item['width'] > 0 and item['height'] > 0 else 0)
+               for item, count in zip(items, remaining)]
+    sheet = pack_sheet(width, height, current, allow_rotation, engine)
+    if not sheet['used']:
+        return None, 0
+    return sheet, min(remaining[u['item_index']] // u['count'] for u in sheet['used'])
+
+
+def _split_by_lots(sheet, repeat, width, height, lots, taken):
+    """
+    Распределяет repeat одинаковых полотен по партиям одного размера в порядке id
+    (сначала старые поставки). taken – сколько полотен каждой партии уже взято.
+    """
+    sheets = []
+    for lot in lots:
+        if repeat == 0:
+            break
+        count = min(repeat, lot['count'] - taken.get(lot['id'], 0))
+        if count <= 0:
+            continue
+        taken[lot['id']] = taken.get(lot['id'], 0) + count
+        repeat -= count
+        part = dict(sheet, lot_id=lot['id'], width=width, height=height)
+        if count > 1:
+            part['repeat'] = count
+        else:
+            part.pop('repeat', None)
+        sheets.append(part)
+    return sheets
+
+
+def select_sheets(lots, items, allow_rotation=True, engine='maxrects',
+                  branching=STOCK_BRANCHING, time_limit=STOCK_TIME_LIMIT):
+    """
+    Раскрой листового материала из нескольких партий разного размера
+    (bin packing с полотнами переменного размера и ограниченным запасом).
+    lots – партии [{'id', 'width', 'height', 'count'}], count – сколько полотен есть.
+    Поиск в глубину: на каждом шаге из оставшегося спроса раскладывается одно полотно
+    каждого доступного размера, пробуются branching самых плотных раскладок, раскладка
+    сразу повторяется, пока хватает деталей и полотен. Первая ветка – жадная, поэтому
+    решение есть всегда; дальше ветки отсекаются, если их отходы уже не меньше лучших,
+    и повторно в одно и то же состояние (остаток деталей и полотен) с большими отходами
+    поиск не заходит. По истечении time_limit возвращается лучшее найденное.
+    Критерий – сначала площадь неразмещённых деталей (запаса может не хватить), потом отходы.
+    Возвращает словарь:
+      sheets – листы в формате pack_bins с полями lot_id, width, height;
+      unplaced – детали, которым не хватило полотен или которые не помещаются ни на одно;
+      lots – [{'lot_id', 'count'}] – сколько полотен взято из каждой партии;
+      waste – площадь отходов, мм².
+    """
+    started = time.monotonic()
+    by_size = {}
+    for lot in sorted(lots, key=lambda lot: lot['id']):
+        if lot['count'] > 0:
+            by_size.setdefault((lot['width'], lot['height']), []).append(lot)
+    sizes = list(by_size)
+    available = tuple(sum(lot['count'] for lot in by_size[size]) for size in sizes)
+    patterns = {}
+
+    def pattern(index, remaining):
+        key = (index, remaining)
+        if key not in patterns:
+            width, height = sizes[index]
+            patterns[key] = _pattern(width, height, items, remaining, allow_rotation, engine)
+        return patterns[key]
+
+    start = tuple(int(item['quantity']) for item in items)
+    best = None
+    best_key = None
+    seen = {}
+    nodes = 0
+    stack = [(start, available, 0, ())]
+    while stack:
+        if best is not None and time.monotonic() - started > time_limit:
+            break
+        remaining, stock, waste, steps = stack.pop()
+        nodes += 1
+        # Граница: деталей больше, чем площади в оставшихся полотнах, не разместить
+        stock_area = sum(count * width * height for count, (width, height) in zip(stock, sizes))
+        if best is not None and (max(_area(items, remaining) - stock_area, 0), waste) >= best_key:
+            continue
+        if seen.get((remaining, stock), waste + 1) <= waste:
+            continue
+        seen[(remaining, stock)] = waste
+        children = []
+        for index, (width, height) in enumerate(sizes):
+            if stock[index] == 0:
+                continue
+            sheet, repeat = pattern(index, remaining)
+            if sheet is not None:
+                children.append((sheet['area'] / (width * height), index, sheet, min(repeat, stock[index])))
+        if not children:
+            key = (_area(items, remaining), waste)
+            if best_key is None or key < best_key:
+                best, best_key = (remaining, steps), key
+            continue
+        children.sort(key=lambda child: -child[0])
+        # Самая плотная раскладка кладётся в стек последней и разворачивается первой
+        for _, index, sheet, repeat in reversed(children[:branching]):
+            width, height = sizes[index]
+            used = {u['item_index']: u['count'] * repeat for u in sheet['used']}
+            child_remaining = tuple(count - used.get(i, 0) for i, count in enumerate(remaining))
+            child_stock = stock[:index] + (stock[index] - repeat,) + stock[index + 1:]
+            stack.append((child_remaining, child_stock, waste + repeat * (width * height - sheet['area']),
+                          steps + ((index, sheet, repeat),)))
+
+    remaining, steps = best
+    taken = {}
+    sheets = []
+    for index, sheet, repeat in steps:
+        width, height = sizes[index]
+        sheets.extend(_split_by_lots(sheet, repeat, width, height, by_size[(width, height)], taken))
+    unplaced = expand_items([dict(item, quantity=count) for item, count in zip(items, remaining)])
+    logging.debug(f"select_sheets: {len(sizes)} sizes, {nodes} nodes, lots {taken}, "
+                  f"waste {best_key[1]}, {len(unplaced)} unplaced")
+    return {
+        'sheets': sheets,
+        'unplaced': unplaced,
+        'lots': [{'lot_id': lot_id, 'count': count} for lot_id, count in taken.items()],
+        'waste': best_key[1]
+    }
+
+
+def select_roll(lots, items, allow_rotation=True, pack=pack_strip):
+    """
+    Выбор ширины рулона из нескольких партий: lots – [{'id', 'width', 'length'}],
+    length – остаток партии, мм. Раскладка pack(ширина, items, allow_rotation) – pack_strip
+    или cut_order.plan_cut_order – считается для каждой ширины; берётся ширина
+    с наименьшими отходами среди тех, где деталей шире рулона нет и хватает длины,
+    иначе – с наименьшими неразмещённой площадью и нехваткой длины.
+    Длина списывается с партий выбранной ширины по порядку id.
+    Возвращает результат pack с полями width и lots – [{'lot_id', 'length'}],
+    length – сколько мм взято из партии.
+    """
+    by_width = {}
+    for lot in sorted(lots, key=lambda lot: lot['id']):
+        if lot['length'] > 0:
+            by_width.setdefault(lot['width'], []).append(lot)
+    best = None
+    best_key = None
+    for width, width_lots in by_width.items():
+        result = pack(width, items, allow_rotation)
+        unplaced_area = sum(piece['width'] * piece['height'] for piece in result['unplaced'])
+        missing = max(result['length'] - sum(lot['length'] for lot in width_lots), 0)
+        key = (unplaced_area, missing, width * result['length'] - result['area'])
+        if best_key is None or key < best_key:
+            best, best_key = dict(result, width=width), key
+    taken = []
+    length = best['length']
+    for lot in by_width[best['width']]:
+        if length <= 0:
+            break
+        taken.append({'lot_id': lot['id'], 'length': min(length, lot['length'])})
+        length -= taken[-1]['length']
+    best['lots'] = taken
+    logging.debug(f"select_roll: width {best['width']} of {sorted(by_width)}, lots {taken}")
+    return best
@@ -0,0 +1,126 @@
+import logging
+
+from .nesting import expand_items, summarize_used
+
+
+class SkylinePacker:
+    """
+    Укладка на рулон фиксированной ширины и неограниченной длины (strip packing).
+    Верхняя граница уложенных деталей хранится «линией горизонта» — списком
+    отрезков [x, y, w], упорядоченных по x. Деталь ставится туда, где её верх
+    окажется ниже всего (bottom-left), поворот выбирается для каждой детали.
+    """
+
+    def __init__(self, roll_width, allow_rotation=True):
+        self.roll_width = roll_width
+        self.allow_rotation = allow_rotation
+        self.skyline = [[0, 0, roll_width]]
+        self.placements = []
+        self.length = 0
+
+    def _fit(self, index, width):
+        """
+        Высота, на которую встанет деталь шириной width, начиная с отрезка index,
+        или None, если деталь выходит за край рулона.
+        """
+        x = self.skyline[index][0]
+        if x + width > self.roll_width:
+            return None
+        y = 0
+        remaining = width
+        i = index
+        while remaining > 0:
+            y = max(y, self.skyline[i][1])
+            remaining -= self.skyline[i][2]
+            i += 1
+        return y
+
+    def _find_position(self, width, height):
+        best = None
+        orientations = [(False, width, height)]
+        if self.allow_rotation and width != height:
+            orientations.append((True, height, width))
+        for index, (x, _, segment_width) in enumerate(self.skyline):
+            for rotated, pw, ph in orientations:
+                y = self._fit(index, pw)
+                if y is None:
+                    continue
+                # Ниже верх детали, затем меньше ширина «ступеньки» под ней, затем левее
+                score = (y + ph, segment_width, x)
+                if best is None or score < best[0]:
+                    best = (score, index, x, y, pw, ph, rotated)
+        return best
+
+    def insert(self, name, width, height, **extra):
+        """
+        Ставит деталь на рулон. Возвращает словарь размещения или None,
+        если деталь шире рулона в обеих ориентациях.
+        """
+        best = self._find_position(width, height)
+        if best is None:
+            return None
+        _, index, x, y, pw, ph, rotated = best
+        self._raise_skyline(index, x, y + ph, pw)
+        self.length = max(self.length, y + ph)
+        placement = {
+            'x': x,
+            'y': y,
+            'width': pw,
+            'height': ph,
+            'rotated': rotated,
+            'name': name
+        }
+        placement.update(extra)
+        self.placements.append(placement)
+        return placement
+
+    def _raise_skyline(self, index, x, top, width):
+        right = x + width
+        self.skyline.insert(index, [x, top, width])
+        i = index + 1
+        # Обрезаем отрезки, которые оказались под новой деталью
+        while i < len(self.skyline):
+            segment = self.skyline[i]
+            if segment[0] >= right:
+                break
+            segment_right = segment[0] + segment[2]
+            if segment_right <= right:
+                del self.skyline[i]
+                continue
+            segment[2] = segment_right - right
+            segment[0] = right
+            break
+        # Сливаем соседние отрезки одной высоты
+        for i in (index, index - 1):
+            if 0 <= i < len(self.skyline) - 1 and self.skyline[i][1] == self.skyline[i + 1][1]:
+                self.skyline[i][2] += self.skyline[i + 1][2]
+                del self.skyline[i + 1]
+
+    def used_area(self):
+        return sum(p['width'] * p['height'] for p in self.placements)
+
+
+def pack_strip(roll_width, items, allow_rotation=True):
+    """
+    Раскладывает позиции заказа на рулон шириной roll_width.
+    Возвращает словарь:
+      placements – размещения с координатами (y отсчитывается вдоль рулона);
+      used – сколько деталей каждой позиции поставлено;
+      unplaced – детали, которые шире рулона;
+      length – израсходованная длина рулона;
+      area – занятая площадь.
+    """
+    packer = SkylinePacker(roll_width, allow_rotation)
+    unplaced = []
+    for piece in expand_items(items):
+        placed = packer.insert(piece['name'], piece['width'], piece['height'], item_index=piece['item_index'])
+        if placed is None:
+            unplaced.append(piece)
+    logging.debug(f"pack_strip: {len(packer.placements)} pieces on roll {roll_width}, length {packer.length}")
+    return {
+        'placements': packer.placements,
+        'used': summarize_used(packer.placements),
+        'unplaced': unplaced,
+        'length': packer.length,
+        'area': packer.used_area()
+    }
@@ -0,0 +1,156 @@
+import math
+import time
+
+# 2-opt: переворачиваются участки маршрута не длиннее окна, проходов не больше MAX_PASSES
+TWO_OPT_WINDOW = 40
+TWO_OPT_MAX_PASSES = 5
+TWO_OPT_TIME_LIMIT = 2.0  # секунды
+
+
+def _merge_intervals(intervals):
+    """
+    Объединяет пересекающиеся и касающиеся отрезки прямой: общий край двух соседних
+    деталей режется один раз, а стыкующиеся края – одним проходом.
+    """
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+def cut_segments(width, height, placements):
+    """
+    Резы листа width x height по контурам деталей: отрезки ((x1, y1), (x2, y2)).
+    Деталь режется по 'outline' (polygons), если он есть, иначе по прямоугольнику.
+    Общие края соседних деталей сливаются, края по кромке листа не режутся.
+    """
+    horizontal = {}
+    vertical = {}
+    oblique = set()
+    for p in placements:
+        x, y, w, h = p['x'], p['y'], p['width'], p['height']
+        outline = p.get('outline') or [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+        for start, end in zip(outline, outline[1:] + outline[:1]):
+            (x1, y1), (x2, y2) = sorted([tuple(start), tuple(end)])
+            if y1 == y2:
+                horizontal.setdefault(y1, []).append((x1, x2))
+            elif x1 == x2:
+                vertical.setdefault(x1, []).append((y1, y2))
+            else:
+                oblique.add(((x1, y1), (x2, y2)))
+    segments = sorted(oblique)
+    for y, intervals in sorted(horizontal.items()):
+        if 0 < y < height:
+            segments += [((low, y), (high, y)) for low, high in _merge_intervals(intervals)]
+    for x, intervals in sorted(vertical.items()):
+        if 0 < x < width:
+            segments += [((x, low), (x, high)) for low, high in _merge_intervals(intervals)]
+    return segments
+
+
+def _distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def _nearest_neighbour(segments, origin, cell):
+    """
+    Жадный обход: следующим режется отрезок с ближайшим к головке концом.
+    Концы отрезков разложены по квадратной сетке с шагом cell, поиск идёт кольцами
+    ячеек от головки, поэтому обход почти линеен по числу отрезков.
+    """
+    grid = {}
+    for index, (start, end) in enumerate(segments):
+        for point in (start, end):
+            grid.setdefault((int(point[0] // cell), int(point[1] // cell)), set()).add(index)
+    left = set(range(len(segments)))
+    order = []
+    position = origin
+    while left:
+        cx, cy = int(position[0] // cell), int(position[1] // cell)
+        best = None
+        ring = 0
+        # Точки в кольце ring не ближе (ring - 1) * cell: дальше искать незачем
+        while best is None or (ring - 1) * cell <= best[0]:
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in range(cy - ring, cy + ring + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != ring:
+                        continue
+                    for index in grid.get((gx, gy), ()):
+                        start, end = segments[index]
+                        for reverse, point in ((False, start), (True, end)):
+                            distance = _distance(position, point)
+                            if best is None or distance < best[0]:
+                                best = (distance, index, reverse)
+            ring += 1
+        _, index, reverse = best
+        start, end = segments[index]
+        if reverse:
+            start, end = end, start
+        order.append((start, end))
+        position = end
+        left.discard(index)
+        for point in segments[index]:
+            grid[(int(point[0] // cell), int(point[1] // cell))].discard(index)
+    return order
+
+
+def _two_opt(order, origin, window=TWO_OPT_WINDOW, max_passes=TWO_OPT_MAX_PASSES, time_limit=TWO_OPT_TIME_LIMIT):
+    """
+    Улучшает порядок резов 2-opt: участок маршрута переворачивается (вместе с направлением
+    каждого реза), если это сокращает холостые переходы на его концах.
+    """
+    deadline = time.monotonic() + time_limit
+    count = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(count):
+            if time.monotonic() > deadline:
+                return order
+            before = origin if i == 0 else order[i - 1][1]
+            for j in range(i + 1, min(count, i + window)):
+                after = order[j + 1][0] if j + 1 < count else None
+                old = _distance(before, order[i][0]) + (_distance(order[j][1], after) if after else 0)
+                new = _distance(before, order[j][1]) + (_distance(order[i][0], after) if after else 0)
+                if new < old - 1e-9:
+                    order[i:j + 1] = [(end, start) for start, end in reversed(order[i:j + 1])]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def path_travel(order, origin=(0, 0)):
+    """
+    Холостой ход головки по порядку резов order от точки origin.
+    """
+    travel = 0.0
+    position = origin
+    for start, end in order:
+        travel += _distance(position, start)
+        position = end
+    return travel
+
+
+def tool_path(width, height, placements, cuts=None, origin=(0, 0)):
+    """
+    Упорядоченный маршрут резки листа.
+    Если у листа уже есть гильотинный порядок резов cuts (guillotine.cut_sequence), он
+    и берётся. Иначе режутся контуры деталей (cut_segments), порядок – ближайший сосед
+    и 2-opt по холостому ходу.
+    Возвращает словарь: cuts – [((x1, y1), (x2, y2))] в порядке резки;
+    cut_length и travel – длина резов и холостой ход головки, целые мм.
+    """
+    if cuts is not None:
+        order = [((c['x1'], c['y1']), (c['x2'], c['y2'])) for c in cuts]
+    else:
+        segments = cut_segments(width, height, placements)
+        cell = max(math.sqrt(width * height / max(len(segments), 1)), 1)
+        order = _two_opt(_nearest_neighbour(segments, origin, cell), origin)
+    return {
+        'cuts': order,
+        'cut_length': round(sum(_distance(start, end) for start, end in order)),
+        'travel': round(path_travel(order, origin))
+    }
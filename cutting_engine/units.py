@@ -0,0 +1,55 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Сколько миллиметров в единице длины (символы из таблицы unit_of_measure)
+MM_PER_UNIT = {
+    'мм': 1,
+    'см': 10,
+    'м': 1000
+}
+# Размеры в supply_composition и order_composition хранятся в метрах
+DEFAULT_LENGTH_UNIT = 'м'
+
+
+def length_unit(symbol):
+    """
+    Единица длины для размеров материала. Для нелинейных единиц (шт, м², упк)
+    и пустых значений размеры считаются в метрах.
+    """
+    return symbol if symbol in MM_PER_UNIT else DEFAULT_LENGTH_UNIT
+
+
+def to_mm(value, unit=DEFAULT_LENGTH_UNIT):
+    """
+    Переводит размер из БД (DECIMAL, float, str или None) в целые миллиметры.
+    Через Decimal, чтобы 0.70 м давало ровно 700, а не 699.
+    """
+    if value is None:
+        return 0
+    mm = Decimal(str(value)) * MM_PER_UNIT[length_unit(unit)]
+    return int(mm.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_mm(value, unit=DEFAULT_LENGTH_UNIT):
+    """
+    Переводит миллиметры обратно в единицу unit (для отображения и записи в БД).
+    """
+    return value / MM_PER_UNIT[length_unit(unit)]
+
+
+def ceil_mm(value, step):
+    """
+    Округляет целые миллиметры вверх до кратного step (например, до сантиметра: step=10).
+    """
+    return -(-value // step) * step
+
+
+def format_length(value, unit=DEFAULT_LENGTH_UNIT):
+    return f"{from_mm(value, unit):g} {length_unit(unit)}"
+
+
+def format_area(value, unit=DEFAULT_LENGTH_UNIT):
+    """
+    Площадь в мм² в виде строки в квадратных единицах unit.
+    """
+    factor = MM_PER_UNIT[length_unit(unit)] ** 2
+    return f"{value / factor:g} {length_unit(unit)}²"
@@ -0,0 +1,14 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(workers):
+    """
+    Пул процессов для расчётов движка. Процессы запускаются через spawn:
+    дочерние не наследуют потоки и состояние Qt родителя.
+    Процесс spawn импортирует модуль __main__ родителя под именем __mp_main__, поэтому
+    запускающий скрипт должен создавать окно только под if __name__ == "__main__"
+    (как main_end3.py и benchmark.py), а функции для пула – лежать в импортируемых
+    модулях, как вся логика cutting_engine.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
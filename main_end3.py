@@ -1,16 +1,30 @@
 import sys
 import logging
 import configparser
-import math
+import time
 from PyQt6 import QtWidgets, QtCore
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 import pymysql
 from texti import Ui_Form  # Ваш модуль с описанием интерфейса
+from cutting_engine import (AnytimeNester, OffcutIndex, PatternCache, add_cuts, count_sheets, export_plan,
+                            format_area, format_length, from_mm, length_unit, make_report, pack_offcuts,
+                            plan_materials, plan_scraps, replan_material, shortage, to_mm)
+from cutting_engine.raster import RASTER_RESOLUTION
 
 logging.basicConfig(level=logging.DEBUG)
 
+# Фоновая оптимизация раскроя для крупных заказов
+OPTIMIZATION_MIN_PIECES = 200
+OPTIMIZATION_TIME_BUDGET = 20.0  # секунды
+# Остатки листа меньше этого размера (мм, с учётом поворота) в обрезки не записываются
+SCRAP_MIN_WIDTH = 100
+SCRAP_MIN_LENGTH = 200
+# Раскрой рулона настилами: наибольшее число слоёв в настиле и длина маркера (стола), мм
+SPREAD_MAX_PLIES = 40
+MARKER_MAX_LENGTH = 6000
+
 class DatabaseManager:
     def __init__(self):
         self.config = configparser.ConfigParser()
@@ -127,6 +141,24 @@ class SupplyRequestDialog(QtWidgets.QDialog):
             length, width = 0, 0
         return length, width
 
+class OptimizationThread(QtCore.QThread):
+    """
+    Запускает AnytimeNester вне главного потока и передаёт улучшенные планы сигналом.
+    """
+    improved = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, material_name, nester, parent=None):
+        super().__init__(parent)
+        self.material_name = material_name
+        self.nester = nester
+        self.started_at = time.perf_counter()
+
+    def run(self):
+        try:
+            self.nester.run(on_improvement=lambda plan: self.improved.emit(self.material_name, plan))
+        except Exception as e:
+            logging.error(f"Optimization error for {self.material_name}: {str(e)}")
+
 class Main(QtWidgets.QWidget, Ui_Form):
     def __init__(self, parent=None):
         super(Main, self).__init__(parent)
@@ -139,6 +171,54 @@ class Main(QtWidgets.QWidget, Ui_Form):
         self.hardware_shortage = {}
         self.shortage_data = {}
 
+        # Планы раскроя по материалам и потоки фоновой оптимизации
+        self.cutting_plans = {}
+        self.total_fabric_required = {}
+        self.optimization_threads = []
+        # Кэш планов: повторный расчёт того же заказа или тех же размеров не пересчитывает раскрой
+        self.pattern_cache = PatternCache()
+        # Индекс неиспользованных обрезков, загружается при первом расчёте
+        self.offcut_index = None
+        # Обрезки текущих планов: id -> (material_id, лист-обрезок). Пока раскрой не зафиксирован,
+        # они только убраны из индекса, в БД отмечаются в commit_offcuts
+        self.reserved_offcuts = {}
+
+        self.pushButton_stop_optimization = QtWidgets.QPushButton("Остановить оптимизацию")
+        self.pushButton_stop_optimization.setMinimumSize(QtCore.QSize(0, 30))
+        self.pushButton_stop_optimization.setEnabled(False)
+        self.verticalLayout_3.insertWidget(
+            self.verticalLayout_3.indexOf(self.pushButton_calculate_rascr) + 1,
+            self.pushButton_stop_optimization
+        )
+        # Пакетный раскрой всех подтверждённых заказов
+        self.pushButton_batch_cutting = QtWidgets.QPushButton("Раскрой всех заказов")
+        self.pushButton_batch_cutting.setMinimumSize(QtCore.QSize(0, 30))
+        self.pushButton_batch_cutting.setStyleSheet(self.pushButton_calculate_rascr.styleSheet())
+        self.verticalLayout_3.insertWidget(
+            self.verticalLayout_3.indexOf(self.pushButton_stop_optimization) + 1,
+            self.pushButton_batch_cutting
+        )
+        # Гильотинный режим: только сквозные резы, карта показывает порядок резов
+        self.checkBox_guillotine = QtWidgets.QCheckBox("Только сквозные (гильотинные) резы")
+        self.verticalLayout_3.insertWidget(
+            self.verticalLayout_3.indexOf(self.pushButton_batch_cutting) + 1,
+            self.checkBox_guillotine
+        )
+        # Растровая раскладка: детали по маскам на сетке, в обход зон брака
+        self.checkBox_raster = QtWidgets.QCheckBox(f"Растровая раскладка (сетка {RASTER_RESOLUTION} мм)")
+        self.verticalLayout_3.insertWidget(
+            self.verticalLayout_3.indexOf(self.checkBox_guillotine) + 1,
+            self.checkBox_raster
+        )
+        # Маршруты резки для станка в DXF и SVG
+        self.pushButton_export_paths = QtWidgets.QPushButton("Экспорт для станка (DXF/SVG)")
+        self.pushButton_export_paths.setMinimumSize(QtCore.QSize(0, 30))
+        self.pushButton_export_paths.setStyleSheet(self.pushButton_calculate_rascr.styleSheet())
+        self.verticalLayout_3.insertWidget(
+            self.verticalLayout_3.indexOf(self.checkBox_raster) + 1,
+            self.pushButton_export_paths
+        )
+
         # Инициализируем область для отображения карт раскроя (только для ткани)
         self.scrollAreaWidgetContents_2.setLayout(QtWidgets.QVBoxLayout())
         self.cutting_maps_container = CuttingMapsContainer()
@@ -149,6 +229,9 @@ class Main(QtWidgets.QWidget, Ui_Form):
 
     def init_ui(self):
         self.pushButton_calculate_rascr.clicked.connect(self.calculate_cutting)
+        self.pushButton_stop_optimization.clicked.connect(self.stop_optimization)
+        self.pushButton_batch_cutting.clicked.connect(self.calculate_batch_cutting)
+        self.pushButton_export_paths.clicked.connect(self.export_cutting_paths)
         self.pushButton_back.clicked.connect(self.show_order_page)
         # Кнопка для расчёта обрезков
         self.pushButton_calculate_scraps.clicked.connect(self.calculate_scraps_mathematically)
@@ -199,11 +282,14 @@ class Main(QtWidgets.QWidget, Ui_Form):
             self.current_order = order
             with self.db_manager as db:
                 fabric_query = """
-                SELECT pm.supply_composition_id, pm.quantity, sc.width, sc.length, m.name as material_name, m.id as material_id
+                SELECT pm.supply_composition_id, pm.quantity, sc.width, sc.length, m.name as material_name, m.id as material_id,
+                       uom.symbol as unit
                 FROM product_materials pm
                 INNER JOIN supply_composition sc ON pm.supply_composition_id = sc.id
                 INNER JOIN material m ON sc.material_id = m.id
                 INNER JOIN order_composition oc ON pm.order_composition_id = oc.id
+                LEFT JOIN material_type mt ON m.material_type_id = mt.id
+                LEFT JOIN unit_of_measure uom ON mt.unit_of_measure_id = uom.id
                 WHERE oc.order_id = %s AND m.material_type_id != 2
                 """
                 fabric_data = db.execute_query(fabric_query, (order['id'],))
@@ -211,17 +297,20 @@ class Main(QtWidgets.QWidget, Ui_Form):
                 for fabric in fabric_data:
                     fabric_id = fabric['supply_composition_id']
                     if fabric_id not in fabrics:
+                        unit = length_unit(fabric['unit'])
                         fabrics[fabric_id] = {
                             'id': fabric['material_id'],
-                            'width': float(fabric['width']),
-                            'height': float(fabric['length']),
+                            'width': to_mm(fabric['width'], unit),
+                            'height': to_mm(fabric['length'], unit),
+                            'unit': unit,
                             'quantity': int(fabric['quantity']),
                             'material_name': fabric['material_name']
                         }
                     else:
                         fabrics[fabric_id]['quantity'] += int(fabric['quantity'])
                 fabric_info = "\n".join([
-                    f"{data['material_name']} (id {data['id']}) #{fabric_id}: {data['width']}x{data['height']} см, {data['quantity']} шт"
+                    f"{data['material_name']} (id {data['id']}) #{fabric_id}: "
+                    f"{from_mm(data['width'], data['unit']):g}x{format_length(data['height'], data['unit'])}, {data['quantity']} шт"
                     for fabric_id, data in fabrics.items()
                 ])
                 self.label_3.setText(f"Доступные полотна ткани:\n{fabric_info}")
@@ -240,8 +329,9 @@ class Main(QtWidgets.QWidget, Ui_Form):
                 self.label_2.setText(f"Требуется изделий: {total_products}")
                 self.label_2.adjustSize()
 
-                total_area = sum(item['width'] * item['length'] * item['quantity'] for item in order_items)
-                self.label_5.setText(f"Общая площадь ткани: {total_area} см²")
+                # Размеры изделий в order_composition – в метрах
+                total_area = sum(to_mm(item['width']) * to_mm(item['length']) * item['quantity'] for item in order_items)
+                self.label_5.setText(f"Общая площадь ткани: {format_area(total_area)}")
                 self.label_5.adjustSize()
 
                 required_query = """
@@ -264,199 +354,516 @@ class Main(QtWidgets.QWidget, Ui_Form):
                 GROUP BY m.name
                 """
                 available_data = db.execute_query(available_query)
-                hardware_info_lines = []
-                self.hardware_shortage = {}
-                for req in required_data:
-                    hardware_name = req['hardware_name']
-                    required_qty = req['required']
-                    available_qty = 0
-                    for avail in available_data:
-                        if avail['hardware_name'] == hardware_name:
-                            available_qty = avail['available']
-                            break
-                    hardware_info_lines.append(
-                        f"{hardware_name}: требуется {required_qty} шт, доступно {available_qty} шт"
-                    )
-                    if required_qty > available_qty:
-                        self.hardware_shortage[hardware_name] = required_qty - available_qty
+                required = {row['hardware_name']: row['required'] for row in required_data}
+                available = {row['hardware_name']: row['available'] for row in available_data}
+                hardware_info_lines = [
+                    f"{hardware_name}: требуется {required_qty} шт, доступно {available.get(hardware_name, 0)} шт"
+                    for hardware_name, required_qty in required.items()
+                ]
+                self.hardware_shortage = shortage(required, available)
                 self.label_4.setText("Фурнитура:\n" + "\n".join(hardware_info_lines))
                 self.label_4.adjustSize()
         except Exception as e:
             self.show_error_message(f"Ошибка загрузки данных: {str(e)}")
 
-    def pack_single_fabric(self, fabric_width, fabric_height, items):
-        """
-        Метод для расчёта раскроя с построением карты размещения изделий.
-        Используется только для визуализации (calculate_cutting).
-        """
-        logging.debug(f"pack_single_fabric: fabric {fabric_width}x{fabric_height}, items: {items}")
-        best_result = {'placements': [], 'used': [], 'area': 0}
-        for rotation in [False, True]:
-            temp_items = [item.copy() for item in items if item['quantity'] > 0]
-            placements = []
-            used = []
-            max_cols = int(fabric_width // (temp_items[0]['width'] if not rotation else temp_items[0]['height']))
-            for item in sorted(temp_items, key=lambda x: (-x['width'], -x['height'])):
-                item_width = item['width'] if not rotation else item['height']
-                item_height = item['height'] if not rotation else item['width']
-                possible_count = int((fabric_width // item_width) * (fabric_height // item_height))
-                count = min(possible_count, item['quantity'])
-                if count > 0:
-                    placements.append({
-                        'x': 0,
-                        'y': 0,
-                        'width': item_width,
-                        'height': item_height,
-                        'count': count,
-                        'name': item['name']
-                    })
-                    used.append({
-                        'name': item['name'],
-                        'count': count
-                    })
-                    item['quantity'] -= count
-            total_area = sum(p['width'] * p['height'] * p['count'] for p in placements)
-            if total_area > best_result['area']:
-                best_result = {
-                    'placements': placements,
-                    'used': used,
-                    'area': total_area
-                }
-        logging.debug(f"pack_single_fabric returning: {best_result}")
-        return best_result['placements'], best_result['used']
-
-    def create_cutting_map(self, fabric_id, width, height, placements, material_name):
+    def create_cutting_map(self, fabric_id, width, height, placements, material_name, repeat=1, unit='м', cuts=None):
         """
         Создаёт карту раскроя с визуальным отображением размещения изделий.
+        Размеры и координаты – в миллиметрах, на карте они показываются в единице материала unit.
+        Одинаковые полотна рисуются одной картой с числом повторов repeat в заголовке.
+        cuts – порядок гильотинных резов (cutting_engine.guillotine.cut_sequence): резы
+        рисуются пунктиром с номером по порядку.
+        Детали с контуром ('outline', раскладка cutting_engine.polygons) рисуются по контуру.
         """
         fig = Figure(figsize=(6, 4))
         canvas = FigureCanvas(fig)
         canvas.setFixedSize(600, 400)
         ax = fig.add_subplot(111)
-        ax.set_title(f"{material_name} ({width}x{height} см)")
-        ax.set_xlim(0, width)
-        ax.set_ylim(0, height)
+        title = f"{material_name} ({from_mm(width, unit):g}x{format_length(height, unit)})"
+        if repeat > 1:
+            title += f" × {repeat}"
+        if cuts:
+            title += f", резов {len(cuts)}"
+        ax.set_title(title)
+        ax.set_xlim(0, from_mm(width, unit))
+        ax.set_ylim(0, from_mm(height, unit))
         ax.grid(True)
-        ax.add_patch(plt.Rectangle((0, 0), width, height, fill=False, edgecolor='black', lw=2))
+        ax.add_patch(plt.Rectangle((0, 0), from_mm(width, unit), from_mm(height, unit),
+                                   fill=False, edgecolor='black', lw=2))
         for p in placements:
-            for i in range(p['count']):
-                cols = int(width // p['width'])
-                row = i // cols
-                col = i % cols
-                x = col * p['width']
-                y = row * p['height']
-                rect = plt.Rectangle((x, y), p['width'], p['height'],
-                                     edgecolor='blue', facecolor='lightblue', alpha=0.5)
-                ax.add_patch(rect)
-                ax.text(x + p['width'] / 2, y + p['height'] / 2,
-                        f"{p['name']}\n{p['width']}x{p['height']}",
-                        ha='center', va='center', fontsize=6)
+            x, y = from_mm(p['x'], unit), from_mm(p['y'], unit)
+            w, h = from_mm(p['width'], unit), from_mm(p['height'], unit)
+            if p.get('outline'):
+                shape = plt.Polygon([(from_mm(px, unit), from_mm(py, unit)) for px, py in p['outline']],
+                                    closed=True, edgecolor='blue', facecolor='lightblue', alpha=0.5)
+            else:
+                shape = plt.Rectangle((x, y), w, h, edgecolor='blue', facecolor='lightblue', alpha=0.5)
+            ax.add_patch(shape)
+            ax.text(x + w / 2, y + h / 2, f"{p['name']}\n{w:g}x{h:g}",
+                    ha='center', va='center', fontsize=6)
+        for number, cut in enumerate(cuts or [], 1):
+            xs = [from_mm(cut['x1'], unit), from_mm(cut['x2'], unit)]
+            ys = [from_mm(cut['y1'], unit), from_mm(cut['y2'], unit)]
+            ax.plot(xs, ys, color='red', linestyle='--', lw=0.8)
+            ax.text(xs[0], ys[0], str(number), color='red', fontsize=5)
         self.cutting_maps_container.add_cutting_map(canvas)
 
-    def insert_scrap(self, prod_mat_id, scrap_length, scrap_width, scrap_area, db=None):
+    def show_cutting_plans(self):
+        """
+        Перерисовывает карты раскроя всех материалов из self.cutting_plans.
+        """
+        self.cutting_maps_container.clear_maps()
+        for material, plan in self.cutting_plans.items():
+            for sheet in plan.get('offcut_sheets', []):
+                self.create_cutting_map(plan['fabric_id'], sheet['width'], sheet['height'], sheet['placements'],
+                                        f"{material}, обрезок #{sheet['offcut_id']}", unit=plan['unit'],
+                                        cuts=sheet.get('cuts'))
+            for sheet in plan['sheets']:
+                # Листы из партий разного размера несут свой размер и партию
+                self.create_cutting_map(sheet.get('lot_id', plan['fabric_id']), sheet.get('width', plan['width']),
+                                        sheet.get('height', plan['height']), sheet['placements'], material,
+                                        sheet.get('repeat', 1), plan['unit'], sheet.get('cuts'))
+
+    def show_fabric_required(self):
+        result_text = "Необходимо полотен ткани для выполнения заказа:\n"
+        for material, data in self.total_fabric_required.items():
+            result_text += f"{material} (id {data['id']}): {data['required']} {data['unit']}"
+            if data.get('offcuts'):
+                result_text += f" + обрезков: {data['offcuts']}"
+            if 'spreads' in data['report']:
+                result_text += f", настилов: {data['report']['spreads']}"
+            if data.get('lots'):
+                result_text += " (партии: " + ", ".join(
+                    f"#{lot['lot_id']} – {lot['count']} шт" if 'count' in lot else
+                    f"#{lot['lot_id']} – {format_length(lot['length'], data['unit'])}"
+                    for lot in data['lots']) + ")"
+            report = data['report']
+            result_text += f" (нижняя граница {report['lower_bound']}"
+            if 'lp_bound' in data:
+                result_text += f", ЛП {data['lp_bound']:.2f}"
+            result_text += f", заполнение {report['utilisation']}%, {report['time']} с)"
+            if report.get('stock_shortage'):
+                result_text += f", сверх запаса партий: {report['stock_shortage']} шт"
+            if report.get('unplaced'):
+                result_text += f", не размещено деталей: {report['unplaced']}"
+            if report.get('surplus'):
+                result_text += f", лишних деталей на раскроенных полотнах: {report['surplus']}"
+            if 'cut_length' in report:
+                unit = self.cutting_plans[material]['unit']
+                result_text += (f", резы {format_length(report['cut_length'], unit)}, "
+                                f"холостой ход {format_length(report['travel'], unit)}")
+            if data.get('optimizing'):
+                result_text += " — идёт оптимизация..."
+            result_text += "\n"
+        self.label_6.setText(result_text)
+        self.label_6.adjustSize()
+
+    def start_optimization(self, material, fabric_width, fabric_height, items, lower_bound=0):
+        """
+        Запускает фоновый поиск более плотного раскроя материала (см. metaheuristic.AnytimeNester).
+        lower_bound – нижняя граница числа полотен: дойдя до неё, поиск останавливается.
+        """
+        engine = 'guillotine' if self.cutting_plans[material].get('guillotine') else 'maxrects'
+        nester = AnytimeNester(fabric_width, fabric_height, items, time_budget=OPTIMIZATION_TIME_BUDGET,
+                               engine=engine, lower_bound=lower_bound)
+        thread = OptimizationThread(material, nester, self)
+        thread.improved.connect(self.on_plan_improved)
+        thread.finished.connect(lambda t=thread: self.on_optimization_finished(t))
+        self.optimization_threads.append(thread)
+        self.total_fabric_required[material]['optimizing'] = True
+        self.pushButton_stop_optimization.setEnabled(True)
+        thread.start()
+
+    def on_plan_improved(self, material, plan):
+        # Планы от остановленной (устаревшей) оптимизации не применяем
+        if self.sender().nester.stopped():
+            return
+        current = self.cutting_plans.get(material)
+        if current is None or count_sheets(plan['sheets']) >= count_sheets(current['sheets']):
+            return
+        # Раскроенные полотна уже не заменить
+        if any(sheet.get('locked') for sheet in current['sheets']):
+            return
+        # Гильотинному плану нужны сквозные резы на каждом листе, иначе улучшение не берём
+        if current.get('guillotine') and not all(add_cuts(sheet, current['width'], current['height'])
+                                                 for sheet in plan['sheets']):
+            logging.debug(f"Optimized plan of {material} is not guillotine-cuttable, keeping current plan")
+            return
+        logging.debug(f"Optimization improved {material}: {count_sheets(current['sheets'])} -> "
+                      f"{count_sheets(plan['sheets'])} sheets")
+        self.tag_order_lines(plan['sheets'], self.sender().nester.items)
+        current['sheets'] = plan['sheets']
+        data = self.total_fabric_required[material]
+        data['required'] = count_sheets(plan['sheets'])
+        data['report'] = make_report(
+            {'is_roll': False, 'items': current['items']},
+            {'material': material, 'unit': data['unit'], 'required': data['required'], 'plan': current},
+            time.perf_counter() - self.sender().started_at, 'annealing'
+        )
+        self.show_cutting_plans()
+        self.show_fabric_required()
+
+    def on_optimization_finished(self, thread):
+        if thread in self.optimization_threads:
+            self.optimization_threads.remove(thread)
+        data = self.total_fabric_required.get(thread.material_name)
+        if data is not None and not any(t.material_name == thread.material_name for t in self.optimization_threads):
+            data['optimizing'] = False
+            self.show_fabric_required()
+        if not self.optimization_threads:
+            self.pushButton_stop_optimization.setEnabled(False)
+
+    def stop_optimization(self):
+        for thread in self.optimization_threads:
+            thread.nester.stop()
+
+    def closeEvent(self, event):
+        self.stop_optimization()
+        for thread in list(self.optimization_threads):
+            thread.wait()
+        super().closeEvent(event)
+
+    def insert_scraps(self, scraps, db):
+        """
+        Записывает обрезки в таблицу obrezki одним запросом.
+        scraps – список (material_id, supply_composition_id, length, width, remainder) в единицах материала.
+        Возвращает id первой вставленной строки.
+        """
+        query = f"""
+        INSERT INTO obrezki (material_id, supply_composition_id, length, width, remainder, creation_date, is_used)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s, CURDATE(), 0)"] * len(scraps))}
+        """
+        first_id = db.execute_insert(query, tuple(value for scrap in scraps for value in scrap))
+        logging.debug(f"Inserted {len(scraps)} scraps starting from id {first_id}")
+        return first_id
+
+    def load_offcut_index(self, db, since_id=None):
         """
-        Вставляет запись обрезков в таблицу obrezki.
-        Если передан параметр db, используется он, иначе создаётся новое соединение.
+        Загружает неиспользованные обрезки в индекс один раз за сессию (см. offcut_index.OffcutIndex).
+        Дальше индекс поддерживается инкрементально: использованные обрезки из него убираются,
+        новые добавляются вызовом с since_id – id первой новой строки.
         """
+        if self.offcut_index is not None and since_id is None:
+            return self.offcut_index
         query = """
-        INSERT INTO obrezki (prod_mat_id, length, width, remainder, creation_date, is_used)
-        VALUES (%s, %s, %s, %s, CURDATE(), 0)
+        SELECT o.id, o.material_id, o.length, o.width, uom.symbol as unit
+        FROM obrezki o
+        INNER JOIN material m ON o.material_id = m.id
+        LEFT JOIN material_type mt ON m.material_type_id = mt.id
+        LEFT JOIN unit_of_measure uom ON mt.unit_of_measure_id = uom.id
+        WHERE o.is_used = 0 AND o.id >= %s
+        """
+        if self.offcut_index is None:
+            self.offcut_index = OffcutIndex()
+            since_id = 0
+        for row in db.execute_query(query, (since_id,)):
+            unit = length_unit(row['unit'])
+            self.offcut_index.insert(row['material_id'], row['id'], to_mm(row['width'], unit),
+                                     to_mm(row['length'], unit))
+        return self.offcut_index
+
+    def release_offcuts(self):
+        """
+        Возвращает в индекс обрезки прежних планов, которые не были зафиксированы.
+        """
+        if self.offcut_index is not None:
+            for material_id, sheet in self.reserved_offcuts.values():
+                self.offcut_index.insert(material_id, sheet['offcut_id'], sheet['width'], sheet['height'])
+        self.reserved_offcuts = {}
+
+    def commit_offcuts(self, db):
+        """
+        Отмечает обрезки текущих планов использованными (is_used = 1). Вызывается при фиксации
+        раскроя: записи обрезков или переводе заказа в следующий статус.
+        """
+        if not self.reserved_offcuts:
+            return
+        ids = list(self.reserved_offcuts)
+        marked = db.execute_query(
+            f"UPDATE obrezki SET is_used = 1 WHERE id IN ({', '.join(['%s'] * len(ids))}) AND is_used = 0",
+            tuple(ids))
+        self.reserved_offcuts = {}
+        logging.debug(f"Offcuts marked as used: {ids}")
+        if marked < len(ids):
+            logging.warning(f"{len(ids) - marked} of offcuts {ids} were already used elsewhere")
+            self.show_error_message(f"Часть обрезков раскроя ({len(ids) - marked}) уже использована "
+                                    f"в другом заказе. Пересчитайте раскрой.")
+
+    def load_cutting_data(self, db, order_ids):
+        """
+        Загружает ткань и позиции заказов order_ids, сгруппированные по материалам.
+        Каждая позиция помечена 'order_composition_id'; если заказов несколько,
+        к имени изделия добавляется номер заказа. У ткани 'lots' – все партии материала
+        с ненулевым остатком (remainder): у листов – число полотен, у рулона – длина
+        в единице материала; раскрой выбирает, из каких партий резать (см. cutting_engine.stock).
+        Возвращает (fabrics_by_material, items_by_material).
+        """
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        fabric_query = f"""
+        SELECT pm.supply_composition_id, sc.width, sc.length, m.name as material_name, m.id as material_id,
+               uom.symbol as unit
+        FROM product_materials pm
+        INNER JOIN supply_composition sc ON pm.supply_composition_id = sc.id
+        INNER JOIN material m ON sc.material_id = m.id
+        INNER JOIN order_composition oc ON pm.order_composition_id = oc.id
+        LEFT JOIN material_type mt ON m.material_type_id = mt.id
+        LEFT JOIN unit_of_measure uom ON mt.unit_of_measure_id = uom.id
+        WHERE oc.order_id IN ({placeholders}) AND m.material_type_id != 2
+        """
+        fabric_data = db.execute_query(fabric_query, tuple(order_ids))
+        fabrics_by_material = {}
+        for fabric in fabric_data:
+            mat_name = fabric['material_name']
+            if mat_name not in fabrics_by_material:
+                # Все размеры переводятся в целые миллиметры здесь, на границе с БД
+                unit = length_unit(fabric['unit'])
+                fabrics_by_material[mat_name] = {
+                    'id': fabric['material_id'],
+                    'supply_composition_id': fabric['supply_composition_id'],
+                    'width': to_mm(fabric['width'], unit),
+                    'height': to_mm(fabric['length'], unit),
+                    'unit': unit,
+                    'material_name': mat_name
+                }
+                # Нулевой размер в supply_composition означает рулон без фиксированной длины
+                info = fabrics_by_material[mat_name]
+                info['is_roll'] = not (info['width'] > 0 and info['height'] > 0)
+        if fabrics_by_material:
+            materials = {info['id']: info for info in fabrics_by_material.values()}
+            lots_query = f"""
+            SELECT sc.id, sc.material_id, sc.width, sc.length, sc.remainder
+            FROM supply_composition sc
+            WHERE sc.material_id IN ({", ".join(["%s"] * len(materials))}) AND sc.remainder > 0
+            ORDER BY sc.id
+            """
+            for info in fabrics_by_material.values():
+                info['lots'] = []
+            for lot in db.execute_query(lots_query, tuple(materials)):
+                info = materials[lot['material_id']]
+                width, height = to_mm(lot['width'], info['unit']), to_mm(lot['length'], info['unit'])
+                # Рулоны и листы одного материала не смешиваются
+                if info['is_roll'] == (width > 0 and height > 0):
+                    continue
+                if info['is_roll']:
+                    info['lots'].append({'id': lot['id'], 'width': max(width, height),
+                                         'length': to_mm(lot['remainder'], info['unit'])})
+                else:
+                    info['lots'].append({'id': lot['id'], 'width': width, 'height': height,
+                                         'count': int(lot['remainder'])})
+        logging.debug(f"Grouped fabrics: {fabrics_by_material}")
+
+        order_query = f"""
+        SELECT oc.id, oc.order_id, p.name, oc.quantity, oc.width, oc.length, m.name as material_name
+        FROM order_composition oc
+        JOIN product p ON oc.product_id = p.id
+        JOIN product_materials pm ON oc.id = pm.order_composition_id
+        JOIN supply_composition sc ON pm.supply_composition_id = sc.id
+        JOIN material m ON sc.material_id = m.id
+        WHERE oc.order_id IN ({placeholders}) AND m.material_type_id != 2
+        ORDER BY oc.order_id, oc.id
+        """
+        order_items = db.execute_query(order_query, tuple(order_ids))
+        items_by_material = {}
+        for item in order_items:
+            mat_name = item['material_name']
+            if mat_name not in items_by_material:
+                items_by_material[mat_name] = []
+            name = item['name'] if len(order_ids) == 1 else f"{item['name']} #{item['order_id']}"
+            # Размеры изделий в order_composition – в метрах
+            items_by_material[mat_name].append({
+                'name': name,
+                'order_composition_id': item['id'],
+                'width': to_mm(item['width']),
+                'height': to_mm(item['length']),
+                'quantity': int(item['quantity'])
+            })
+        logging.debug(f"Grouped order items: {items_by_material}")
+        return fabrics_by_material, items_by_material
+
+    @staticmethod
+    def tag_order_lines(sheets, items):
+        """
+        Помечает каждое размещение номером позиции заказа (order_composition.id).
+        """
+        for sheet in sheets:
+            for p in sheet['placements']:
+                p['order_composition_id'] = items[p['item_index']]['order_composition_id']
+
+    @staticmethod
+    def order_lines(fabric_info, items):
+        """
+        Состав раскраиваемого материала: полотно и позиции без количеств.
+        Прежний план можно пересчитывать инкрементально, только если состав не изменился.
+        """
+        return ([fabric_info['supply_composition_id'], fabric_info['width'], fabric_info['height']]
+                + [(item['order_composition_id'], item['width'], item['height']) for item in items])
+
+    def plan_cutting(self, db, fabrics_by_material, items_by_material, previous=None):
+        """
+        Раскраивает позиции по материалам: сначала на обрезки, затем на новые полотна.
+        Если в previous (прежние self.cutting_plans) есть план материала с тем же составом позиций,
+        он пересчитывается инкрементально: перекладываются только листы с изменившимися
+        позициями и хвостовой лист, раскроенные листы (locked) не трогаются.
+        Заполняет self.cutting_plans и self.total_fabric_required. Обрезки прежних планов
+        возвращаются в индекс, выбранные для новых – только убираются из него и запоминаются
+        в self.reserved_offcuts: в БД они отмечаются при фиксации раскроя (commit_offcuts),
+        поэтому повторный расчёт или предпросмотр их не расходует.
+        Возвращает материалы для фоновой оптимизации:
+        (материал, ширина, длина, позиции, нижняя граница числа полотен).
         """
-        if db is None:
-            with self.db_manager as db_conn:
-                db_conn.execute_insert(query, (prod_mat_id, scrap_length, scrap_width, scrap_area))
-        else:
-            db.execute_insert(query, (prod_mat_id, scrap_length, scrap_width, scrap_area))
-        logging.debug(f"Inserted scrap for prod_mat_id {prod_mat_id}: {scrap_length}x{scrap_width}, area {scrap_area}")
+        previous = previous or {}
+        guillotine = self.checkBox_guillotine.isChecked()
+        engine = 'guillotine' if guillotine else 'maxrects'
+        raster = RASTER_RESOLUTION if self.checkBox_raster.isChecked() else None
+        # Сначала детали раскладываются на неиспользованные обрезки того же материала.
+        # Выбранные обрезки сверяются с БД: их могли израсходовать в другой сессии.
+        offcut_index = self.load_offcut_index(db)
+        released = set(self.reserved_offcuts)
+        self.release_offcuts()
+        check_query = "SELECT id FROM obrezki WHERE id IN ({}) AND is_used = 0"
+        taken = set()
+        while True:
+            offcut_sheets = {}
+            consumed_offcuts = []
+            tasks = []
+            for material, items in items_by_material.items():
+                if material not in fabrics_by_material:
+                    continue
+                fabric_info = fabrics_by_material[material]
+                lines = self.order_lines(fabric_info, items)
+                old_plan = previous.get(material)
+                if (old_plan is not None and old_plan.get('order_lines') == lines
+                        and old_plan.get('guillotine', False) == guillotine and old_plan.get('raster') == raster
+                        and not any(sheet['offcut_id'] in taken for sheet in old_plan['offcut_sheets'])):
+                    # Обрезки прежнего плана остаются за ним – на них то же, что было;
+                    # незафиксированные снова занимаются
+                    offcut_sheets[material] = old_plan['offcut_sheets']
+                    for sheet in offcut_sheets[material]:
+                        if sheet['offcut_id'] in released:
+                            offcut_index.remove(fabric_info['id'], sheet['offcut_id'])
+                            consumed_offcuts.append((fabric_info['id'], sheet))
+                    on_offcuts = [0] * len(items)
+                    for sheet in offcut_sheets[material]:
+                        for used in sheet['used']:
+                            on_offcuts[used['item_index']] += used['count']
+                    items = [dict(item, quantity=max(item['quantity'] - count, 0))
+                             for item, count in zip(items, on_offcuts)]
+                    tasks.append({
+                        'material': material,
+                        'fabric_id': fabric_info['supply_composition_id'],
+                        'width': fabric_info['width'],
+                        'height': fabric_info['height'],
+                        'is_roll': fabric_info['is_roll'],
+                        'unit': fabric_info['unit'],
+                        'lots': fabric_info['lots'],
+                        'guillotine': guillotine,
+                        'raster': raster,
+                        'max_plies': SPREAD_MAX_PLIES,
+                        'max_marker_length': MARKER_MAX_LENGTH,
+                        'items': items,
+                        'order_lines': lines,
+                        'previous': old_plan
+                    })
+                    continue
+                offcut_sheets[material], items = pack_offcuts(offcut_index.tree(fabric_info['id']), items,
+                                                              engine=engine)
+                if guillotine:
+                    for sheet in offcut_sheets[material]:
+                        add_cuts(sheet, sheet['width'], sheet['height'])
+                consumed_offcuts.extend((fabric_info['id'], sheet) for sheet in offcut_sheets[material])
+                tasks.append({
+                    'material': material,
+                    'fabric_id': fabric_info['supply_composition_id'],
+                    'width': fabric_info['width'],
+                    'height': fabric_info['height'],
+                    'is_roll': fabric_info['is_roll'],
+                    'unit': fabric_info['unit'],
+                    'lots': fabric_info['lots'],
+                    'guillotine': guillotine,
+                    'raster': raster,
+                    'max_plies': SPREAD_MAX_PLIES,
+                    'max_marker_length': MARKER_MAX_LENGTH,
+                    'items': items,
+                    'order_lines': lines
+                })
+            if not consumed_offcuts:
+                break
+            ids = [sheet['offcut_id'] for _, sheet in consumed_offcuts]
+            available = {row['id'] for row in
+                         db.execute_query(check_query.format(", ".join(["%s"] * len(ids))), tuple(ids))}
+            if len(available) == len(ids):
+                break
+            # Часть обрезков уже израсходована в другой сессии: остальные возвращаем в индекс
+            # и раскладываем заново
+            taken |= set(ids) - available
+            logging.debug(f"Offcuts used elsewhere: {sorted(taken)}")
+            for material_id, sheet in consumed_offcuts:
+                if sheet['offcut_id'] in available:
+                    offcut_index.insert(material_id, sheet['offcut_id'], sheet['width'], sheet['height'])
+
+        # Материалы независимы и считаются параллельно, порядок результатов совпадает с tasks.
+        # Инкрементальный пересчёт быстрый и идёт в этом же процессе.
+        fresh_tasks = [task for task in tasks if 'previous' not in task]
+        fresh_results = iter(plan_materials(fresh_tasks, cache=self.pattern_cache))
+        results = []
+        for task in tasks:
+            if 'previous' in task:
+                old_plan = task['previous']
+                results.append(replan_material(task, old_plan['sheets'], old_plan['items']))
+            else:
+                results.append(next(fresh_results))
+        total_fabric_required = {}
+        self.total_fabric_required = total_fabric_required
+        to_optimize = []
+        for task, planned in zip(tasks, results):
+            material = task['material']
+            self.cutting_plans[material] = dict(planned['plan'], offcut_sheets=offcut_sheets[material],
+                                                items=task['items'], order_lines=task['order_lines'])
+            if 'repacked' in planned:
+                logging.debug(f"Incremental replan of {material}: {planned['repacked']} sheets repacked, "
+                              f"surplus {planned['surplus']}")
+            self.tag_order_lines(offcut_sheets[material] + planned['plan']['sheets'], task['items'])
+            total_fabric_required[material] = {
+                'id': fabrics_by_material[material]['id'],
+                'required': planned['required'],
+                'unit': planned['unit'],
+                'offcuts': len(offcut_sheets[material]),
+                'report': planned['report']
+            }
+            if 'lots' in planned['plan']:
+                total_fabric_required[material]['lots'] = planned['plan']['lots']
+            if 'lp_bound' in planned:
+                total_fabric_required[material]['lower_bound'] = planned['lower_bound']
+                total_fabric_required[material]['lp_bound'] = planned['lp_bound']
+            # Фоновая оптимизация раскладывает прямоугольники на полотна одного размера без сетки
+            if (task['is_roll'] or 'lots' in planned['plan'] or 'raster' in planned['plan']
+                    or any(item.get('outline') for item in task['items'])):
+                continue
+            # План, уже равный нижней границе (площадной или ЛП), улучшать некуда
+            pieces_count = sum(item['quantity'] for item in task['items'])
+            bound = max(planned['area_bound'], planned.get('lower_bound', 0))
+            if pieces_count >= OPTIMIZATION_MIN_PIECES and planned['required'] > bound:
+                to_optimize.append((material, task['width'], task['height'], task['items'], bound))
+        logging.debug(f"Total fabric required: {total_fabric_required}")
+        self.reserved_offcuts = {sheet['offcut_id']: (material_id, sheet) for material_id, sheet in consumed_offcuts}
+        return to_optimize
 
     def calculate_cutting(self):
         """
-        Рассчитывает раскрой и генерирует карты размещения изделий.
-        Этот метод используется для визуализации и не выполняет расчёт обрезков.
+        Рассчитывает раскрой текущего заказа (с раскладкой на обрезки, см. plan_cutting),
+        генерирует карты размещения изделий и проверяет недостачу материалов.
+        Обрезки плана отмечаются использованными, только когда заказ переводится в следующий статус.
         """
         if not self.current_order:
             return
         try:
-            self.cutting_maps_container.clear_maps()
+            self.stop_optimization()
+            previous = self.cutting_plans
+            self.cutting_plans = {}
             with self.db_manager as db:
-                fabric_query = """
-                SELECT pm.supply_composition_id, sc.width, sc.length, m.name as material_name, m.id as material_id
-                FROM product_materials pm
-                INNER JOIN supply_composition sc ON pm.supply_composition_id = sc.id
-                INNER JOIN material m ON sc.material_id = m.id
-                INNER JOIN order_composition oc ON pm.order_composition_id = oc.id
-                WHERE oc.order_id = %s AND m.material_type_id != 2
-                """
-                fabric_data = db.execute_query(fabric_query, (self.current_order['id'],))
-                fabrics_by_material = {}
-                for fabric in fabric_data:
-                    mat_name = fabric['material_name']
-                    if mat_name not in fabrics_by_material:
-                        fabrics_by_material[mat_name] = {
-                            'id': fabric['material_id'],
-                            'supply_composition_id': fabric['supply_composition_id'],
-                            'width': float(fabric['width']),
-                            'height': float(fabric['length']),
-                            'material_name': mat_name
-                        }
-                logging.debug(f"Grouped fabrics: {fabrics_by_material}")
-
-                order_query = """
-                SELECT oc.id, p.name, oc.quantity, oc.width, oc.length, m.name as material_name
-                FROM order_composition oc
-                JOIN product p ON oc.product_id = p.id
-                JOIN product_materials pm ON oc.id = pm.order_composition_id
-                JOIN supply_composition sc ON pm.supply_composition_id = sc.id
-                JOIN material m ON sc.material_id = m.id
-                WHERE oc.order_id = %s AND m.material_type_id != 2
-                """
-                order_items = db.execute_query(order_query, (self.current_order['id'],))
-                items_by_material = {}
-                for item in order_items:
-                    mat_name = item['material_name']
-                    if mat_name not in items_by_material:
-                        items_by_material[mat_name] = []
-                    items_by_material[mat_name].append({
-                        'name': item['name'],
-                        'width': float(item['width']),
-                        'height': float(item['length']),
-                        'quantity': int(item['quantity'])
-                    })
-                logging.debug(f"Grouped order items: {items_by_material}")
-
-                total_fabric_required = {}
-                for material, items in items_by_material.items():
-                    if material not in fabrics_by_material:
-                        continue
-                    fabric_info = fabrics_by_material[material]
-                    fabric_width = fabric_info['width']
-                    fabric_height = fabric_info['height']
-                    supply_composition_id = fabric_info['supply_composition_id']
-                    items_copy = [item.copy() for item in items]
-                    fabric_required = 0
-                    logging.debug(f"Calculating cutting for material {material} with items: {items_copy}")
-                    while any(item['quantity'] > 0 for item in items_copy):
-                        valid_items = [item for item in items_copy if item['quantity'] > 0]
-                        placements, used = self.pack_single_fabric(fabric_width, fabric_height, valid_items)
-                        if placements:
-                            self.create_cutting_map(supply_composition_id, fabric_width, fabric_height, placements, material)
-                            for u in used:
-                                remaining = u['count']
-                                for item in items_copy:
-                                    if item['name'] == u['name'] and item['quantity'] > 0:
-                                        if item['quantity'] >= remaining:
-                                            item['quantity'] -= remaining
-                                            remaining = 0
-                                            break
-                                        else:
-                                            remaining -= item['quantity']
-                                            item['quantity'] = 0
-                            fabric_required += 1
-                        else:
-                            logging.debug(f"Cannot place remaining items for material {material} on one fabric.")
-                            break
-                    total_fabric_required[material] = {'id': fabrics_by_material[material]['id'], 'required': fabric_required}
-                logging.debug(f"Total fabric required: {total_fabric_required}")
+                fabrics_by_material, items_by_material = self.load_cutting_data(db, [self.current_order['id']])
+                to_optimize = self.plan_cutting(db, fabrics_by_material, items_by_material, previous)
+                self.show_cutting_plans()
 
                 assigned_query = """
                 SELECT m.name as material_name, m.id as material_id, SUM(pm.quantity) as assigned
@@ -470,94 +877,119 @@ class Main(QtWidgets.QWidget, Ui_Form):
                 assigned_dict = {row['material_name']: row['assigned'] for row in assigned_data}
                 logging.debug(f"Assigned quantities: {assigned_dict}")
 
-                self.fabric_shortage = {}
-                for material, data in total_fabric_required.items():
-                    assigned = assigned_dict.get(material, 0)
-                    if assigned < data['required']:
-                        self.fabric_shortage[material] = data['required'] - assigned
+                self.fabric_shortage = shortage(
+                    {material: data['required'] for material, data in self.total_fabric_required.items()},
+                    assigned_dict)
+                # Полотна сверх запаса партий не хватает в любом случае
+                for material, data in self.total_fabric_required.items():
+                    missing = data['report'].get('stock_shortage', 0)
+                    if missing > self.fabric_shortage.get(material, 0):
+                        self.fabric_shortage[material] = missing
                 logging.debug(f"Fabric shortage: {self.fabric_shortage}")
 
-                result_text = "Необходимо полотен ткани для выполнения заказа:\n"
-                for material, data in total_fabric_required.items():
-                    result_text += f"{material} (id {data['id']}): {data['required']} шт\n"
-                self.label_6.setText(result_text)
-                self.label_6.adjustSize()
+                for material, fabric_width, fabric_height, items, bound in to_optimize:
+                    self.start_optimization(material, fabric_width, fabric_height, items, bound)
+                self.show_fabric_required()
 
                 self.check_and_prompt_supply_request()
         except Exception as e:
+            # Обрезки могли быть убраны из индекса без записи в БД — перечитываем его при следующем расчёте
+            self.offcut_index = None
             self.show_error_message(f"Ошибка расчёта: {str(e)}")
 
-    def calculate_scraps_mathematically(self):
+    def calculate_batch_cutting(self):
         """
-        Отдельный метод для математического расчёта обрезков.
-        Расчёт производится по следующей формуле:
-          total_item_area = сумма(ширина * длина * количество) для каждого изделия;
-          fabric_area = ширина ткани * длина ткани;
-          required_fabrics = ceil(total_item_area / (fabric_area * utilization));
-          scrap_area = required_fabrics * fabric_area - total_item_area.
-        Здесь utilization – коэффициент использования (например, 0.85).
-        Результат записывается в таблицу obrezki.
+        Пакетный раскрой: позиции всех заказов в статусах 'Подтвержден' и 'Раскрой'
+        раскладываются вместе по материалам, чтобы неполные последние полотна разных
+        заказов не оставались каждое своим остатком. Каждое размещение помечено
+        order_composition_id своей позиции. Недостача по заказам здесь не считается.
         """
-        if not self.current_order:
+        try:
+            self.stop_optimization()
+            previous = self.cutting_plans
+            self.cutting_plans = {}
+            with self.db_manager as db:
+                orders = db.execute_query(
+                    "SELECT id FROM order_request WHERE status = 'Подтвержден' OR status = 'Раскрой' ORDER BY id"
+                )
+                order_ids = [order['id'] for order in orders]
+                if not order_ids:
+                    return
+                self.current_order = None
+                self.label_4.setText(f"Пакетный раскрой заказов: {', '.join(f'#{i}' for i in order_ids)}")
+                self.label_4.adjustSize()
+                fabrics_by_material, items_by_material = self.load_cutting_data(db, order_ids)
+                to_optimize = self.plan_cutting(db, fabrics_by_material, items_by_material, previous)
+                self.show_cutting_plans()
+                self.fabric_shortage = {}
+                for material, fabric_width, fabric_height, items, bound in to_optimize:
+                    self.start_optimization(material, fabric_width, fabric_height, items, bound)
+                self.show_fabric_required()
+        except Exception as e:
+            self.offcut_index = None
+            self.show_error_message(f"Ошибка пакетного раскроя: {str(e)}")
+
+    def export_cutting_paths(self):
+        """
+        Сохраняет маршруты резки всех рассчитанных полотен в выбранный каталог
+        (cutting_engine.export_plan): по файлу DXF и SVG на полотно. Длина резов и холостой
+        ход в итоге – по всем полотнам с учётом повторов раскладки.
+        """
+        if not self.cutting_plans:
+            self.show_error_message("Сначала рассчитайте раскрой.")
+            return
+        directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Каталог для файлов раскроя")
+        if not directory:
             return
         try:
-            utilization = 0.85  # Предполагаемый коэффициент использования ткани
+            written = []
+            cut_length = travel = 0
+            for material, plan in self.cutting_plans.items():
+                for filename, length, idle in export_plan(plan, directory, material):
+                    written.append(filename)
+                    if filename.endswith('.dxf'):
+                        cut_length += length
+                        travel += idle
+            info_box = QtWidgets.QMessageBox(self)
+            info_box.setIcon(QtWidgets.QMessageBox.Icon.Information)
+            info_box.setWindowTitle("Экспорт завершён")
+            info_box.setText(f"Записано файлов: {len(written)}.\n"
+                             f"Длина резов: {format_length(cut_length)}, холостой ход: {format_length(travel)}.")
+            info_box.setStyleSheet("QLabel { color: white; } QPushButton { color: white; }")
+            info_box.exec()
+        except Exception as e:
+            self.show_error_message(f"Ошибка экспорта: {str(e)}")
+
+    def calculate_scraps_mathematically(self):
+        """
+        Записывает в таблицу obrezki реальные остатки рассчитанного раскроя
+        (cutting_engine.plan_scraps); куски меньше SCRAP_MIN_WIDTH x SCRAP_MIN_LENGTH мм
+        отбрасываются. Все строки вставляются одним запросом.
+        После записи полотна считаются раскроенными ('locked'): повторно их обрезки
+        не записываются, а пересчёт раскроя их не перекладывает.
+        """
+        if not self.cutting_plans:
+            # Без рассчитанного раскроя (заказа или пакетного) считаем раскрой текущего заказа
+            if not self.current_order:
+                return
+            self.calculate_cutting()
+        try:
+            pieces, cut_sheets = plan_scraps(self.cutting_plans, SCRAP_MIN_WIDTH, SCRAP_MIN_LENGTH)
+            scraps = [(self.total_fabric_required[piece['material']]['id'], piece['fabric_id'],
+                       piece['length'], piece['width'], piece['area']) for piece in pieces]
+            logging.debug(f"Scraps: {len(scraps)} from {len(cut_sheets)} sheets")
             with self.db_manager as db:
-                # Изменён запрос: выбираем pm.id как prod_mat_id, который является корректным FK
-                fabric_query = """
-                SELECT pm.id as prod_mat_id, sc.width, sc.length, m.name as material_name
-                FROM product_materials pm
-                INNER JOIN supply_composition sc ON pm.supply_composition_id = sc.id
-                INNER JOIN material m ON sc.material_id = m.id
-                INNER JOIN order_composition oc ON pm.order_composition_id = oc.id
-                WHERE oc.order_id = %s AND m.material_type_id != 2
-                """
-                fabric_data = db.execute_query(fabric_query, (self.current_order['id'],))
-                fabrics_by_material = {}
-                for fabric in fabric_data:
-                    mat_name = fabric['material_name']
-                    if mat_name not in fabrics_by_material:
-                        fabrics_by_material[mat_name] = {
-                            'prod_mat_id': fabric['prod_mat_id'],
-                            'width': float(fabric['width']),
-                            'height': float(fabric['length'])
-                        }
-                order_query = """
-                SELECT oc.id, p.name, oc.quantity, oc.width, oc.length, m.name as material_name
-                FROM order_composition oc
-                JOIN product p ON oc.product_id = p.id
-                JOIN product_materials pm ON oc.id = pm.order_composition_id
-                JOIN supply_composition sc ON pm.supply_composition_id = sc.id
-                JOIN material m ON sc.material_id = m.id
-                WHERE oc.order_id = %s AND m.material_type_id != 2
-                """
-                order_items = db.execute_query(order_query, (self.current_order['id'],))
-                items_by_material = {}
-                for item in order_items:
-                    mat_name = item['material_name']
-                    if mat_name not in items_by_material:
-                        items_by_material[mat_name] = []
-                    items_by_material[mat_name].append({
-                        'width': float(item['width']),
-                        'height': float(item['length']),
-                        'quantity': int(item['quantity'])
-                    })
-                for material, items in items_by_material.items():
-                    if material not in fabrics_by_material:
-                        continue
-                    fabric_info = fabrics_by_material[material]
-                    fabric_area = fabric_info['width'] * fabric_info['height']
-                    total_item_area = sum(item['width'] * item['height'] * item['quantity'] for item in items)
-                    required_fabrics = math.ceil(total_item_area / (fabric_area * utilization))
-                    scrap_area = required_fabrics * fabric_area - total_item_area
-                    logging.debug(f"Material {material}: total_item_area = {total_item_area}, required_fabrics = {required_fabrics}, scrap_area = {scrap_area}")
-                    if scrap_area > 5:
-                        # Используем корректный prod_mat_id
-                        self.insert_scrap(fabric_info['prod_mat_id'], fabric_info['height'], fabric_info['width'], scrap_area, db=db)
+                # Раскрой зафиксирован: обрезки, на которые он разложен, израсходованы
+                self.commit_offcuts(db)
+                if scraps:
+                    first_id = self.insert_scraps(scraps, db)
+                    self.load_offcut_index(db, since_id=first_id)
+            for sheet in cut_sheets:
+                sheet['locked'] = True
             info_box = QtWidgets.QMessageBox(self)
             info_box.setIcon(QtWidgets.QMessageBox.Icon.Information)
             info_box.setWindowTitle("Обрезки рассчитаны")
-            info_box.setText("Обрезки рассчитаны математически и внесены в таблицу obrezki.")
+            info_box.setText(f"По картам раскроя в таблицу obrezki внесено обрезков: {len(scraps)}.")
             info_box.setStyleSheet("QLabel { color: white; } QPushButton { color: white; }")
             info_box.exec()
         except Exception as e:
@@ -574,6 +1006,7 @@ class Main(QtWidgets.QWidget, Ui_Form):
         with self.db_manager as db:
             if not self.shortage_data:
                 db.execute_query("UPDATE order_request SET status = %s WHERE id = %s", ("Готово в цеху", self.current_order['id']))
+                self.commit_offcuts(db)
                 info_box = QtWidgets.QMessageBox(self)
                 info_box.setIcon(QtWidgets.QMessageBox.Icon.Information)
                 info_box.setWindowTitle("Заказ готов")
@@ -627,6 +1060,7 @@ class Main(QtWidgets.QWidget, Ui_Form):
                             db.execute_query("UPDATE supply_composition SET remainder = remainder - %s WHERE id = %s", (transfer_amount, row['id']))
                             needed -= transfer_amount
                     db.execute_query("UPDATE order_request SET status = %s WHERE id = %s", ("Раскрой", self.current_order['id']))
+                    self.commit_offcuts(db)
                     info_box = QtWidgets.QMessageBox(self)
                     info_box.setIcon(QtWidgets.QMessageBox.Icon.Information)
                     info_box.setWindowTitle("Материалы переведены")
@@ -634,7 +1068,11 @@ class Main(QtWidgets.QWidget, Ui_Form):
                     info_box.setStyleSheet("QLabel { color: white; } QPushButton { color: white; }")
                     info_box.exec()
                 else:
-                    details = "\n".join([f"{k}: не хватает {v} шт" for k, v in self.shortage_data.items()])
+                    # Нехватка ткани – в единицах плана (полотна или длина рулона), фурнитуры – в штуках
+                    details = "\n".join([
+                        f"{k}: не хватает {v:g} "
+                        f"{self.total_fabric_required[k]['unit'] if k in self.fabric_shortage else 'шт'}"
+                        for k, v in self.shortage_data.items()])
                     msg_box = QtWidgets.QMessageBox(self)
                     msg_box.setIcon(QtWidgets.QMessageBox.Icon.Warning)
                     msg_box.setWindowTitle("Недостаточно материалов")
@@ -0,0 +1,58 @@
+"""
+Общие помощники тестов движка: случайные заказы и проверки раскладок.
+"""
+import random
+
+from cutting_engine.nesting import summarize_used
+
+ENGINES = ['maxrects', 'guillotine']
+WIDTH, HEIGHT = 1500, 3000
+
+
+def random_items(seed, kinds=12, max_quantity=25):
+    rng = random.Random(seed)
+    return [{'name': f"p{index}", 'width': rng.randint(40, 700), 'height': rng.randint(40, 1200),
+             'quantity': rng.randint(1, max_quantity)} for index in range(kinds)]
+
+
+def assert_layout(sheet, width, height, items):
+    placements = sheet['placements']
+    for p in placements:
+        assert 0 <= p['x'] and 0 <= p['y']
+        assert p['x'] + p['width'] <= width and p['y'] + p['height'] <= height
+        item = items[p['item_index']]
+        size = (item['height'], item['width']) if p.get('rotated') else (item['width'], item['height'])
+        assert (p['width'], p['height']) == size
+    for index, a in enumerate(placements):
+        for b in placements[index + 1:]:
+            assert (a['x'] + a['width'] <= b['x'] or b['x'] + b['width'] <= a['x']
+                    or a['y'] + a['height'] <= b['y'] or b['y'] + b['height'] <= a['y']), (a, b)
+    assert sheet['used'] == summarize_used(placements)
+
+
+def placed_counts(sheets, items):
+    counts = [0] * len(items)
+    for sheet in sheets:
+        for p in sheet['placements']:
+            counts[p['item_index']] += sheet.get('repeat', 1)
+    return counts
+
+
+def unplaced_counts(pieces, items):
+    counts = [0] * len(items)
+    for piece in pieces:
+        counts[piece['item_index']] += 1
+    return counts
+
+
+def cut_leaves(node):
+    if 'children' not in node:
+        return [node['placement']] if node['placement'] is not None else []
+    return [leaf for child in node['children'] for leaf in cut_leaves(child)]
+
+
+def sheet_task(items, **extra):
+    task = {'material': 'test', 'fabric_id': 1, 'width': WIDTH, 'height': HEIGHT, 'is_roll': False,
+            'unit': 'шт', 'items': items}
+    task.update(extra)
+    return task
@@ -0,0 +1,86 @@
+"""
+Раскладка всего спроса на листы (binpacking.pack_bins).
+"""
+import pytest
+
+from cutting_engine import OffcutTree, count_sheets, pack_bins, pack_offcuts, plan_material
+from cutting_engine.binpacking import merge_repeats
+from helpers import ENGINES, HEIGHT, WIDTH, assert_layout, placed_counts, random_items, sheet_task, unplaced_counts
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('seed', range(5))
+def test_pack_bins_conserves_pieces(engine, seed):
+    items = random_items(seed) + [{'name': 'large', 'width': 1600, 'height': 100, 'quantity': 2}]
+    result = pack_bins(WIDTH, HEIGHT, items, engine=engine)
+    for sheet in result['sheets']:
+        assert_layout(sheet, WIDTH, HEIGHT, items)
+    unplaced = [0] * len(items)
+    for piece in result['unplaced']:
+        unplaced[piece['item_index']] += 1
+    assert [placed + missing for placed, missing in zip(placed_counts(result['sheets'], items), unplaced)] == \
+        [item['quantity'] for item in items]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pack_bins_repeats_conserve_pieces(engine):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 301},
+             {'name': 'b', 'width': 240, 'height': 310, 'quantity': 95}]
+    result = pack_bins(WIDTH, HEIGHT, items, engine=engine)
+    assert any(sheet.get('repeat', 1) > 1 for sheet in result['sheets'])
+    assert not result['unplaced']
+    assert placed_counts(result['sheets'], items) == [301, 95]
+    assert count_sheets(result['sheets']) >= len(result['sheets'])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pack_bins_without_repeats_builds_every_sheet(engine):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 61}]
+    result = pack_bins(WIDTH, HEIGHT, items, engine=engine, repeat=False)
+    assert not any('repeat' in sheet for sheet in result['sheets'])
+    assert placed_counts(result['sheets'], items) == [61]
+    merged = merge_repeats(result['sheets'])
+    assert len(merged) < len(result['sheets'])
+    assert count_sheets(merged) == len(result['sheets'])
+    assert placed_counts(merged, items) == [61]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('repeat', [True, False])
+def test_pack_bins_leaves_zero_size_items_unplaced(engine, repeat):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 40},
+             {'name': 'empty', 'width': 0, 'height': 300, 'quantity': 3},
+             {'name': 'b', 'width': 240, 'height': 0, 'quantity': 2}]
+    result = pack_bins(WIDTH, HEIGHT, items, engine=engine, repeat=repeat)
+    for sheet in result['sheets']:
+        assert_layout(sheet, WIDTH, HEIGHT, items)
+    assert placed_counts(result['sheets'], items) == [40, 0, 0]
+    assert unplaced_counts(result['unplaced'], items) == [0, 3, 2]
+
+
+@pytest.mark.parametrize('kinds', [2, 20])
+def test_plan_material_with_zero_size_item(kinds):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 12},
+             {'name': 'empty', 'width': 0, 'height': 0, 'quantity': 5}]
+    items += [{'name': f"p{index}", 'width': 100 + index, 'height': 200, 'quantity': 1} for index in range(kinds - 2)]
+    planned = plan_material(sheet_task(items))
+    assert placed_counts(planned['plan']['sheets'], items)[:2] == [12, 0]
+    assert planned['report']['unplaced'] == 5
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pack_offcuts_uses_fitting_offcuts_first(engine):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 5},
+             {'name': 'b', 'width': 200, 'height': 100, 'quantity': 7}]
+    offcuts = OffcutTree()
+    for offcut_id, (width, height) in enumerate([(650, 550), (100, 100), (1200, 600), (250, 150)], 1):
+        offcuts.insert(offcut_id, width, height)
+    sheets, remaining = pack_offcuts(offcuts, items, engine=engine)
+    used = {sheet['offcut_id'] for sheet in sheets}
+    assert 2 not in used and 2 in offcuts
+    assert not any(offcut_id in offcuts for offcut_id in used)
+    for sheet in sheets:
+        assert_layout(sheet, sheet['width'], sheet['height'], items)
+    placed = placed_counts(sheets, items)
+    assert placed[0] == 3
+    assert [count + item['quantity'] for count, item in zip(placed, remaining)] == [5, 7]
@@ -0,0 +1,44 @@
+"""
+Планирование настилов маркерами (cut_order.plan_cut_order).
+"""
+import pytest
+
+from cutting_engine import pack_strip, plan_cut_order
+from helpers import assert_layout, placed_counts, random_items, unplaced_counts
+
+ROLL_WIDTH = 1500
+
+
+@pytest.mark.parametrize('max_length', [None, 2500])
+@pytest.mark.parametrize('seed', range(3))
+def test_markers_cover_demand(seed, max_length):
+    items = random_items(seed, kinds=6, max_quantity=40)
+    items.append({'name': 'wide', 'width': 1600, 'height': 1700, 'quantity': 2})
+    result = plan_cut_order(ROLL_WIDTH, items, max_plies=8, max_length=max_length)
+    for marker in result['markers']:
+        assert marker['width'] == ROLL_WIDTH
+        assert max_length is None or marker['height'] <= max_length
+        assert marker.get('repeat', 1) <= 8
+        assert_layout(marker, ROLL_WIDTH, marker['height'], items)
+    placed = placed_counts(result['markers'], items)
+    missing = unplaced_counts(result['unplaced'], items)
+    assert [a + b for a, b in zip(placed, missing)] == [item['quantity'] for item in items]
+    assert missing[-1] == 2
+    assert result['length'] == sum(marker['height'] * marker.get('repeat', 1) for marker in result['markers'])
+
+
+def test_pieces_the_marker_could_not_place_stay_unplaced():
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 24},
+             {'name': 'stuck', 'width': 300, 'height': 300, 'quantity': 12}]
+
+    def pack(roll_width, marker_items, allow_rotation):
+        # Раскладка, которая не укладывает 'stuck', как nest_strip – контур без места
+        result = pack_strip(roll_width, [dict(item, quantity=0) if item['name'] == 'stuck' else item
+                                         for item in marker_items], allow_rotation)
+        stuck = marker_items[1]['quantity']
+        result['unplaced'] = [{'item_index': 1, 'name': 'stuck', 'width': 300, 'height': 300}] * stuck
+        return result
+
+    result = plan_cut_order(ROLL_WIDTH, items, max_plies=6, pack=pack)
+    assert placed_counts(result['markers'], items) == [24, 0]
+    assert unplaced_counts(result['unplaced'], items) == [0, 12]
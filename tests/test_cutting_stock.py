@@ -0,0 +1,46 @@
+"""
+Раскрой по Гилмору–Гомори: план не хуже эвристики, детали сохраняются, детали крупнее
+листа не ломают мастер-задачу и уходят в неразмещённые.
+"""
+import math
+
+import pytest
+
+from cutting_engine import plan_materials
+from cutting_engine.binpacking import count_sheets, pack_bins
+from cutting_engine.cutting_stock import solve_cutting_stock
+from helpers import HEIGHT, WIDTH, assert_layout, placed_counts, sheet_task, unplaced_counts
+
+
+@pytest.mark.parametrize('engine', ['maxrects', 'guillotine'])
+def test_cutting_stock_conserves_pieces(engine):
+    items = [{'name': 'a', 'width': 700, 'height': 500, 'quantity': 43},
+             {'name': 'b', 'width': 300, 'height': 450, 'quantity': 70},
+             {'name': 'c', 'width': 100, 'height': 100, 'quantity': 0},
+             {'name': 'd', 'width': 520, 'height': 1100, 'quantity': 9}]
+    result = solve_cutting_stock(WIDTH, HEIGHT, items, engine=engine)
+    for sheet in result['sheets']:
+        assert_layout(sheet, WIDTH, HEIGHT, items)
+    assert placed_counts(result['sheets'], items) == [item['quantity'] for item in items]
+    assert not result['unplaced']
+    assert result['status'] == 'optimal'
+    assert result['lower_bound'] <= math.ceil(result['lp_bound'] - 1e-6) <= count_sheets(result['sheets'])
+    assert count_sheets(result['sheets']) <= count_sheets(pack_bins(WIDTH, HEIGHT, items, engine=engine)['sheets'])
+
+
+def test_cutting_stock_skips_oversize_items():
+    items = [{'name': 'large', 'width': 3000, 'height': 500, 'quantity': 2},
+             {'name': 'small', 'width': 300, 'height': 200, 'quantity': 30}]
+    result = solve_cutting_stock(1000, 1000, items)
+    assert result['status'] == 'optimal'
+    assert placed_counts(result['sheets'], items) == [0, 30]
+    assert unplaced_counts(result['unplaced'], items) == [2, 0]
+    assert result['lower_bound'] == 2
+
+
+def test_plan_materials_with_oversize_item():
+    items = [{'name': 'large', 'width': 3000, 'height': 500, 'quantity': 2},
+             {'name': 'small', 'width': 300, 'height': 200, 'quantity': 30}]
+    planned = plan_materials([sheet_task(items, width=1000, height=1000)], workers=1)[0]
+    assert placed_counts(planned['plan']['sheets'], items) == [0, 30]
+    assert planned['report']['unplaced'] == 2
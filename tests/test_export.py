@@ -0,0 +1,43 @@
+"""
+Маршрут резки (toolpath.tool_path) и экспорт плана для станка (export.export_plan).
+"""
+import os
+
+import pytest
+
+from cutting_engine import cut_segments, export_plan, plan_material, tool_path
+from helpers import random_items, sheet_task
+
+
+def test_tool_path_cuts_every_segment_once():
+    planned = plan_material(sheet_task(random_items(3, kinds=6, max_quantity=5)))
+    sheet = planned['plan']['sheets'][0]
+    segments = cut_segments(1500, 3000, sheet['placements'])
+    path = tool_path(1500, 3000, sheet['placements'])
+    assert sorted(tuple(sorted(cut)) for cut in path['cuts']) == sorted(tuple(sorted(s)) for s in segments)
+    assert path['cut_length'] == round(sum(((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5 for a, b in segments))
+
+
+@pytest.mark.parametrize('guillotine', [False, True])
+def test_export_plan_totals_count_repeats(tmp_path, guillotine):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 90}]
+    plan = plan_material(sheet_task(items, guillotine=guillotine))['plan']
+    assert any(sheet.get('repeat', 1) > 1 for sheet in plan['sheets'])
+    written = export_plan(plan, str(tmp_path), 'test', formats=('dxf', 'svg'))
+    assert len(written) == 2 * len(plan['sheets'])
+    assert all(os.path.getsize(filename) > 0 for filename, _, _ in written)
+    expected = 0
+    for sheet in plan['sheets']:
+        path = tool_path(1500, 3000, sheet['placements'], sheet.get('cuts'))
+        expected += path['cut_length'] * sheet.get('repeat', 1)
+    assert sum(length for filename, length, _ in written if filename.endswith('.dxf')) == expected
+
+
+def test_export_plan_does_not_multiply_marker_plies(tmp_path):
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 40}]
+    plan = plan_material(sheet_task(items, width=1000, height=0, is_roll=True, unit='м', max_plies=10))['plan']
+    assert plan['spreads'] and any(sheet.get('repeat', 1) > 1 for sheet in plan['sheets'])
+    written = export_plan(plan, str(tmp_path), 'roll', formats=('dxf',))
+    expected = sum(tool_path(sheet['width'], sheet['height'], sheet['placements'])['cut_length']
+                   for sheet in plan['sheets'])
+    assert sum(length for _, length, _ in written) == expected
@@ -0,0 +1,89 @@
+"""
+Гильотинный раскрой: дерево и порядок сквозных резов (guillotine), перекладка полками.
+"""
+import pytest
+
+from cutting_engine import add_cuts, cut_sequence, cut_tree, pack_sheet, plan_material
+from cutting_engine.guillotine import shelf_sheets
+from cutting_engine.nesting import summarize_used
+from helpers import HEIGHT, WIDTH, cut_leaves, placed_counts, random_items, sheet_task
+
+
+def _crosses(cut, p):
+    # Рез проходит через внутренность детали
+    if cut['x1'] == cut['x2']:
+        return (p['x'] < cut['x1'] < p['x'] + p['width']
+                and min(cut['y1'], cut['y2']) < p['y'] + p['height'] and p['y'] < max(cut['y1'], cut['y2']))
+    return (p['y'] < cut['y1'] < p['y'] + p['height']
+            and min(cut['x1'], cut['x2']) < p['x'] + p['width'] and p['x'] < max(cut['x1'], cut['x2']))
+
+
+@pytest.mark.parametrize('kinds', [4, 20])
+def test_guillotine_plan_has_cut_trees(kinds):
+    items = random_items(kinds, kinds=kinds, max_quantity=10)
+    planned = plan_material(sheet_task(items, guillotine=True))
+    sheets = planned['plan']['sheets']
+    assert planned['plan']['guillotine']
+    assert placed_counts(sheets, items) == [item['quantity'] for item in items]
+    for sheet in sheets:
+        assert 'cut_tree' in sheet
+        assert sorted(cut_leaves(sheet['cut_tree'])) == list(range(len(sheet['placements'])))
+
+
+def test_guillotine_plan_from_lots_has_cut_trees():
+    items = random_items(7, kinds=8, max_quantity=8)
+    lots = [{'id': 1, 'width': 1200, 'height': 2000, 'count': 2},
+            {'id': 2, 'width': WIDTH, 'height': HEIGHT, 'count': 1}]
+    planned = plan_material(sheet_task(items, guillotine=True, lots=lots))
+    assert placed_counts(planned['plan']['sheets'], items) == [item['quantity'] for item in items]
+    assert all('cut_tree' in sheet for sheet in planned['plan']['sheets'])
+
+
+def test_shelf_sheets_repack_non_guillotine_layout():
+    # «Вертушка» из четырёх деталей вокруг квадрата сквозными резами не режется
+    placements = [
+        {'x': 0, 'y': 0, 'width': 200, 'height': 100},
+        {'x': 200, 'y': 0, 'width': 100, 'height': 200},
+        {'x': 100, 'y': 200, 'width': 200, 'height': 100},
+        {'x': 0, 'y': 100, 'width': 100, 'height': 200},
+        {'x': 100, 'y': 100, 'width': 100, 'height': 100}
+    ]
+    for index, p in enumerate(placements):
+        p.update(name=f"p{index}", item_index=index, rotated=False)
+    sheet = {'placements': placements, 'used': summarize_used(placements), 'free_space': [], 'area': 90000,
+             'repeat': 3}
+    assert not add_cuts(dict(sheet), 300, 300)
+    shelves = shelf_sheets(sheet, 300, 300)
+    assert sum(len(shelf['placements']) for shelf in shelves) == len(placements)
+    for shelf in shelves:
+        assert shelf['repeat'] == 3
+        assert add_cuts(shelf, 300, 300)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cut_sequence_does_not_cut_pieces(seed):
+    sheet = pack_sheet(WIDTH, HEIGHT, random_items(seed, max_quantity=6), engine='guillotine')
+    tree = cut_tree(WIDTH, HEIGHT, sheet['placements'])
+    assert tree is not None
+    sequence = cut_sequence(tree)
+    assert sequence['stages'] >= 1
+    for cut in sequence['cuts']:
+        assert cut['x1'] == cut['x2'] or cut['y1'] == cut['y2']
+        assert 0 <= min(cut['x1'], cut['x2']) and max(cut['x1'], cut['x2']) <= WIDTH
+        assert 0 <= min(cut['y1'], cut['y2']) and max(cut['y1'], cut['y2']) <= HEIGHT
+        assert not any(_crosses(cut, p) for p in sheet['placements'])
+    assert sequence['cut_length'] == sum(abs(c['x2'] - c['x1']) + abs(c['y2'] - c['y1']) for c in sequence['cuts'])
+
+
+def test_cut_tree_leaves_match_placements():
+    sheet = pack_sheet(WIDTH, HEIGHT, random_items(2, max_quantity=4), engine='guillotine')
+    tree = cut_tree(WIDTH, HEIGHT, sheet['placements'])
+
+    def leaves(node):
+        if 'children' not in node:
+            return [node] if node['placement'] is not None else []
+        return [leaf for child in node['children'] for leaf in leaves(child)]
+
+    for leaf in leaves(tree):
+        p = sheet['placements'][leaf['placement']]
+        assert (leaf['x'], leaf['y'], leaf['width'], leaf['height']) == (p['x'], p['y'], p['width'], p['height'])
@@ -0,0 +1,36 @@
+"""
+Фоновая оптимизация раскроя отжигом (metaheuristic.AnytimeNester).
+"""
+from cutting_engine import AnytimeNester, count_sheets, pack_bins
+from helpers import HEIGHT, WIDTH, assert_layout, placed_counts, random_items
+
+
+def test_nester_stops_at_lower_bound():
+    items = [{'name': 'a', 'width': 750, 'height': 1500, 'quantity': 8}]
+    nester = AnytimeNester(WIDTH, HEIGHT, items, time_budget=60.0, workers=1)
+    plans = []
+    best = nester.run(plans.append)
+    assert count_sheets(best['sheets']) == nester.lower_bound == 2
+    assert plans == [best]
+
+
+def test_nester_improves_without_losing_pieces():
+    items = random_items(13, kinds=8, max_quantity=6)
+    baseline = pack_bins(WIDTH, HEIGHT, items)
+    nester = AnytimeNester(WIDTH, HEIGHT, items, time_budget=1.5, workers=2, round_time=0.5)
+    plans = []
+    best = nester.run(plans.append)
+    assert plans[-1] is best
+    assert count_sheets(best['sheets']) <= count_sheets(baseline['sheets'])
+    assert count_sheets(best['sheets']) >= nester.lower_bound
+    for sheet in best['sheets']:
+        assert_layout(sheet, WIDTH, HEIGHT, items)
+    assert placed_counts(best['sheets'], items) == [item['quantity'] for item in items]
+
+
+def test_stopped_nester_returns_baseline():
+    items = random_items(5, kinds=8, max_quantity=6)
+    nester = AnytimeNester(WIDTH, HEIGHT, items, time_budget=60.0, workers=2)
+    nester.stop()
+    best = nester.run()
+    assert count_sheets(best['sheets']) == count_sheets(pack_bins(WIDTH, HEIGHT, items)['sheets'])
@@ -0,0 +1,99 @@
+"""
+Упаковщики одного листа (nesting.GuillotinePacker, nesting.MaxRectsPacker, nesting.pack_sheet).
+"""
+import random
+
+import pytest
+
+from cutting_engine import pack_sheet
+from cutting_engine.nesting import FREE_INDEX_MIN, GuillotinePacker, MaxRectsPacker, _contains
+from helpers import ENGINES, HEIGHT, WIDTH, assert_layout, placed_counts, random_items
+
+
+def _insert_random(packer, seed, count):
+    rng = random.Random(seed)
+    for index in range(count):
+        packer.insert(f"p{index}", rng.randint(20, 400), rng.randint(20, 400), item_index=index)
+
+
+def test_guillotine_free_space_is_disjoint_and_complete():
+    packer = GuillotinePacker(1500, 3000)
+    _insert_random(packer, 1, 80)
+    assert packer.placements
+    free = packer.free_space
+    for index, a in enumerate(free):
+        for b in free[index + 1:]:
+            assert (a[0] + a[2] <= b[0] or b[0] + b[2] <= a[0] or a[1] + a[3] <= b[1] or b[1] + b[3] <= a[1])
+    assert sum(w * h for _, _, w, h in free) + packer.used_area() == 1500 * 3000
+
+
+def test_guillotine_fills_sheet_exactly():
+    packer = GuillotinePacker(1500, 3000)
+    for index in range(4):
+        assert packer.insert('quarter', 750, 1500) is not None
+    assert packer.free_space == []
+    assert packer.insert('extra', 1, 1) is None
+
+
+def test_guillotine_rotates_only_when_allowed():
+    assert GuillotinePacker(1000, 500).insert('a', 400, 900)['rotated']
+    assert GuillotinePacker(1000, 500, allow_rotation=False).insert('a', 400, 900) is None
+
+
+def test_guillotine_restore_undoes_inserts():
+    packer = GuillotinePacker(1500, 3000)
+    _insert_random(packer, 2, 10)
+    state = packer.snapshot()
+    free = list(packer.free_space)
+    _insert_random(packer, 3, 10)
+    packer.restore(state)
+    assert len(packer.placements) == 10
+    assert packer.free_space == free
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('seed', range(5))
+def test_pack_sheet_layout(engine, seed):
+    items = random_items(seed)
+    sheet = pack_sheet(WIDTH, HEIGHT, items, engine=engine)
+    assert sheet['placements']
+    assert_layout(sheet, WIDTH, HEIGHT, items)
+    assert all(count <= item['quantity'] for count, item in zip(placed_counts([sheet], items), items))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pack_sheet_keeps_orientation_without_rotation(engine):
+    items = random_items(4)
+    sheet = pack_sheet(WIDTH, HEIGHT, items, allow_rotation=False, engine=engine)
+    assert sheet['placements']
+    assert not any(p['rotated'] for p in sheet['placements'])
+    assert_layout(sheet, WIDTH, HEIGHT, items)
+
+
+def test_maxrects_rotates_each_piece_separately():
+    packer = MaxRectsPacker(1000, 1000)
+    assert not packer.insert('a', 1000, 400)['rotated']
+    assert not packer.insert('b', 1000, 300)['rotated']
+    assert packer.insert('c', 300, 1000)['rotated']
+
+
+@pytest.mark.parametrize('count', [20, 600])
+def test_maxrects_free_space_stays_maximal(count):
+    # При 600 деталях свободных прямоугольников больше FREE_INDEX_MIN и работает индекс
+    packer = MaxRectsPacker(3000, 3000)
+    rng = random.Random(count)
+    for index in range(count):
+        packer.insert(f"p{index}", rng.randint(10, 120), rng.randint(10, 120))
+    free = packer.free_space
+    assert (packer.free_index is not None) == (count > FREE_INDEX_MIN)
+    for index, a in enumerate(free):
+        for b in free[index + 1:]:
+            assert not _contains(a, b) and not _contains(b, a)
+        for p in packer.placements:
+            assert (a[0] + a[2] <= p['x'] or p['x'] + p['width'] <= a[0]
+                    or a[1] + a[3] <= p['y'] or p['y'] + p['height'] <= a[1])
+
+
+def test_maxrects_rejects_unknown_heuristic():
+    with pytest.raises(ValueError):
+        MaxRectsPacker(100, 100, heuristic='best')
@@ -0,0 +1,61 @@
+"""
+Индекс обрезков (offcut_index.OffcutTree, offcut_index.OffcutIndex).
+"""
+import random
+
+import pytest
+
+from cutting_engine import OffcutIndex, OffcutTree
+
+
+def _brute_best_fit(offcuts, width, height):
+    short, long = min(width, height), max(width, height)
+    fitting = [(min(w, h), max(w, h), offcut_id) for offcut_id, (w, h) in offcuts.items()
+               if min(w, h) >= short and max(w, h) >= long]
+    return min(fitting)[:2] if fitting else None
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_best_fit_matches_brute_force(seed):
+    rng = random.Random(seed)
+    tree = OffcutTree()
+    offcuts = {}
+    for step in range(600):
+        action = rng.random()
+        if action < 0.5 or not offcuts:
+            offcut_id = rng.randint(0, 150)
+            offcuts[offcut_id] = (rng.randint(1, 3000), rng.randint(1, 2000))
+            tree.insert(offcut_id, *offcuts[offcut_id])
+        elif action < 0.7:
+            offcut_id = rng.choice(sorted(offcuts))
+            assert tree.remove(offcut_id) == {'id': offcut_id, 'width': offcuts[offcut_id][0],
+                                              'height': offcuts[offcut_id][1]}
+            del offcuts[offcut_id]
+        else:
+            width, height = rng.randint(1, 3500), rng.randint(1, 3500)
+            found = tree.best_fit(width, height)
+            expected = _brute_best_fit(offcuts, width, height)
+            if expected is None:
+                assert found is None
+            else:
+                assert (min(found['width'], found['height']), max(found['width'], found['height'])) == expected
+                assert offcuts[found['id']] == (found['width'], found['height'])
+        assert len(tree) == len(offcuts)
+
+
+def test_remove_missing_offcut():
+    tree = OffcutTree()
+    tree.insert(1, 300, 200)
+    assert tree.remove(2) is None
+    assert 1 in tree and 2 not in tree
+
+
+def test_index_keeps_materials_apart():
+    index = OffcutIndex()
+    index.insert(1, 10, 500, 400)
+    index.insert(2, 20, 900, 900)
+    assert index.best_fit(1, 450, 300) == {'id': 10, 'width': 500, 'height': 400}
+    assert index.best_fit(1, 600, 600) is None
+    assert index.best_fit(3, 10, 10) is None
+    assert index.remove(2, 20) == {'id': 20, 'width': 900, 'height': 900}
+    assert index.best_fit(2, 10, 10) is None
@@ -0,0 +1,49 @@
+"""
+Двухуровневый кэш планов (pattern_cache.PatternCache) и его использование в plan_materials.
+"""
+import os
+
+from cutting_engine import PatternCache, plan_materials
+from cutting_engine.pattern_cache import DISK_BLOCK
+from helpers import placed_counts, random_items, sheet_task
+
+
+def test_memory_and_disk_return_same_value(tmp_path):
+    value = {'parts': [[(0, 0), (10, 0), (10, 5)]], 'count': 3}
+    cache = PatternCache(str(tmp_path))
+    cache.put('key', value)
+    from_memory = cache.get('key')
+    from_disk = PatternCache(str(tmp_path)).get('key')
+    assert from_memory == from_disk == {'parts': [[[0, 0], [10, 0], [10, 5]]], 'count': 3}
+
+
+def test_get_returns_copy(tmp_path):
+    cache = PatternCache(str(tmp_path))
+    value = {'sheets': [1, 2]}
+    cache.put('key', value)
+    value['sheets'].append(3)
+    cache.get('key')['sheets'].append(4)
+    assert cache.get('key') == {'sheets': [1, 2]}
+
+
+def test_disk_size_stays_under_limit(tmp_path):
+    cache = PatternCache(str(tmp_path), memory_size=4, max_disk_bytes=20 * DISK_BLOCK)
+    for index in range(100):
+        cache.put(f"key{index}", {'index': index})
+    assert len(os.listdir(tmp_path)) <= 20
+    assert cache.get('key99') == {'index': 99}
+    assert cache.get('key0') is None
+
+
+def test_plan_materials_uses_cache(tmp_path):
+    items = random_items(2, kinds=12, max_quantity=8)
+    cache = PatternCache(str(tmp_path))
+    first = plan_materials([sheet_task(items)], workers=1, cache=cache)[0]
+    renamed = [dict(item, name=f"other{index}") for index, item in enumerate(reversed(items))]
+    second = plan_materials([sheet_task(renamed, material='copy')], workers=1, cache=cache)[0]
+    assert second['report']['cached']
+    assert second['material'] == 'copy'
+    assert second['required'] == first['required']
+    assert placed_counts(second['plan']['sheets'], renamed) == [item['quantity'] for item in renamed]
+    names = {p['name'] for sheet in second['plan']['sheets'] for p in sheet['placements']}
+    assert names <= {item['name'] for item in renamed}
@@ -0,0 +1,63 @@
+"""
+Планирование материала и отчёт о раскрое (planning.plan_material, planning.make_report).
+"""
+import pytest
+
+from cutting_engine import plan_material, repack_changed, replan_material
+from helpers import HEIGHT, WIDTH, placed_counts, random_items, sheet_task
+
+
+@pytest.mark.parametrize('kinds', [2, 20])
+def test_bounds_ignore_items_that_do_not_fit(kinds):
+    items = [{'name': 'large', 'width': 3000, 'height': 500, 'quantity': 2},
+             {'name': 'small', 'width': 300, 'height': 200, 'quantity': 30}]
+    items += [{'name': f"p{index}", 'width': 10 + index, 'height': 10, 'quantity': 1} for index in range(kinds - 2)]
+    planned = plan_material(sheet_task(items, width=1000, height=1000))
+    assert placed_counts(planned['plan']['sheets'], items)[:2] == [0, 30]
+    assert planned['area_bound'] == planned['report']['lower_bound'] == 2
+    assert planned['report']['lower_bound'] <= planned['required']
+    assert planned['report']['unplaced'] == 2
+
+
+def test_roll_bound_ignores_items_wider_than_roll():
+    items = [{'name': 'wide', 'width': 1200, 'height': 1500, 'quantity': 3},
+             {'name': 'a', 'width': 500, 'height': 400, 'quantity': 10}]
+    planned = plan_material(sheet_task(items, width=1000, height=0, is_roll=True, unit='м'))
+    assert planned['report']['unplaced'] == 3
+    assert planned['report']['lower_bound'] == 2.0
+    assert planned['report']['lower_bound'] <= planned['required']
+
+
+def test_replan_reports_surplus_on_locked_sheets():
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 40},
+             {'name': 'b', 'width': 240, 'height': 310, 'quantity': 9}]
+    planned = plan_material(sheet_task(items))
+    for sheet in planned['plan']['sheets']:
+        sheet['locked'] = True
+    fewer = [dict(items[0], quantity=10), items[1]]
+    replanned = replan_material(sheet_task(fewer), planned['plan']['sheets'], items)
+    assert replanned['surplus'] == {0: 30}
+    assert replanned['report']['surplus'] == 30
+    assert replanned['report']['unplaced'] == 0
+
+
+def test_repack_changed_keeps_untouched_sheets():
+    items = random_items(6, kinds=14, max_quantity=12)
+    planned = plan_material(sheet_task(items))
+    sheets = planned['plan']['sheets']
+    changed = [dict(item, quantity=item['quantity'] + 3) if index == 0 else item for index, item in enumerate(items)]
+    result = repack_changed(WIDTH, HEIGHT, sheets, items, changed)
+    untouched = [sheet for sheet in sheets[:-1] if all(used['item_index'] != 0 for used in sheet['used'])]
+    assert all(any(kept is sheet for kept in result['sheets']) for sheet in untouched)
+    assert result['repacked'] == sum(sheet.get('repeat', 1) for sheet in sheets
+                                     if not any(sheet is kept for kept in untouched))
+    assert placed_counts(result['sheets'], changed) == [item['quantity'] for item in changed]
+    assert result['surplus'] == {}
+
+
+def test_replan_without_changes_keeps_plan():
+    items = random_items(9, kinds=14, max_quantity=6)
+    planned = plan_material(sheet_task(items))
+    replanned = replan_material(sheet_task(items), planned['plan']['sheets'], items)
+    assert replanned['repacked'] == 0
+    assert replanned['plan']['sheets'] == planned['plan']['sheets']
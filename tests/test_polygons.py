@@ -0,0 +1,79 @@
+"""
+Раскладка деталей по контурам с библиотекой NFP (polygons).
+"""
+import pytest
+
+from cutting_engine import PatternCache, nest_sheets, nest_strip
+from cutting_engine.polygons import PolygonNester, _area2, _convex, convex_parts, item_area, outline_of
+from helpers import placed_counts, unplaced_counts
+
+L_SHAPE = [[0, 0], [120, 0], [120, 40], [40, 40], [40, 100], [0, 100]]
+T_SHAPE = [[0, 0], [90, 0], [90, 30], [60, 30], [60, 80], [30, 80], [30, 30], [0, 30]]
+ITEMS = [{'name': 'L', 'width': 120, 'height': 100, 'quantity': 6, 'outline': L_SHAPE},
+         {'name': 'T', 'width': 90, 'height': 80, 'quantity': 5, 'outline': T_SHAPE},
+         {'name': 'rect', 'width': 70, 'height': 50, 'quantity': 4}]
+
+
+def _inside(point, polygon):
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _assert_no_overlap(placements, width, height, step=5):
+    for p in placements:
+        assert all(0 <= x <= width and (height is None or 0 <= y <= height) for x, y in p['outline'])
+    top = height or max(y for p in placements for _, y in p['outline'])
+    for gx in range(0, width, step):
+        for gy in range(0, top, step):
+            point = (gx + step / 2, gy + step / 2)
+            assert sum(_inside(point, p['outline']) for p in placements) <= 1, point
+
+
+def test_outline_is_normalised():
+    clockwise = [[0, 0], [0, 100], [50, 100], [100, 100], [100, 0], [0, 0]]
+    outline = outline_of({'outline': clockwise})
+    assert _area2(outline) > 0
+    assert sorted(outline) == [(0, 0), (0, 100), (100, 0), (100, 100)]
+    assert item_area({'outline': L_SHAPE}) == 120 * 40 + 40 * 60
+    assert item_area({'width': 30, 'height': 20}) == 600
+
+
+@pytest.mark.parametrize('shape', [L_SHAPE, T_SHAPE])
+def test_convex_parts_cover_outline(shape):
+    outline = outline_of({'outline': shape})
+    parts = convex_parts(outline)
+    assert len(parts) > 1
+    assert all(_convex(part) for part in parts)
+    assert sum(_area2(part) for part in parts) == _area2(outline)
+
+
+def test_nest_sheets_layout(tmp_path):
+    result = nest_sheets(300, 300, ITEMS, cache=PatternCache(str(tmp_path)))
+    for sheet in result['sheets']:
+        _assert_no_overlap(sheet['placements'], 300, 300)
+    placed = placed_counts(result['sheets'], ITEMS)
+    assert placed == [item['quantity'] for item in ITEMS]
+    assert not result['unplaced']
+
+
+def test_nest_strip_layout_and_unplaced(tmp_path):
+    items = ITEMS + [{'name': 'wide', 'width': 400, 'height': 350, 'quantity': 2}]
+    result = nest_strip(300, items, cache=PatternCache(str(tmp_path)))
+    _assert_no_overlap(result['placements'], 300, None)
+    assert result['length'] == max(y for p in result['placements'] for _, y in p['outline'])
+    assert placed_counts([result], items) == [6, 5, 4, 0]
+    assert unplaced_counts(result['unplaced'], items) == [0, 0, 0, 2]
+
+
+def test_nfp_cache_is_reused(tmp_path):
+    cache = PatternCache(str(tmp_path))
+    first = PolygonNester(ITEMS, cache=cache)
+    first.nest_sheets(300, 300)
+    assert first.nfps.computed > 0
+    second = PolygonNester(ITEMS, cache=PatternCache(str(tmp_path)))
+    second.nest_sheets(300, 300)
+    assert second.nfps.computed == 0
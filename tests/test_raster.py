@@ -0,0 +1,51 @@
+"""
+Растровая раскладка по сетке занятости (raster); нужен NumPy.
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cutting_engine.raster import mask_rects, pack_raster, rasterize  # noqa: E402
+from helpers import assert_layout, placed_counts, random_items, unplaced_counts  # noqa: E402
+
+L_SHAPE = [(0, 0), (120, 0), (120, 40), (40, 40), (40, 100), (0, 100)]
+
+
+def _overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def test_rasterize_is_conservative():
+    mask = rasterize(L_SHAPE, 7)
+    assert mask.shape == (15, 18)
+    for row in range(mask.shape[0]):
+        for column in range(mask.shape[1]):
+            cell = (column * 7, row * 7, 7, 7)
+            touches = _overlaps(cell, (0, 0, 120, 40)) or _overlaps(cell, (0, 0, 40, 100))
+            assert bool(mask[row, column]) == touches
+
+
+def test_mask_rects_cover_mask():
+    mask = rasterize(L_SHAPE, 10)
+    covered = np.zeros_like(mask, dtype=int)
+    for row, column, rows, columns in mask_rects(mask):
+        covered[row:row + rows, column:column + columns] += 1
+    assert (covered == mask).all()
+    assert len(mask_rects(mask)) == 2
+
+
+@pytest.mark.parametrize('resolution', [5, 10])
+def test_pack_raster_avoids_defects(resolution):
+    items = random_items(4, kinds=6, max_quantity=6)
+    items.append({'name': 'large', 'width': 1600, 'height': 3100, 'quantity': 1})
+    defects = [(100, 200, 300, 150), (1200, 2500, 250, 400)]
+    result = pack_raster(1500, 3000, items, resolution=resolution, defects=defects)
+    for sheet in result['sheets']:
+        assert_layout(sheet, 1500, 3000, items)
+        for p in sheet['placements']:
+            assert p['x'] % resolution == 0 and p['y'] % resolution == 0
+            assert not any(_overlaps((p['x'], p['y'], p['width'], p['height']), zone) for zone in defects)
+    placed = placed_counts(result['sheets'], items)
+    missing = unplaced_counts(result['unplaced'], items)
+    assert [a + b for a, b in zip(placed, missing)] == [item['quantity'] for item in items]
+    assert missing[-1] == 1
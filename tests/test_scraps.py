@@ -0,0 +1,64 @@
+"""
+Обрезки рассчитанного раскроя (scraps.plan_scraps).
+"""
+import pytest
+
+from cutting_engine import leftover_pieces, plan_material, plan_scraps
+from helpers import sheet_task
+
+
+def _plan(placements, **extra):
+    plan = {'fabric_id': 7, 'width': 1000, 'height': 2000, 'unit': 'м',
+            'sheets': [{'placements': placements, 'used': [], 'area': 0}]}
+    plan.update(extra)
+    return plan
+
+
+def _overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def test_scraps_fill_free_space_and_repeat():
+    planned = plan_material(sheet_task([{'name': 'a', 'width': 700, 'height': 1200, 'quantity': 6}], unit='м'))
+    plan = planned['plan']
+    scraps, cut_sheets = plan_scraps({'test': plan}, 100, 100)
+    assert cut_sheets == plan['sheets']
+    sheet_area = plan['width'] * plan['height']
+    scrap_area = sum(round(scrap['width'] * 1000) * round(scrap['length'] * 1000) for scrap in scraps)
+    assert scrap_area <= sum((sheet_area - sheet['area']) * sheet.get('repeat', 1) for sheet in plan['sheets'])
+    assert all(min(scrap['width'], scrap['length']) >= 0.1 for scrap in scraps)
+    assert all(scrap['fabric_id'] == 1 and scrap['material'] == 'test' for scrap in scraps)
+
+
+def test_locked_sheets_give_no_scraps():
+    plan = _plan([])
+    plan['sheets'][0]['locked'] = True
+    assert plan_scraps({'test': plan}, 100, 100) == ([], [])
+
+
+def test_scraps_skip_defect_zones():
+    placements = [{'x': 0, 'y': 0, 'width': 1000, 'height': 500, 'name': 'a', 'item_index': 0}]
+    defects = [[200, 800, 300, 400], [900, 1900, 200, 200]]
+    pieces = leftover_pieces(1000, 2000, placements, 50, 50, [tuple(zone) for zone in defects])
+    for piece in pieces:
+        assert not any(_overlaps(piece, zone) for zone in defects)
+        assert not _overlaps(piece, (0, 0, 1000, 500))
+    assert sum(w * h for _, _, w, h in pieces) == 1000 * 1500 - 300 * 400 - 100 * 100
+    scraps, _ = plan_scraps({'test': _plan(placements, defects=defects)}, 50, 50)
+    assert sorted((scrap['width'], scrap['length']) for scrap in scraps) == \
+        sorted((w / 1000, h / 1000) for _, _, w, h in pieces)
+
+
+def test_raster_plan_keeps_defects():
+    pytest.importorskip('numpy')
+    defects = [(100, 100, 200, 300)]
+    items = [{'name': 'a', 'width': 400, 'height': 500, 'quantity': 4}]
+    planned = plan_material(sheet_task(items, width=1000, height=2000, raster=10, defects=defects))
+    assert planned['plan']['defects'] == [[100, 100, 200, 300]]
+
+
+def test_defects_do_not_apply_to_offcut_sheets():
+    offcut = {'placements': [], 'used': [], 'area': 0, 'offcut_id': 3, 'width': 400, 'height': 400}
+    full = [{'x': 0, 'y': 0, 'width': 1000, 'height': 2000, 'name': 'a', 'item_index': 0}]
+    scraps, _ = plan_scraps({'test': _plan(full, defects=[[0, 0, 400, 400]], offcut_sheets=[offcut])}, 50, 50)
+    assert [(scrap['width'], scrap['length']) for scrap in scraps] == [(0.4, 0.4)]
@@ -0,0 +1,49 @@
+"""
+Равномерная сетка для отбора кандидатов в проверках пересечения (spatial.UniformGrid).
+"""
+import random
+
+import pytest
+
+from cutting_engine import UniformGrid
+
+
+def _intersects(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def _contains(outer, inner):
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+def _box(rng):
+    return rng.randint(0, 900), rng.randint(0, 900), rng.randint(1, 300), rng.randint(1, 300)
+
+
+@pytest.mark.parametrize('cell', [37, 250, 5000])
+def test_queries_match_brute_force(cell):
+    rng = random.Random(cell)
+    grid = UniformGrid(cell)
+    boxes = {}
+    for key in range(300):
+        boxes[key] = _box(rng)
+        grid.insert(key, *boxes[key])
+    for key in rng.sample(sorted(boxes), 100):
+        grid.remove(key)
+        del boxes[key]
+    assert len(grid) == len(boxes)
+    for _ in range(200):
+        area = _box(rng)
+        assert sorted(grid.query(*area)) == sorted(key for key, box in boxes.items() if _intersects(box, area))
+        assert sorted(grid.containing(*area)) == sorted(key for key, box in boxes.items() if _contains(box, area))
+        assert set(grid.query(*area)) <= grid.candidates(*area)
+
+
+def test_remove_clears_cells():
+    grid = UniformGrid(10)
+    grid.insert('a', 0, 0, 35, 5)
+    assert 'a' in grid and len(grid.cells) == 4
+    grid.remove('a')
+    assert 'a' not in grid and grid.cells == {}
+    assert UniformGrid(0).cell == 1
@@ -0,0 +1,46 @@
+"""
+Раскрой из партий разного размера (stock.select_sheets, stock.select_roll).
+"""
+import pytest
+
+from cutting_engine.stock import select_roll, select_sheets
+from helpers import ENGINES, assert_layout, placed_counts, random_items, unplaced_counts
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('seed', range(3))
+def test_select_sheets_respects_stock(engine, seed):
+    items = random_items(seed, kinds=6, max_quantity=6)
+    lots = [{'id': 1, 'width': 1200, 'height': 2000, 'count': 2},
+            {'id': 2, 'width': 1500, 'height': 3000, 'count': 1},
+            {'id': 3, 'width': 1200, 'height': 2000, 'count': 1}]
+    result = select_sheets(lots, items, engine=engine, time_limit=0.5)
+    taken = {}
+    for sheet in result['sheets']:
+        assert_layout(sheet, sheet['width'], sheet['height'], items)
+        taken[sheet['lot_id']] = taken.get(sheet['lot_id'], 0) + sheet.get('repeat', 1)
+    assert taken == {lot['lot_id']: lot['count'] for lot in result['lots']}
+    assert all(taken[lot['id']] <= lot['count'] for lot in lots if lot['id'] in taken)
+    placed = placed_counts(result['sheets'], items)
+    missing = unplaced_counts(result['unplaced'], items)
+    assert [a + b for a, b in zip(placed, missing)] == [item['quantity'] for item in items]
+
+
+def test_select_sheets_leaves_zero_size_items_unplaced():
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 8},
+             {'name': 'empty', 'width': 0, 'height': 400, 'quantity': 3}]
+    lots = [{'id': 1, 'width': 1000, 'height': 1200, 'count': 5}]
+    result = select_sheets(lots, items)
+    assert placed_counts(result['sheets'], items) == [8, 0]
+    assert unplaced_counts(result['unplaced'], items) == [0, 3]
+
+
+def test_select_roll_takes_length_from_lots_in_order():
+    items = [{'name': 'a', 'width': 500, 'height': 600, 'quantity': 10}]
+    lots = [{'id': 2, 'width': 1000, 'length': 3000}, {'id': 1, 'width': 1000, 'length': 3000},
+            {'id': 3, 'width': 400, 'length': 100000}]
+    result = select_roll(lots, items)
+    assert result['width'] == 1000
+    assert not result['unplaced']
+    assert 3000 < result['length'] <= 6000
+    assert result['lots'] == [{'lot_id': 1, 'length': 3000}, {'lot_id': 2, 'length': result['length'] - 3000}]
@@ -0,0 +1,52 @@
+"""
+Раскладка на рулон (strip_packing.SkylinePacker, strip_packing.pack_strip).
+"""
+import random
+
+import pytest
+
+from cutting_engine import pack_strip
+from cutting_engine.strip_packing import SkylinePacker
+from helpers import assert_layout, placed_counts, random_items, unplaced_counts
+
+ROLL_WIDTH = 1500
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pack_strip_layout(seed):
+    items = random_items(seed) + [{'name': 'wide', 'width': 1600, 'height': 1700, 'quantity': 3}]
+    result = pack_strip(ROLL_WIDTH, items)
+    assert result['length'] == max(p['y'] + p['height'] for p in result['placements'])
+    assert_layout(result, ROLL_WIDTH, result['length'], items)
+    assert result['area'] == sum(p['width'] * p['height'] for p in result['placements'])
+    assert result['length'] >= -(-result['area'] // ROLL_WIDTH)
+    placed = placed_counts([result], items)
+    missing = unplaced_counts(result['unplaced'], items)
+    assert [a + b for a, b in zip(placed, missing)] == [item['quantity'] for item in items]
+    assert missing[-1] == 3
+
+
+def test_pack_strip_without_rotation():
+    items = random_items(8)
+    result = pack_strip(ROLL_WIDTH, items, allow_rotation=False)
+    assert not any(p['rotated'] for p in result['placements'])
+    assert_layout(result, ROLL_WIDTH, result['length'], items)
+
+
+def test_skyline_covers_roll_width():
+    packer = SkylinePacker(ROLL_WIDTH)
+    rng = random.Random(3)
+    for index in range(200):
+        assert packer.insert(f"p{index}", rng.randint(20, 500), rng.randint(20, 500)) is not None
+        x = 0
+        for left, top, width in packer.skyline:
+            assert left == x and width > 0 and top <= packer.length
+            x += width
+        assert x == ROLL_WIDTH
+        assert all(a[1] != b[1] for a, b in zip(packer.skyline, packer.skyline[1:]))
+
+
+def test_identical_rows_fill_roll():
+    result = pack_strip(1000, [{'name': 'a', 'width': 250, 'height': 400, 'quantity': 12}], allow_rotation=False)
+    assert result['length'] == 1200
+    assert result['area'] == 1000 * 1200
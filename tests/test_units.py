@@ -0,0 +1,33 @@
+"""
+Перевод размеров из БД в целые миллиметры и обратно (units).
+"""
+import pytest
+
+from cutting_engine import ceil_mm, format_area, format_length, from_mm, length_unit, to_mm
+
+
+@pytest.mark.parametrize('value, unit, mm', [
+    ('0.70', 'м', 700), (1.5, 'м', 1500), ('2.345', 'м', 2345), ('12.5', 'см', 125), (37, 'мм', 37),
+    ('1.2', 'шт', 1200), (None, 'м', 0)
+])
+def test_units_round_trip(value, unit, mm):
+    assert to_mm(value, unit) == mm
+    assert to_mm(from_mm(mm, unit), unit) == mm
+    if value is not None:
+        assert from_mm(to_mm(value, unit), unit) == pytest.approx(float(value))
+
+
+@pytest.mark.parametrize('symbol, unit', [('см', 'см'), ('шт', 'м'), ('м²', 'м'), (None, 'м'), ('мм', 'мм')])
+def test_length_unit(symbol, unit):
+    assert length_unit(symbol) == unit
+
+
+def test_ceil_mm():
+    assert [ceil_mm(value, 10) for value in (0, 1, 10, 11, 1999)] == [0, 10, 10, 20, 2000]
+
+
+def test_formatting():
+    assert format_length(2500, 'м') == "2.5 м"
+    assert format_length(125, 'шт') == "0.125 м"
+    assert format_area(1500 * 2000, 'м') == "3 м²"
+    assert format_area(250, 'см') == "2.5 см²"